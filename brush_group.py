@@ -5,15 +5,20 @@ Generates comprehensive exercise solutions with detailed explanations.
 Uses LLM for answer validation and explanation generation.
 """
 
+import functools
+import hashlib
 import json
+import os
+import queue
 import re
 import random
+import threading
 from pathlib import Path
-from collections import Counter
+from collections import Counter, deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple, cast
+from typing import Any, Dict, List, Optional, Set, Tuple, cast
 
-from llm_client import call_llm_with_smart_routing
+from llm_client import QuotaExhausted, call_llm_with_smart_routing, shutdown_requested
 from config import (
     OUTPUT_DIR,
     THREADS_PER_PROCESS,
@@ -21,24 +26,147 @@ from config import (
     EXERCISES_CHAPTER_SUFFIX,
     LEGACY_EXERCISES_CHAPTER_SUFFIXES,
     MAX_PROMPT_CHARS,
+    BRUSH_BATCH_SIZE,
 )
+from utils_fs import atomic_write_json, atomic_write_text
 from utils_text import normalize_text, truncate_text
 
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used otherwise
+    orjson = None
+
 
 MIN_VALID_CACHE_BYTES = 100
 
+# Content-addressed store of LLM solutions shared by identical questions (all subjects)
+CONTENT_CACHE_DIR = OUTPUT_DIR / "_brush_cache"
+
+# Per-chapter list of completed question IDs (append-only, one ID per line)
+DONE_INDEX_NAME = "_done.idx"
+_DONE_INDEX_LOCK = threading.Lock()
+
+# Global pool progress reporting: print every N completions, keep last K failures
+PROGRESS_EVERY = 50
+RECENT_FAILURES_KEPT = 20
+
+# Precompiled patterns (hot during assembly of large chapters)
+_OPTION_CONTENT_RE = re.compile(r"[A-Za-z0-9\u4e00-\u9fa5]")
+_KEYWORDS_RE = re.compile(
+    r"(this question|correct|incorrect|option|therefore|answer|because|since)",
+    re.IGNORECASE,
+)
+_ANSWER_RE = re.compile(r"\*\*Answer\*\*:\s*([A-E]+)")
+_HEADER_RE = re.compile(r"^###\s*\d+\.", re.MULTILINE)
+
 
 def _is_valid_markdown_cache(path: Path) -> bool:
     try:
         if path.stat().st_size < MIN_VALID_CACHE_BYTES:
             return False
-        with path.open("r", encoding="utf-8") as handle:
-            head = handle.read(4096).lstrip("\ufeff")
-        return head.strip().startswith("#")
-    except Exception:
+        with path.open("rb") as handle:
+            head = handle.read(8)
+            # Generated files start with the heading; only a BOM or leading
+            # whitespace needs a longer look
+            if head[:1] == b"#":
+                return True
+            head += handle.read(4096 - len(head))
+        text = head.decode("utf-8", errors="ignore").lstrip("\ufeff")
+        return text.strip().startswith("#")
+    except (OSError, UnicodeDecodeError):
         return False
 
 
+def _scan_done_ids(cache_dir: Path) -> Set[int]:
+    """
+    Collect question IDs that already have a valid cached MD in cache_dir.
+
+    Uses a single `os.scandir` pass (no per-entry Path globbing). Invalid cache
+    files are removed so the question is reprocessed.
+    """
+    done_ids: Set[int] = set()
+    try:
+        entries = os.scandir(cache_dir)
+    except FileNotFoundError:
+        return done_ids
+
+    with entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith(".md"):
+                continue
+
+            cache_path = Path(entry.path)
+            if not _is_valid_markdown_cache(cache_path):
+                print(f"[WARN] Invalid cache {name}, removing and reprocessing")
+                try:
+                    cache_path.unlink()
+                except OSError as e:
+                    print(f"[WARN] Failed to remove invalid cache {name}: {e}")
+                continue
+
+            try:
+                done_ids.add(int(name[:-3]))
+            except ValueError:
+                continue
+    return done_ids
+
+
+def _md_cache_sizes(cache_dir: Path) -> Dict[int, int]:
+    """Map question ID -> size of its cached MD, from one `os.scandir` pass."""
+    sizes: Dict[int, int] = {}
+    try:
+        entries = os.scandir(cache_dir)
+    except FileNotFoundError:
+        return sizes
+
+    with entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith(".md"):
+                continue
+            try:
+                sizes[int(name[:-3])] = entry.stat().st_size
+            except (ValueError, OSError):
+                continue
+    return sizes
+
+
+def _load_done_ids(cache_dir: Path) -> Set[int]:
+    """
+    Return completed question IDs for a chapter cache directory.
+
+    The persisted done index is checked against one directory listing of the
+    cached MD files. If an indexed question's MD is missing or too small to be
+    valid (deleted or truncated), or the index is absent or corrupt, the IDs are
+    rebuilt by `_scan_done_ids` (which also removes invalid caches) and the index
+    is rewritten, so such questions are queued again.
+    """
+    idx_path = cache_dir / DONE_INDEX_NAME
+    try:
+        indexed = {int(tok) for tok in idx_path.read_text(encoding="utf-8").split()}
+    except FileNotFoundError:
+        indexed = None
+    except ValueError:
+        print(f"[WARN] Corrupt done index {idx_path}, rebuilding from cache files")
+        indexed = None
+
+    if indexed is not None:
+        sizes = _md_cache_sizes(cache_dir)
+        stale = [qid for qid in indexed if sizes.get(qid, 0) < MIN_VALID_CACHE_BYTES]
+        if not stale:
+            return indexed
+        print(f"[WARN] Done index {idx_path} lists {len(stale)} missing/invalid caches, rebuilding")
+
+    done_ids = _scan_done_ids(cache_dir)
+    if cache_dir.exists():
+        try:
+            atomic_write_text(idx_path, "".join(f"{qid}\n" for qid in sorted(done_ids)))
+        except OSError as e:
+            print(f"[WARN] Failed to write done index {idx_path}: {e}")
+    return done_ids
+
+
 def _maybe_migrate_legacy_exercises_output(out_dir: Path, chapter_id: str, chapter_name: str) -> None:
     """
     If a legacy chapter output exists, rename/copy it to the canonical suffix.
@@ -57,17 +185,17 @@ def _maybe_migrate_legacy_exercises_output(out_dir: Path, chapter_id: str, chapt
         try:
             legacy_file.rename(out_file)
             print(f"[MIGRATE] {legacy_file.name} -> {out_file.name}")
-        except Exception as e:
+        except OSError as e:
             try:
                 out_file.write_text(legacy_file.read_text(encoding="utf-8"), encoding="utf-8")
                 print(f"[MIGRATE] Copied {legacy_file.name} -> {out_file.name} (rename failed: {e})")
-            except Exception:
+            except (OSError, UnicodeDecodeError):
                 pass
         return
 
 
-# System prompt for exercise explanation generation
-SYSTEM_PROMPT = """You are an educational AI assistant responsible for generating comprehensive exercise solutions.
+# Exercise Processing Protocol shared by single-question and batch prompts
+_PROTOCOL_HEAD = """You are an educational AI assistant responsible for generating comprehensive exercise solutions.
 
 Please follow the Exercise Processing Protocol:
 
@@ -77,7 +205,22 @@ Please follow the Exercise Processing Protocol:
    - Always preserve original_answer even when correcting
    - Only rewrite explanations when original is missing, extremely brief, or has scientific errors
 
-2. **One Question at a Time**:
+"""
+
+_PROTOCOL_TAIL = """
+4. **Explanation Requirements**:
+   - **Smart Correction**: If original answer is A but explanation supports B, set final_answer to B and note "(Original answer A appears incorrect, corrected to B)"
+   - **Cite Authority**: Include textbook references in explanations
+   - **Option Analysis**: Analyze why correct options are right AND why incorrect options are wrong
+   - **Key Highlighting**: Use **bold** for core concepts and key terms
+   - **Frequency Marking**: Add "⭐ High-frequency" at start if question is classic/common
+
+5. **Manual Review Flag**:
+   - If OCR quality is too poor to understand, output "> OCR unclear, requires manual review" in final_expl_markdown
+"""
+
+# System prompt for exercise explanation generation
+SYSTEM_PROMPT = _PROTOCOL_HEAD + """2. **One Question at a Time**:
    - Process only one question per request
    - Do not skip or merge questions
 
@@ -89,17 +232,24 @@ Please follow the Exercise Processing Protocol:
        "original_answer": "Original book answer (if available)",
        "final_expl_markdown": "Detailed explanation in Markdown format"
      }
+""" + _PROTOCOL_TAIL
 
-4. **Explanation Requirements**:
-   - **Smart Correction**: If original answer is A but explanation supports B, set final_answer to B and note "(Original answer A appears incorrect, corrected to B)"
-   - **Cite Authority**: Include textbook references in explanations
-   - **Option Analysis**: Analyze why correct options are right AND why incorrect options are wrong
-   - **Key Highlighting**: Use **bold** for core concepts and key terms
-   - **Frequency Marking**: Add "⭐ High-frequency" at start if question is classic/common
+# System prompt for batch requests (several questions of one chapter per call)
+BATCH_SYSTEM_PROMPT = _PROTOCOL_HEAD + """2. **Several Questions per Request**:
+   - Solve every question independently, as if it were the only one
+   - Do not skip or merge questions
 
-5. **Manual Review Flag**:
-   - If OCR quality is too poor to understand, output "> OCR unclear, requires manual review" in final_expl_markdown
-"""
+3. **Output Format**:
+   - Output a valid JSON array without Markdown code block markers
+   - One object per question, in the order the questions are given
+   - Each object must contain:
+     {
+       "id": "Question ID exactly as given",
+       "final_answer": "Corrected final answer (letter)",
+       "original_answer": "Original book answer (if available)",
+       "final_expl_markdown": "Detailed explanation in Markdown format"
+     }
+""" + _PROTOCOL_TAIL
 
 
 def validate_brush_result(data: Optional[Dict[str, Any]], q: Dict[str, Any]) -> Tuple[bool, str]:
@@ -119,12 +269,12 @@ def validate_brush_result(data: Optional[Dict[str, Any]], q: Dict[str, Any]) ->
     # 1) final_answer must be non-empty and contain only A-E
     if not final_ans:
         return False, "final_answer is empty"
-    if any(ch not in "ABCDE" for ch in final_ans):
+    if final_ans.strip("ABCDE"):
         return False, f"final_answer contains invalid options: {final_ans}"
 
     # 2) Options must exist in question
     option_keys = set(q.get("options", {}).keys())
-    if not set(final_ans).issubset(option_keys):
+    if not all(ch in option_keys for ch in final_ans):
         return False, f"final_answer has non-existent options: {final_ans} vs {option_keys}"
 
     # 3) Explanation must have minimum length
@@ -141,8 +291,8 @@ def validate_brush_result(data: Optional[Dict[str, Any]], q: Dict[str, Any]) ->
     if raw_ans and data.get("original_answer") != raw_ans:
         data["original_answer"] = raw_ans
 
-    # 6) Normalize final_answer order
-    data["final_answer"] = "".join(sorted(set(final_ans)))
+    # 6) Normalize final_answer order (dedupe + sort over the fixed A-E alphabet)
+    data["final_answer"] = "".join(ch for ch in "ABCDE" if ch in final_ans)
 
     return True, ""
 
@@ -157,20 +307,28 @@ def _extract_markdown_block(response: str) -> Optional[str]:
     return "\n".join(lines).strip()
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+
 def _try_repair_json(text: str) -> Optional[str]:
+    """
+    Return the first decodable JSON object in text (as a string), or None.
+
+    Uses `raw_decode` at each '{' so nested objects are handled correctly.
+    """
     try:
         json.loads(text)
         return text
     except json.JSONDecodeError:
         pass
 
-    for match in re.finditer(r"\{.*?\}", text, flags=re.DOTALL):
-        snippet = match.group(0)
+    start = text.find("{")
+    while start != -1:
         try:
-            json.loads(snippet)
-            return snippet
+            _obj, end = _JSON_DECODER.raw_decode(text, start)
+            return text[start:end]
         except json.JSONDecodeError:
-            continue
+            start = text.find("{", start + 1)
 
     return None
 
@@ -212,6 +370,68 @@ def extract_json_block(raw: str) -> Optional[Dict[str, Any]]:
     return cast(Dict[str, Any], json.loads(json_text))
 
 
+@functools.lru_cache(maxsize=256)
+def _load_tb_context(raw_dir_str: str, chapter_id: str, chapter_name: str) -> str:
+    """
+    Load the normalized textbook excerpt used as LLM context for a chapter.
+
+    Cached per process so repeated chapter scans do not re-read and re-normalize.
+    """
+    raw_dir = Path(raw_dir_str)
+    tb_file_full = raw_dir / f"{chapter_id}_{chapter_name}_textbook.txt"
+    tb_file_content = raw_dir / f"{chapter_id}_{chapter_name}_content.txt"
+
+    tb_context = ""
+    if tb_file_full.exists():
+        tb_context = tb_file_full.read_text(encoding="utf-8")[:3000]
+    elif tb_file_content.exists():
+        tb_context = tb_file_content.read_text(encoding="utf-8")[:2000]
+    return normalize_text(tb_context)
+
+
+def _normalize_question(q: Dict[str, Any]) -> Tuple[str, Dict[str, str], str]:
+    """
+    Return (stem, options, options_json) normalized for prompts and Markdown.
+
+    Questions from `_load_questions` carry the result under "_normalized",
+    computed once at load time, so the prompt, retries and cache rendering share
+    a single normalization pass. Other dicts (and malformed questions the loader
+    could not normalize) are normalized on each call and never written to.
+    """
+    cached = q.get("_normalized")
+    if cached is None:
+        cached = _compute_normalized(q)
+    return cached
+
+
+def _compute_normalized(q: Dict[str, Any]) -> Tuple[str, Dict[str, str], str]:
+    stem = normalize_text(q.get("stem", ""))
+    options_norm = {k: normalize_text(v) for k, v in q.get("options", {}).items()}
+    return stem, options_norm, json.dumps(options_norm, ensure_ascii=False)
+
+
+_SINGLE_QUESTION_CLOSING = """
+
+Please generate a JSON solution following the Exercise Processing Protocol.
+"""
+
+
+@functools.lru_cache(maxsize=256)
+def _build_prompt_prefix(tb_context: str, system_prompt: str = SYSTEM_PROMPT) -> Tuple[str, int, int]:
+    """
+    Build the static prompt prefix (system prompt + textbook excerpt) shared by
+    every question of a chapter.
+
+    Returns:
+        Tuple of (prefix, tb_len_before_truncation, tb_len_after_truncation)
+    """
+    tb_context = normalize_text(tb_context)
+    tb_len = len(tb_context)
+    tb_context, _ = truncate_text(tb_context, MAX_PROMPT_CHARS)
+    prefix = f"{system_prompt}\n\n\nTextbook excerpt (reference):\n{tb_context}\n"
+    return prefix, tb_len, len(tb_context)
+
+
 def ask_llm_with_repair(
     q: Dict[str, Any],
     tb_context: str,
@@ -224,57 +444,48 @@ def ask_llm_with_repair(
     """
     MAX_ATTEMPTS_PER_QUESTION = 3
 
-    stem = normalize_text(q.get("stem", ""))
-    options_norm = {k: normalize_text(v) for k, v in q.get("options", {}).items()}
+    stem, _options_norm, options_json = _normalize_question(q)
     debug_id_base = f"{subject}-{chapter_name}-Q{q['id']}"
 
-    tb_context = normalize_text(tb_context)
-    tb_len = len(tb_context)
-    tb_context, tb_truncated = truncate_text(tb_context, MAX_PROMPT_CHARS)
-    if tb_truncated:
+    prompt_prefix, tb_len, tb_kept = _build_prompt_prefix(tb_context)
+    if tb_kept != tb_len:
         print(
             f"[BRUSH] WARN: {debug_id_base} truncated tb_context "
-            f"{tb_len} -> {len(tb_context)} chars (limit {MAX_PROMPT_CHARS})"
+            f"{tb_len} -> {tb_kept} chars (limit {MAX_PROMPT_CHARS})"
         )
 
-    last_error = ""
-    last_raw_resp = ""
-
-    for attempt in range(1, MAX_ATTEMPTS_PER_QUESTION + 1):
-        debug_id = f"{debug_id_base}-try{attempt}"
-
-        # Base user prompt
-        user_prompt = f"""
-Textbook excerpt (reference):
-{tb_context}
-
+    # Static part of the prompt: shared textbook prefix + this question.
+    # Built once; retries only append the feedback section.
+    question_prompt = prompt_prefix + f"""
 Question:
 {stem}
 
 Options:
-{json.dumps(options_norm, ensure_ascii=False)}
+{options_json}
 
 Original Answer: {q.get('raw_answer', 'Unknown')}
 Original Explanation: {q.get('raw_expl', 'None')}
 """
 
+    last_error = ""
+    last_raw_resp = ""
+
+    for attempt in range(1, MAX_ATTEMPTS_PER_QUESTION + 1):
+        debug_id = f"{debug_id_base}-try{attempt}"
+
         # If retry, include previous error
         if last_error:
-            user_prompt += f"""
+            full_prompt = question_prompt + f"""
 
 [IMPORTANT] Your previous JSON had the following issue, please correct:
 {last_error}
 
 Your previous raw output (for reference only, do not copy errors):
 {last_raw_resp}
-"""
-
-        user_prompt += """
-
-Please generate a JSON solution following the Exercise Processing Protocol.
-"""
+""" + _SINGLE_QUESTION_CLOSING
+        else:
+            full_prompt = question_prompt + _SINGLE_QUESTION_CLOSING
 
-        full_prompt = f"{SYSTEM_PROMPT}\n\n{user_prompt}"
         prompt_len = len(full_prompt)
         full_prompt, prompt_truncated = truncate_text(full_prompt, MAX_PROMPT_CHARS)
         if prompt_truncated:
@@ -307,18 +518,155 @@ Please generate a JSON solution following the Exercise Processing Protocol.
     }
 
 
+BATCH_INSTRUCTIONS = """
+This request contains {count} questions. Please generate a JSON array with exactly
+{count} solutions following the Exercise Processing Protocol.
+"""
+
+
+def _parse_llm_json_array(response: str) -> Optional[List[Any]]:
+    """Extract the outermost JSON array from model output."""
+    text = response.strip()
+    markdown_block = _extract_markdown_block(text)
+    if markdown_block is not None:
+        text = markdown_block
+
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end <= start:
+        return None
+
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, list) else None
+
+
+def ask_llm_batch(
+    qs: List[Dict[str, Any]],
+    tb_context: str,
+    subject: str,
+    chapter_name: str,
+    api_key: Optional[str] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Solve several questions of one chapter with a single LLM call.
+
+    The textbook prefix is shared by the whole batch. Only items that pass
+    `validate_brush_result` are returned (keyed by question ID); callers should
+    fall back to `ask_llm_with_repair` for the rest.
+    """
+    if not qs:
+        return {}
+
+    debug_id = f"{subject}-{chapter_name}-Q{qs[0]['id']}..Q{qs[-1]['id']}-batch"
+    prompt_prefix, _tb_len, _tb_kept = _build_prompt_prefix(tb_context, BATCH_SYSTEM_PROMPT)
+
+    q_blocks = []
+    for q in qs:
+        stem, _options_norm, options_json = _normalize_question(q)
+        q_blocks.append(
+            f"""
+Question ID: {q['id']}
+Question:
+{stem}
+
+Options:
+{options_json}
+
+Original Answer: {q.get('raw_answer', 'Unknown')}
+Original Explanation: {q.get('raw_expl', 'None')}
+"""
+        )
+
+    full_prompt = prompt_prefix + "".join(q_blocks) + BATCH_INSTRUCTIONS.format(count=len(qs))
+    if len(full_prompt) > MAX_PROMPT_CHARS:
+        # Truncating would silently drop questions; let the per-question path handle them.
+        print(
+            f"[BRUSH] WARN: {debug_id} batch prompt {len(full_prompt)} chars exceeds "
+            f"limit {MAX_PROMPT_CHARS}, falling back to single-question requests"
+        )
+        return {}
+
+    try:
+        resp = call_llm_with_smart_routing(full_prompt, debug_id, api_key=api_key)
+    except QuotaExhausted as e:
+        print(f"[BRUSH] WARN: {debug_id} batch call failed: {e}")
+        return {}
+    if not resp:
+        return {}
+
+    items = _parse_llm_json_array(resp)
+    if items is None:
+        print(f"[BRUSH] WARN: {debug_id} batch output is not a JSON array")
+        return {}
+
+    by_id = {q["id"]: q for q in qs}
+    results: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            qid = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        q = by_id.get(qid)
+        if q is None or qid in results:
+            continue
+        ok, _err = validate_brush_result(item, q)
+        if ok:
+            item.pop("id", None)
+            results[qid] = item
+
+    return results
+
+
+@functools.lru_cache(maxsize=512)
+def _load_questions_cached(path_str: str, mtime_ns: int, size: int) -> Tuple[Dict[str, Any], ...]:
+    data = Path(path_str).read_bytes()
+    if orjson is not None:
+        questions = orjson.loads(data)
+    else:
+        questions = json.loads(data.decode("utf-8"))
+    # Normalize before the dicts are shared: worker threads only ever read them
+    for q in questions:
+        try:
+            q["_normalized"] = _compute_normalized(q)
+        except (TypeError, AttributeError) as e:
+            # Malformed question (e.g. non-string options): left for the
+            # per-question error handling instead of failing the whole chapter
+            print(f"[WARN] {Path(path_str).name} Q{q.get('id')}: cannot normalize question: {e}")
+    return tuple(questions)
+
+
+def _load_questions(q_file: Path) -> Tuple[Dict[str, Any], ...]:
+    """
+    Load a chapter's questions JSON, parsed once per file version.
+
+    Keyed by (path, mtime, size) so a re-parsed chapter is picked up. The dicts
+    are shared between callers and threads and already carry "_normalized";
+    callers must treat them as read-only.
+    """
+    st = q_file.stat()
+    return _load_questions_cached(str(q_file), st.st_mtime_ns, st.st_size)
+
+
 # ================= Question Quality Classification System =================
 
+# Literal phrases (no regex metacharacters); matched case-insensitively.
 BAD_EXPL_PATTERNS = [
-    r"OCR unclear",
-    r"requires manual review",
-    r"Multiple LLM attempts failed",
-    r"manual review recommended",
-    r"cannot parse",
-    r"options missing",
-    r"serious issue",
+    "OCR unclear",
+    "requires manual review",
+    "Multiple LLM attempts failed",
+    "manual review recommended",
+    "cannot parse",
+    "options missing",
+    "serious issue",
 ]
 
+_BAD_EXPL_LITERALS = tuple(p.lower() for p in BAD_EXPL_PATTERNS)
+
 
 def is_structurally_good(q: Dict[str, Any]) -> Tuple[bool, List[str]]:
     """
@@ -339,7 +687,7 @@ def is_structurally_good(q: Dict[str, Any]) -> Tuple[bool, List[str]]:
     valid_opts_count = 0
     for k, v in opts.items():
         txt = v.strip()
-        if len(txt) >= 1 and re.search(r"[A-Za-z0-9\u4e00-\u9fa5]", txt):
+        if len(txt) >= 1 and _OPTION_CONTENT_RE.search(txt):
             valid_opts_count += 1
 
     if valid_opts_count < 2:
@@ -354,17 +702,14 @@ def is_structurally_good(q: Dict[str, Any]) -> Tuple[bool, List[str]]:
 
 def is_expl_bad(expl: str) -> bool:
     """Check if explanation is flagged for manual review."""
-    for pat in BAD_EXPL_PATTERNS:
-        if re.search(pat, expl, re.IGNORECASE):
-            return True
-    return False
+    lowered = expl.lower()
+    return any(p in lowered for p in _BAD_EXPL_LITERALS)
 
 
 def has_basic_semantics(expl: str, final_answer: str) -> bool:
     """Check if explanation actually discusses the question."""
     # Has at least one common explanation keyword
-    keywords = r"(this question|correct|incorrect|option|therefore|answer|because|since)"
-    if not re.search(keywords, expl, re.IGNORECASE):
+    if not _KEYWORDS_RE.search(expl):
         return False
     # Mentions the correct answer letter at least once
     if not any(ch in expl for ch in final_answer):
@@ -397,22 +742,147 @@ def classify_question(q: Dict[str, Any], brush_data: Dict[str, Any]) -> Tuple[st
     """
     Final classification: good/bad question.
     """
-    # 1) Structure check
+    # 1) Structure check (cheap, needs no LLM output) - reject early
     struct_ok, struct_reasons = is_structurally_good(q)
+    if not struct_ok:
+        return "bad", struct_reasons
 
     # 2) Explanation check
     expl_ok, expl_reasons = is_explanation_good(brush_data, q)
-
-    reasons = []
-    if not struct_ok:
-        reasons += struct_reasons
     if not expl_ok:
-        reasons += expl_reasons
+        return "bad", expl_reasons
+
+    return "good", []
+
+
+def _render_question_cache(q: Dict[str, Any], data: Dict[str, Any]) -> str:
+    """Render a solved question as its cached Markdown block."""
+    q_id = q["id"]
+    stem, options_norm, _options_json = _normalize_question(q)
+    expl = data.get("final_expl_markdown", "> Explanation generation failed")
+    final_ans = data.get("final_answer", q.get("raw_answer", "?"))
+
+    md_block = ""
+    md_block += f"### {q_id}. {stem}\n\n"
+    for k, v in options_norm.items():
+        md_block += f"- **{k}**. {v}\n"
+    md_block += "\n"
+    md_block += f"> **Answer**: {final_ans}\n\n"
+    md_block += expl.strip() + "\n\n---\n\n"
+    return md_block
+
+
+def _write_question_cache(cache_dir: Path, q_id: int, md_block: str) -> None:
+    """Write cache_dir / "{q_id}.md" and record the ID in the chapter's done index."""
+    (cache_dir / f"{q_id}.md").write_text(md_block, encoding="utf-8")
+    with _DONE_INDEX_LOCK:
+        with (cache_dir / DONE_INDEX_NAME).open("a", encoding="utf-8") as handle:
+            handle.write(f"{q_id}\n")
+
+
+class QuestionCacheWriter:
+    """
+    Background thread that writes rendered question caches.
+
+    Worker threads only enqueue; file writes happen on a single writer thread.
+    `close()` must be called (or use as a context manager) before reading the
+    cache back for assembly. `failed` counts questions whose cache could not be
+    written; they stay pending and are picked up again on the next run.
+    """
+
+    _STOP = object()
 
-    if struct_ok and expl_ok:
-        return "good", []
+    def __init__(self):
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="brush-cache-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, cache_dir: Path, q_id: int, md_block: str) -> None:
+        self._queue.put((cache_dir, q_id, md_block))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            cache_dir, q_id, md_block = item
+            try:
+                _write_question_cache(cache_dir, q_id, md_block)
+            except Exception as e:
+                # Keep the thread alive: later submits must still be written
+                self.failed += 1
+                print(f"[WARN] Failed to write cache for Q{q_id} in {cache_dir}: {e}")
+
+    def close(self) -> None:
+        """Flush all pending writes and stop the writer thread."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def __enter__(self) -> "QuestionCacheWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _content_key(q: Dict[str, Any]) -> str:
+    """Content hash identifying questions that would get the same LLM solution."""
+    stem, options_norm, _options_json = _normalize_question(q)
+    payload = "\x1f".join((
+        stem,
+        json.dumps(options_norm, ensure_ascii=False, sort_keys=True),
+        (q.get("raw_answer") or "").strip().upper(),
+    ))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _content_cache_path(key: str) -> Path:
+    return CONTENT_CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def _load_content_cached(key: str) -> Optional[Dict[str, Any]]:
+    """Return a previously stored LLM solution for this content key, if any."""
+    try:
+        data = json.loads(_content_cache_path(key).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _remember_solution(q: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Store a usable LLM solution in the content-addressed cache."""
+    expl = data.get("final_expl_markdown") or ""
+    if not isinstance(expl, str) or not expl.strip() or is_expl_bad(expl):
+        # Fallback/flagged outputs are not worth reusing
+        return
+    try:
+        atomic_write_json(
+            _content_cache_path(_content_key(q)),
+            {k: data.get(k) for k in ("final_answer", "original_answer", "final_expl_markdown")},
+            indent=None,
+            # A lost entry only costs a repeat LLM call; skip the per-question fsync
+            durable=False,
+        )
+    except OSError as e:
+        print(f"[WARN] Failed to store content cache for Q{q['id']}: {e}")
+
+
+def _store_question_cache(
+    q: Dict[str, Any],
+    data: Dict[str, Any],
+    cache_dir: Path,
+    writer: Optional[QuestionCacheWriter],
+    *,
+    remember: bool = True,
+) -> None:
+    if remember:
+        _remember_solution(q, data)
+    md_block = _render_question_cache(q, data)
+    if writer is not None:
+        writer.submit(cache_dir, q["id"], md_block)
     else:
-        return "bad", reasons
+        _write_question_cache(cache_dir, q["id"], md_block)
 
 
 def process_single_question(
@@ -422,21 +892,23 @@ def process_single_question(
     tb_context: str,
     q: Dict[str, Any],
     cache_dir: Path,
+    writer: Optional[QuestionCacheWriter] = None,
 ) -> Tuple[int, bool, str]:
     """
     Process a single question:
     - Call LLM
     - Generate MD
-    - Write to cache_dir / "{q_id}.md"
+    - Write to cache_dir / "{q_id}.md" (via `writer` when given)
+
+    cache_dir must already exist.
 
     Returns:
         Tuple of (qid, success, error_msg)
     """
     q_id = q["id"]
+    if shutdown_requested():
+        return q_id, False, "shutdown requested"
     try:
-        stem = normalize_text(q.get("stem", ""))
-        options_norm = {k: normalize_text(v) for k, v in q.get("options", {}).items()}
-
         data = ask_llm_with_repair(
             q,
             tb_context,
@@ -444,25 +916,55 @@ def process_single_question(
             chapter_name,
             api_key=None,
         )
-        expl = data.get("final_expl_markdown", "> Explanation generation failed")
-        final_ans = data.get("final_answer", q.get("raw_answer", "?"))
-
-        md_block = ""
-        md_block += f"### {q_id}. {stem}\n\n"
-        for k, v in options_norm.items():
-            md_block += f"- **{k}**. {v}\n"
-        md_block += "\n"
-        md_block += f"> **Answer**: {final_ans}\n\n"
-        md_block += expl.strip() + "\n\n---\n\n"
-
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        (cache_dir / f"{q_id}.md").write_text(md_block, encoding="utf-8")
-
+        _store_question_cache(q, data, cache_dir, writer)
         return q_id, True, ""
     except Exception as e:
         return q_id, False, str(e)
 
 
+def process_question_batch(
+    subject: str,
+    chapter_id: str,
+    chapter_name: str,
+    tb_context: str,
+    qs: List[Dict[str, Any]],
+    cache_dir: Path,
+    writer: Optional[QuestionCacheWriter] = None,
+) -> List[Tuple[int, bool, str]]:
+    """
+    Process a batch of questions from the same chapter:
+    - One shared LLM call for the whole batch
+    - Per-question retry (`ask_llm_with_repair`) only for items that failed validation
+
+    Returns:
+        List of (qid, success, error_msg), one entry per question
+    """
+    if shutdown_requested():
+        return [(q["id"], False, "shutdown requested") for q in qs]
+
+    if len(qs) == 1:
+        return [
+            process_single_question(subject, chapter_id, chapter_name, tb_context, qs[0], cache_dir, writer)
+        ]
+
+    batch_results = ask_llm_batch(qs, tb_context, subject, chapter_name, api_key=None)
+
+    outcomes: List[Tuple[int, bool, str]] = []
+    for q in qs:
+        data = batch_results.get(q["id"])
+        if data is None:
+            outcomes.append(
+                process_single_question(subject, chapter_id, chapter_name, tb_context, q, cache_dir, writer)
+            )
+            continue
+        try:
+            _store_question_cache(q, data, cache_dir, writer)
+            outcomes.append((q["id"], True, ""))
+        except Exception as e:
+            outcomes.append((q["id"], False, str(e)))
+    return outcomes
+
+
 def assemble_chapter_from_cache(
     subject: str,
     chapter_id: str,
@@ -490,7 +992,7 @@ def assemble_chapter_from_cache(
         print(f"[WARN] Invalid cache {out_file.name}, removing and reprocessing")
         try:
             out_file.unlink()
-        except Exception as e:
+        except OSError as e:
             print(f"[WARN] Failed to remove invalid cache {out_file.name}: {e}")
 
     q_file = struct_dir / f"{chapter_id}_{chapter_name}_questions.json"
@@ -498,17 +1000,24 @@ def assemble_chapter_from_cache(
         print(f"[WARN] Cannot assemble: question file not found {q_file}")
         return
 
-    questions = json.loads(q_file.read_text(encoding="utf-8"))
+    questions = _load_questions(q_file)
 
     # 1) Duplicate ID check
-    id_counts = Counter(q["id"] for q in questions)
-    dup_ids = [qid for qid, cnt in id_counts.items() if cnt > 1]
+    seen_ids: Set[int] = set()
+    dup_ids: List[int] = []
+    for q in questions:
+        qid = q["id"]
+        if qid not in seen_ids:
+            seen_ids.add(qid)
+        elif qid not in dup_ids:
+            dup_ids.append(qid)
     if dup_ids:
         print(f"[WARN] {q_file.name} has duplicate question IDs: {dup_ids}")
 
     # 2) Post-processing filter
     valid_questions = []
     skipped_questions = []
+    md_by_id: Dict[int, str] = {}
 
     for q in questions:
         qid = q["id"]
@@ -519,23 +1028,32 @@ def assemble_chapter_from_cache(
 
         try:
             md_content = cache_path.read_text(encoding="utf-8")
-            brush_data = {
-                "final_expl_markdown": md_content,
-                "final_answer": "A",
-                "original_answer": q.get("raw_answer", "")
-            }
-            # Extract final_answer from MD
-            answer_match = re.search(r"\*\*Answer\*\*:\s*([A-E]+)", md_content)
-            if answer_match:
-                brush_data["final_answer"] = answer_match.group(1)
+        except (OSError, UnicodeDecodeError) as e:
+            skipped_questions.append((qid, f"Cache read error: {e}"))
+            continue
+
+        brush_data = {
+            "final_expl_markdown": md_content,
+            "final_answer": "A",
+            "original_answer": q.get("raw_answer", "")
+        }
+        # Extract final_answer from the MD already in hand
+        answer_match = _ANSWER_RE.search(md_content)
+        if answer_match:
+            brush_data["final_answer"] = answer_match.group(1)
 
+        try:
             cls, reasons = classify_question(q, brush_data)
-            if cls == "good":
-                valid_questions.append(q)
-            else:
-                skipped_questions.append((qid, "; ".join(reasons)))
-        except Exception as e:
-            skipped_questions.append((qid, f"Cache read error: {e}"))
+        except (AttributeError, TypeError, ValueError) as e:
+            # Malformed question fields (e.g. non-string options from LLM re-segmentation)
+            skipped_questions.append((qid, f"Classification error: {e}"))
+            continue
+
+        if cls == "good":
+            valid_questions.append(q)
+            md_by_id[qid] = md_content
+        else:
+            skipped_questions.append((qid, "; ".join(reasons)))
 
     if skipped_questions:
         print(
@@ -548,40 +1066,27 @@ def assemble_chapter_from_cache(
         return
 
     # 3) Assemble chapter MD
-    final_md_content = f"# {chapter_name} Exercise Solutions\n\n"
+    parts: List[str] = [f"# {chapter_name} Exercise Solutions\n\n"]
 
-    ordered_ids = []
-    seen = set()
-    for q in valid_questions:
-        qid = q["id"]
-        if qid not in seen:
-            seen.add(qid)
-            ordered_ids.append(qid)
-
-    # Map to consecutive numbering
-    id2display = {}
-    display_idx = 1
-    for qid in ordered_ids:
-        id2display[qid] = display_idx
-        display_idx += 1
+    # Unique IDs in first-seen order, mapped to consecutive numbering
+    ordered_ids = list(dict.fromkeys(q["id"] for q in valid_questions))
+    id2display = {qid: idx for idx, qid in enumerate(ordered_ids, 1)}
 
     for qid in ordered_ids:
-        cache_path = cache_dir / f"{qid}.md"
         display_idx = id2display.get(qid, qid)
-        if cache_path.exists():
-            md = cache_path.read_text(encoding="utf-8")
-            md = re.sub(
-                r"^###\s*\d+\.",
-                f"### {display_idx}.",
-                md,
-                count=1,
-                flags=re.MULTILINE,
-            )
-            final_md_content += md
+        md = md_by_id.get(qid)
+        if md is not None:
+            # Cache files are written with a "### {qid}. " header; renumber by slicing
+            cached_header = f"### {qid}."
+            if md.startswith(cached_header):
+                md = f"### {display_idx}." + md[len(cached_header):]
+            else:
+                md = _HEADER_RE.sub(f"### {display_idx}.", md, count=1)
+            parts.append(md)
         else:
-            final_md_content += f"### {display_idx}. Explanation missing\n\n---\n\n"
+            parts.append(f"### {display_idx}. Explanation missing\n\n---\n\n")
 
-    out_file.write_text(final_md_content, encoding="utf-8")
+    out_file.write_text("".join(parts), encoding="utf-8")
     print(f"[BRUSH] {chapter_id}_{chapter_name} assembly complete -> {out_file}")
 
 
@@ -589,7 +1094,7 @@ def run_subject_questions_global(subject: str) -> None:
     """
     Subject-wide exercise processing entry point:
     - Scan all chapters
-    - Collect all pending questions as global tasks
+    - Collect all pending questions as global tasks (batched per chapter)
     - Use a large thread pool (NUM_PROCESSES * THREADS_PER_PROCESS) for work stealing
     - Assemble by chapter
     """
@@ -602,115 +1107,183 @@ def run_subject_questions_global(subject: str) -> None:
         return
 
     # 1) Collect all chapters + pending questions
-    chapter_files = sorted(struct_dir.glob("*_questions.json"))
+    # Same "{id}_{name}_questions.json" parsing as run_all and qpoints_runner,
+    # so every pipeline agrees on chapter names
+    suffix = "_questions.json"
+    with os.scandir(struct_dir) as it:
+        chapter_names = sorted(entry.name for entry in it if entry.name.endswith(suffix))
+    chapters = []
+    for name in chapter_names:
+        chap_id, sep, chap_name = name[:-len(suffix)].partition("_")
+        if sep:
+            chapters.append((chap_id, chap_name))
     global_tasks = []
+    seen_keys: Set[str] = set()
+    # Identical questions already queued in this run: filled from the content cache afterwards
+    deferred: List[Tuple[str, Dict[str, Any], Path]] = []
+    content_hits = 0
+    malformed = 0
 
     print(f"[GLOBAL] Scanning {subject} all chapter cache status...")
 
-    for qf in chapter_files:
-        stem = qf.stem.replace("_questions", "")
-        parts = stem.split("_", 1)
-        if len(parts) == 2:
-            chap_id, chap_name = parts
-        else:
-            chap_id, chap_name = "00", stem
-
+    for chap_id, chap_name in chapters:
+        qf = struct_dir / f"{chap_id}_{chap_name}{suffix}"
         cache_dir = base_dir / "cache" / "brush" / f"{chap_id}_{chap_name}"
 
         try:
-            questions = json.loads(qf.read_text(encoding="utf-8"))
-        except Exception as e:
+            questions = _load_questions(qf)
+        except (OSError, ValueError) as e:
             print(f"[WARN] Cannot read {qf}: {e}")
             continue
 
         # Textbook context
-        tb_context = ""
-        tb_file_full = raw_dir / f"{chap_id}_{chap_name}_textbook.txt"
-        tb_file_content = raw_dir / f"{chap_id}_{chap_name}_content.txt"
-        if tb_file_full.exists():
-            tb_context = tb_file_full.read_text(encoding="utf-8")[:3000]
-        elif tb_file_content.exists():
-            tb_context = tb_file_content.read_text(encoding="utf-8")[:2000]
-        tb_context = normalize_text(tb_context)
-
-        done_ids = set()
-        for cache_path in cache_dir.glob("*.md"):
-            if not _is_valid_markdown_cache(cache_path):
-                print(f"[WARN] Invalid cache {cache_path.name}, removing and reprocessing")
-                try:
-                    cache_path.unlink()
-                except Exception as e:
-                    print(f"[WARN] Failed to remove invalid cache {cache_path.name}: {e}")
-                continue
+        tb_context = _load_tb_context(str(raw_dir), chap_id, chap_name)
 
-            try:
-                done_ids.add(int(cache_path.stem))
-            except ValueError:
-                continue
+        done_ids = _load_done_ids(cache_dir)
         pending_questions = [q for q in questions if q["id"] not in done_ids]
+        if pending_questions:
+            # Created once here; workers no longer mkdir per question
+            cache_dir.mkdir(parents=True, exist_ok=True)
 
+        # Skip LLM calls for questions whose content was already solved
+        to_solve = []
         for q in pending_questions:
-            global_tasks.append((chap_id, chap_name, tb_context, q, cache_dir))
+            if "_normalized" not in q:
+                # The loader could not normalize it, so no prompt can be built either
+                malformed += 1
+                continue
+            key = _content_key(q)
+            cached = _load_content_cached(key)
+            if cached is not None:
+                _store_question_cache(q, cached, cache_dir, None, remember=False)
+                content_hits += 1
+            elif key in seen_keys:
+                deferred.append((key, q, cache_dir))
+            else:
+                seen_keys.add(key)
+                to_solve.append(q)
+        pending_questions = to_solve
+
+        # Batches never span chapters so the textbook prefix is shared
+        batch_size = max(1, BRUSH_BATCH_SIZE)
+        for i in range(0, len(pending_questions), batch_size):
+            batch = pending_questions[i:i + batch_size]
+            global_tasks.append((chap_id, chap_name, tb_context, batch, cache_dir))
+
+    if content_hits or deferred:
+        print(
+            f"[GLOBAL] {subject} reused {content_hits} cached solutions for identical questions, "
+            f"{len(deferred)} duplicates will reuse this run's results."
+        )
+
+    if malformed:
+        print(f"[GLOBAL] {subject} {malformed} malformed questions skipped and left unresolved.")
 
     if not global_tasks:
         print(f"[GLOBAL] {subject} all questions cached, proceeding to assembly.")
     else:
-        total = len(global_tasks)
+        total = sum(len(batch) for _, _, _, batch, _ in global_tasks)
         workers = max(1, NUM_PROCESSES * THREADS_PER_PROCESS)
         print(
-            f"[GLOBAL] {subject} subject-wide pending questions={total}, "
+            f"[GLOBAL] {subject} subject-wide pending questions={total} "
+            f"in {len(global_tasks)} batches, "
             f"starting thread pool workers={workers} for question-level work stealing."
         )
 
-        # 2) Global question-level thread pool
-        with ThreadPoolExecutor(max_workers=workers) as ex:
+        # 2) Global question-level thread pool (cache files written by one background thread)
+        with QuestionCacheWriter() as writer, ThreadPoolExecutor(max_workers=workers) as ex:
             fut2info = {}
-            for idx, (chap_id, chap_name, tb_context, q, cache_dir) in enumerate(global_tasks):
+            for chap_id, chap_name, tb_context, batch, cache_dir in global_tasks:
                 fut = ex.submit(
-                    process_single_question,
+                    process_question_batch,
                     subject,
                     chap_id,
                     chap_name,
                     tb_context,
-                    q,
+                    batch,
                     cache_dir,
+                    writer,
                 )
-                fut2info[fut] = (chap_id, chap_name, q["id"])
+                fut2info[fut] = (chap_id, chap_name, batch)
 
             finished = 0
+            status_counts: Counter = Counter()
+            recent_failures: deque = deque(maxlen=RECENT_FAILURES_KEPT)
             for fut in as_completed(fut2info):
-                chap_id, chap_name, qid = fut2info[fut]
+                chap_id, chap_name, batch = fut2info[fut]
                 try:
-                    qid_ret, success, err = fut.result()
+                    outcomes = fut.result()
+                except Exception as e:
+                    outcomes = [(q["id"], False, f"worker exception: {e}") for q in batch]
+
+                prev_finished = finished
+                for qid_ret, success, err in outcomes:
                     finished += 1
                     if success:
-                        print(
-                            f"[GLOBAL-OK] {subject} / {chap_name} Q{qid_ret} "
-                            f"done ({finished}/{total})"
-                        )
+                        status_counts["ok"] += 1
                     else:
-                        print(
-                            f"[GLOBAL-FAIL] {subject} / {chap_name} Q{qid_ret}: {err} "
-                            f"({finished}/{total})"
-                        )
-                except Exception as e:
-                    finished += 1
+                        status_counts["fail"] += 1
+                        recent_failures.append(f"{chap_name} Q{qid_ret}: {err}")
+
+                if finished == total or finished // PROGRESS_EVERY != prev_finished // PROGRESS_EVERY:
                     print(
-                        f"[GLOBAL-EXC] {subject} / {chap_name} Q{qid}: {e} "
-                        f"({finished}/{total})"
+                        f"[GLOBAL] {subject} progress {finished}/{total} "
+                        f"(ok={status_counts['ok']}, fail={status_counts['fail']})"
                     )
 
+        if recent_failures:
+            print(
+                f"[GLOBAL-FAIL] {subject} {status_counts['fail']} questions failed, "
+                f"last {len(recent_failures)}:"
+            )
+            for line in recent_failures:
+                print(f"  - {line}")
+
+        # Solved but not cached: assembly will not include them
+        if writer.failed:
+            print(
+                f"[GLOBAL-FAIL] {subject} {writer.failed} solved questions could not be "
+                f"written to cache and remain unresolved "
+                f"(ok={status_counts['ok'] - writer.failed}, "
+                f"fail={status_counts['fail'] + writer.failed})."
+            )
+
+    # Duplicates share the solution stored by their first occurrence
+    unresolved = 0
+    for key, q, cache_dir in deferred:
+        cached = _load_content_cached(key)
+        if cached is None:
+            unresolved += 1
+            continue
+        try:
+            _store_question_cache(q, cached, cache_dir, None, remember=False)
+        except OSError as e:
+            unresolved += 1
+            print(f"[WARN] Failed to write cache for duplicate Q{q['id']} in {cache_dir}: {e}")
+    if unresolved:
+        print(f"[GLOBAL] {subject} {unresolved} duplicate questions left pending (original failed).")
+
     # 3) Assemble all chapters
     print(f"[GLOBAL] Starting assembly for {subject} all chapters...")
-    for qf in chapter_files:
-        stem = qf.stem.replace("_questions", "")
-        parts = stem.split("_", 1)
-        if len(parts) == 2:
-            chap_id, chap_name = parts
-        else:
-            chap_id, chap_name = "00", stem
-
-        assemble_chapter_from_cache(subject, chap_id, chap_name)
+    # Chapters write separate output files, so they can be assembled in parallel.
+    # Threads, not processes: assembly is file I/O plus string joins, this runs
+    # next to run_all's shared process pool, and forking this multi-threaded
+    # process is unsafe.
+    if len(chapters) > 1 and NUM_PROCESSES > 1:
+        with ThreadPoolExecutor(max_workers=min(NUM_PROCESSES, len(chapters))) as ex:
+            fut2chap = {
+                ex.submit(assemble_chapter_from_cache, subject, chap_id, chap_name): (chap_id, chap_name)
+                for chap_id, chap_name in chapters
+            }
+            for fut in as_completed(fut2chap):
+                chap_id, chap_name = fut2chap[fut]
+                try:
+                    fut.result()
+                except Exception as e:
+                    print(f"[GLOBAL] Assembly failed for {subject} / {chap_id}_{chap_name}: {e}")
+    else:
+        for chap_id, chap_name in chapters:
+            assemble_chapter_from_cache(subject, chap_id, chap_name)
 
     print(f"[GLOBAL] {subject} subject-wide exercise processing + chapter assembly complete.")
 
@@ -743,7 +1316,7 @@ def generate_explanations(
         print(f"[WARN] Invalid cache {out_file.name}, removing and reprocessing")
         try:
             out_file.unlink()
-        except Exception as e:
+        except OSError as e:
             print(f"[WARN] Failed to remove invalid cache {out_file.name}: {e}")
 
     q_file = struct_dir / f"{chapter_id}_{chapter_name}_questions.json"
@@ -752,40 +1325,18 @@ def generate_explanations(
         print(f"Questions file not found: {q_file}")
         return
 
-    questions = json.loads(q_file.read_text(encoding="utf-8"))
+    questions = _load_questions(q_file)
 
     # Load textbook content for context
-    tb_context = ""
-    tb_file_full = raw_dir / f"{chapter_id}_{chapter_name}_textbook.txt"
-    tb_file_content = raw_dir / f"{chapter_id}_{chapter_name}_content.txt"
-
-    if tb_file_full.exists():
-        tb_context = tb_file_full.read_text(encoding="utf-8")[:3000]
-    elif tb_file_content.exists():
-        tb_context = tb_file_content.read_text(encoding="utf-8")[:2000]
-
-    tb_context = normalize_text(tb_context)
+    tb_context = _load_tb_context(str(raw_dir), chapter_id, chapter_name)
 
     # Phase 2: Per-question cache filtering
-    done_ids = set()
-    for cache_path in cache_dir.glob("*.md"):
-        if not _is_valid_markdown_cache(cache_path):
-            print(f"[WARN] Invalid cache {cache_path.name}, removing and reprocessing")
-            try:
-                cache_path.unlink()
-            except Exception as e:
-                print(f"[WARN] Failed to remove invalid cache {cache_path.name}: {e}")
-            continue
-
-        try:
-            done_ids.add(int(cache_path.stem))
-        except ValueError:
-            continue
+    done_ids = _load_done_ids(cache_dir)
     pending_questions = [q for q in questions if q["id"] not in done_ids]
 
     print(f"[{chapter_name}] Total: {len(questions)}, Cached: {len(done_ids)}, Pending: {len(pending_questions)} (parallel {THREADS_PER_PROCESS})...")
 
-    def handle_question(q: Dict[str, Any]) -> Tuple[int, bool]:
+    def handle_question(q: Dict[str, Any], writer: QuestionCacheWriter) -> Tuple[int, bool]:
         q_id, success, err = process_single_question(
             subject,
             chapter_id,
@@ -793,6 +1344,7 @@ def generate_explanations(
             tb_context,
             q,
             cache_dir,
+            writer,
         )
         if success:
             print(f"  - [{chapter_name}] Q{q_id} done.")
@@ -802,8 +1354,8 @@ def generate_explanations(
 
     # Parallel Execution (Chapter Level)
     if pending_questions:
-        with ThreadPoolExecutor(max_workers=THREADS_PER_PROCESS) as ex:
-            fut2id = {ex.submit(handle_question, q): q["id"] for q in pending_questions}
+        with QuestionCacheWriter() as writer, ThreadPoolExecutor(max_workers=THREADS_PER_PROCESS) as ex:
+            fut2id = {ex.submit(handle_question, q, writer): q["id"] for q in pending_questions}
             for fut in as_completed(fut2id):
                 q_id = fut2id[fut]
                 try:
@@ -811,5 +1363,8 @@ def generate_explanations(
                 except Exception as e:
                     print(f"Error processing Q{q_id}: {e}")
 
+        if writer.failed:
+            print(f"[{chapter_name}] {writer.failed} questions could not be written to cache and remain unresolved.")
+
     # Assemble final chapter MD
     assemble_chapter_from_cache(subject, chapter_id, chapter_name)
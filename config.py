@@ -103,6 +103,18 @@ MAX_PROMPT_CHARS = 30000
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 
+# Questions packed into a single LLM request by the exercise pipeline.
+# Set to 1 to disable batching (one request per question).
+BRUSH_BATCH_SIZE = int(os.environ.get("MEDFORGE_BRUSH_BATCH", 4))
+
+# Reuse cached LLM re-segmentation results for unchanged OCR files.
+# Set MEDFORGE_LLM_CACHE=0 to always call the LLM.
+LLM_CACHE_ENABLED = os.environ.get("MEDFORGE_LLM_CACHE", "1") != "0"
+
+# Send an OCR file's remaining LLM re-segmentation retries together instead of
+# one after another. Lower latency, but every retry is sent and billed.
+LLM_RESEG_CONCURRENT_RETRIES = os.environ.get("MEDFORGE_RESEG_CONCURRENT", "0") == "1"
+
 # Subject configuration file
 SUBJECT_CONFIG_FILE = OUTPUT_DIR / "subject_config.json"
 
@@ -9,10 +9,35 @@ Produces three output types per subject:
 """
 
 from __future__ import annotations
+import os
 import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from pathlib import Path
 from config import OUTPUT_DIR, EXERCISES_CHAPTER_SUFFIX, LEGACY_EXERCISES_CHAPTER_SUFFIXES
 
+_CHAPTER_NUM_RE = re.compile(r"(\d+)")
+_SECTION_TMPL = b"\n\n---\n\n## Chapter %s: %s\n\n"
+
+_EXERCISE_SUFFIXES = (EXERCISES_CHAPTER_SUFFIX,) + tuple(LEGACY_EXERCISES_CHAPTER_SUFFIXES)
+
+
+def _suffix_re(suffixes: tuple[str, ...]) -> re.Pattern[str]:
+    """Pattern stripping any of the given suffixes from the end of a stem."""
+    return re.compile("(?:" + "|".join(re.escape(s) for s in suffixes) + ")$")
+
+
+_LECTURE_SUFFIX_RE = _suffix_re(("_lecture_integrated",))
+_KEY_POINTS_SUFFIX_RE = _suffix_re(("_key_points",))
+_EXERCISE_SUFFIX_RE = _suffix_re(_EXERCISE_SUFFIXES)
+
+
+def _chapter_num(stem: str) -> int:
+    """Leading chapter number of a file stem, or 999 when there is none."""
+    match = _CHAPTER_NUM_RE.match(stem)
+    return int(match.group(1)) if match else 999
+
 
 def _sorted_chapter_files(chapter_dir: Path, suffix: str) -> list[Path]:
     """
@@ -23,15 +48,14 @@ def _sorted_chapter_files(chapter_dir: Path, suffix: str) -> list[Path]:
     - Example: "05_cardiovascular_..." -> 5
     - Files without numbers are placed last (chapter=999)
     """
-    files = list(chapter_dir.glob(f"*{suffix}.md"))
-
-    def sort_key(path: Path):
-        stem = path.stem
-        match = re.match(r"(\d+)", stem)
-        chapter_num = int(match.group(1)) if match else 999
-        return chapter_num, stem
+    tail = f"{suffix}.md"
+    with os.scandir(chapter_dir) as it:
+        names = [entry.name for entry in it if entry.name.endswith(tail) and entry.is_file()]
 
-    return sorted(files, key=sort_key)
+    # Sort on plain (int, str, name) tuples; Path objects are only built for the result
+    decorated = [(_chapter_num(name[:-3]), name[:-3], name) for name in names]
+    decorated.sort(key=itemgetter(0, 1))
+    return [chapter_dir / name for _num, _stem, name in decorated]
 
 
 def _sorted_chapter_files_multi(chapter_dir: Path, suffixes: tuple[str, ...]) -> list[Path]:
@@ -40,21 +64,81 @@ def _sorted_chapter_files_multi(chapter_dir: Path, suffixes: tuple[str, ...]) ->
 
     If multiple files map to the same base stem (stem without suffix), earlier suffixes win.
     """
-    files_by_base: dict[str, Path] = {}
+    # base stem -> (suffix rank, path); one directory scan for all suffixes
+    files_by_base: dict[str, tuple[int, Path]] = {}
+
+    with os.scandir(chapter_dir) as it:
+        for entry in it:
+            name = entry.name
+            if not name.endswith(".md") or not entry.is_file():
+                continue
+            stem = name[:-3]
+            for rank, suffix in enumerate(suffixes):
+                if stem.endswith(suffix):
+                    base_stem = stem[:-len(suffix)]
+                    current = files_by_base.get(base_stem)
+                    if current is None or rank < current[0]:
+                        files_by_base[base_stem] = (rank, Path(entry.path))
+                    break
+
+    # Decorate once so sorting compares plain (int, str) keys
+    decorated = [
+        (_chapter_num(base_stem), base_stem, path)
+        for base_stem, (_rank, path) in files_by_base.items()
+    ]
+    decorated.sort(key=itemgetter(0, 1))
+    return [path for _num, _base, path in decorated]
+
+
+def _merge(files: list[Path], header: str, suffix_re: re.Pattern[str], out_path: Path) -> None:
+    """
+    Stream chapter files into one document, each under a "## Chapter" heading.
 
-    for suffix in suffixes:
-        for path in chapter_dir.glob(f"*{suffix}.md"):
-            stem = path.stem
-            base_stem = stem[:-len(suffix)] if stem.endswith(suffix) else stem
-            files_by_base.setdefault(base_stem, path)
+    The suffix matched by `suffix_re` is stripped from the file stem before
+    splitting it into chapter id and name at the first underscore.
+    """
+    with out_path.open("wb") as dst:
+        dst.write(header.encode("utf-8"))
+        for file in files:
+            base_stem = suffix_re.sub("", file.stem, count=1)
+            chapter_id, sep, chapter_name = base_stem.partition("_")
+            if not sep:
+                chapter_name = base_stem
+
+            dst.write(_SECTION_TMPL % (chapter_id.encode("utf-8"), chapter_name.encode("utf-8")))
+            # Chapter files are already UTF-8: copy bytes without a decode/encode round-trip
+            with file.open("rb") as src:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def _merge_lecture(base_dir: Path, chapter_dir: Path, subject: str) -> str:
+    """Lecture Notes: PPT + Textbook integrated."""
+    lecture_files = _sorted_chapter_files(chapter_dir, "_lecture_integrated")
+    if not lecture_files:
+        return f"[ASSEMBLE] {subject}: No lecture files found"
+    output_path = base_dir / f"{subject}_lecture_notes_complete.md"
+    _merge(lecture_files, f"# {subject} - Complete Lecture Notes\n", _LECTURE_SUFFIX_RE, output_path)
+    return f"[ASSEMBLE] Lecture notes merged -> {output_path}"
 
-    def sort_key(item: tuple[str, Path]):
-        base_stem, _path = item
-        match = re.match(r"(\d+)", base_stem)
-        chapter_num = int(match.group(1)) if match else 999
-        return chapter_num, base_stem
 
-    return [path for _base, path in sorted(files_by_base.items(), key=sort_key)]
+def _merge_key_points(base_dir: Path, chapter_dir: Path, subject: str) -> str:
+    """Key Points: Exercise-driven knowledge points."""
+    points_files = _sorted_chapter_files(chapter_dir, "_key_points")
+    if not points_files:
+        return f"[ASSEMBLE] {subject}: No key points files found"
+    output_path = base_dir / f"{subject}_key_points_complete.md"
+    _merge(points_files, f"# {subject} - Key Knowledge Points Summary\n", _KEY_POINTS_SUFFIX_RE, output_path)
+    return f"[ASSEMBLE] Key points merged -> {output_path}"
+
+
+def _merge_exercises(base_dir: Path, chapter_dir: Path, subject: str) -> str:
+    """Exercises: Complete exercise collection with solutions."""
+    exercise_files = _sorted_chapter_files_multi(chapter_dir, _EXERCISE_SUFFIXES)
+    if not exercise_files:
+        return f"[ASSEMBLE] {subject}: No exercise files found"
+    output_path = base_dir / f"{subject}_exercises_complete.md"
+    _merge(exercise_files, f"# {subject} - Complete Exercise Collection\n", _EXERCISE_SUFFIX_RE, output_path)
+    return f"[ASSEMBLE] Exercises merged -> {output_path}"
 
 
 def assemble_subject(subject: str) -> None:
@@ -69,76 +153,17 @@ def assemble_subject(subject: str) -> None:
     base_dir = OUTPUT_DIR / subject
     chapter_dir = base_dir / "chapters"
 
-    if not chapter_dir.exists():
-        print(f"[ASSEMBLE] Skipping {subject}: chapters directory not found")
-        return
-
-    # 1) Lecture Notes: PPT + Textbook integrated
-    lecture_files = _sorted_chapter_files(chapter_dir, "_lecture_integrated")
-    if lecture_files:
-        output_path = base_dir / f"{subject}_lecture_notes_complete.md"
-        parts: list[str] = [f"# {subject} - Complete Lecture Notes\n"]
-
-        for file in lecture_files:
-            name = file.name
-            chapter_id = name.split("_", 1)[0]
-            chapter_name = name.split("_lecture_integrated", 1)[0]
-            if chapter_name.startswith(chapter_id + "_"):
-                chapter_name = chapter_name[len(chapter_id) + 1:]
-
-            parts.append(f"\n\n---\n\n## Chapter {chapter_id}: {chapter_name}\n\n")
-            parts.append(file.read_text(encoding="utf-8"))
-
-        output_path.write_text("".join(parts), encoding="utf-8")
-        print(f"[ASSEMBLE] Lecture notes merged -> {output_path}")
-    else:
-        print(f"[ASSEMBLE] {subject}: No lecture files found")
-
-    # 2) Key Points: Exercise-driven knowledge points
-    points_files = _sorted_chapter_files(chapter_dir, "_key_points")
-    if points_files:
-        output_path = base_dir / f"{subject}_key_points_complete.md"
-        parts = [f"# {subject} - Key Knowledge Points Summary\n"]
-
-        for file in points_files:
-            name = file.name
-            chapter_id = name.split("_", 1)[0]
-            chapter_name = name.split("_key_points", 1)[0]
-            if chapter_name.startswith(chapter_id + "_"):
-                chapter_name = chapter_name[len(chapter_id) + 1:]
-
-            parts.append(f"\n\n---\n\n## Chapter {chapter_id}: {chapter_name}\n\n")
-            parts.append(file.read_text(encoding="utf-8"))
-
-        output_path.write_text("".join(parts), encoding="utf-8")
-        print(f"[ASSEMBLE] Key points merged -> {output_path}")
-    else:
-        print(f"[ASSEMBLE] {subject}: No key points files found")
-
-    # 3) Exercises: Complete exercise collection with solutions
-    exercises_suffixes = (EXERCISES_CHAPTER_SUFFIX,) + tuple(LEGACY_EXERCISES_CHAPTER_SUFFIXES)
-    exercise_files = _sorted_chapter_files_multi(chapter_dir, exercises_suffixes)
-    if exercise_files:
-        output_path = base_dir / f"{subject}_exercises_complete.md"
-        parts = [f"# {subject} - Complete Exercise Collection\n"]
-
-        for file in exercise_files:
-            stem = file.stem
-            base_stem = stem
-            for suffix in exercises_suffixes:
-                if base_stem.endswith(suffix):
-                    base_stem = base_stem.removesuffix(suffix)
-                    break
-
-            chapter_id = base_stem.split("_", 1)[0]
-            chapter_name = base_stem
-            if chapter_name.startswith(chapter_id + "_"):
-                chapter_name = chapter_name[len(chapter_id) + 1:]
-
-            parts.append(f"\n\n---\n\n## Chapter {chapter_id}: {chapter_name}\n\n")
-            parts.append(file.read_text(encoding="utf-8"))
-
-        output_path.write_text("".join(parts), encoding="utf-8")
-        print(f"[ASSEMBLE] Exercises merged -> {output_path}")
-    else:
-        print(f"[ASSEMBLE] {subject}: No exercise files found")
+    # The three documents share no state; overlap their file I/O
+    merges = (_merge_lecture, _merge_key_points, _merge_exercises)
+    with ThreadPoolExecutor(max_workers=len(merges)) as ex:
+        futures = [ex.submit(fn, base_dir, chapter_dir, subject) for fn in merges]
+        try:
+            messages = [future.result() for future in futures]
+        except FileNotFoundError:
+            # Raised by the directory scans; no upfront exists() check needed
+            print(f"[ASSEMBLE] Skipping {subject}: chapters directory not found")
+            return
+
+    # Report in a fixed order so the log reads the same as a serial run
+    for message in messages:
+        print(message)
@@ -5,10 +5,16 @@ Unified interface for multiple LLM providers with smart routing and failover.
 Supports Google Gemini, Anthropic Claude, and OpenAI GPT models.
 """
 
+import asyncio
+import functools
+import hashlib
 import os
+import random
+import re
 import time
 import threading
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 from abc import ABC, abstractmethod
 
@@ -27,7 +33,12 @@ from utils_text import truncate_text
 logger = logging.getLogger("medforge.llm")
 logger.setLevel(logging.INFO)
 
-if not logger.handlers:
+
+@functools.lru_cache(maxsize=1)
+def _ensure_log_handler() -> None:
+    """Attach the per-process log file on first use rather than at import."""
+    if logger.handlers:
+        return
     LOG_DIR.mkdir(parents=True, exist_ok=True)
     file_handler = logging.FileHandler(LOG_DIR / f"llm_client_{os.getpid()}.log", encoding="utf-8")
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -80,18 +91,21 @@ class GeminiProvider(LLMProvider):
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = _normalize_api_key(api_key) or _normalize_api_key(os.environ.get("GEMINI_API_KEY"))
         self._client = None
+        self._client_lock = threading.Lock()
 
     def is_available(self) -> bool:
         return bool(self.api_key)
 
     def _get_client(self):
         if self._client is None:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=self.api_key)
-                self._client = genai
-            except ImportError:
-                raise ImportError("google-generativeai package not installed")
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        import google.generativeai as genai
+                        genai.configure(api_key=self.api_key)
+                        self._client = genai
+                    except ImportError:
+                        raise ImportError("google-generativeai package not installed")
         return self._client
 
     def call(self, prompt: str, model: str = "gemini-1.5-pro") -> str:
@@ -107,17 +121,20 @@ class AnthropicProvider(LLMProvider):
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = _normalize_api_key(api_key) or _normalize_api_key(os.environ.get("ANTHROPIC_API_KEY"))
         self._client = None
+        self._client_lock = threading.Lock()
 
     def is_available(self) -> bool:
         return bool(self.api_key)
 
     def _get_client(self):
         if self._client is None:
-            try:
-                import anthropic
-                self._client = anthropic.Anthropic(api_key=self.api_key)
-            except ImportError:
-                raise ImportError("anthropic package not installed")
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        import anthropic
+                        self._client = anthropic.Anthropic(api_key=self.api_key)
+                    except ImportError:
+                        raise ImportError("anthropic package not installed")
         return self._client
 
     def call(self, prompt: str, model: str = "claude-3-5-sonnet-20241022") -> str:
@@ -136,17 +153,20 @@ class OpenAIProvider(LLMProvider):
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = _normalize_api_key(api_key) or _normalize_api_key(os.environ.get("OPENAI_API_KEY"))
         self._client = None
+        self._client_lock = threading.Lock()
 
     def is_available(self) -> bool:
         return bool(self.api_key)
 
     def _get_client(self):
         if self._client is None:
-            try:
-                import openai
-                self._client = openai.OpenAI(api_key=self.api_key)
-            except ImportError:
-                raise ImportError("openai package not installed")
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        import openai
+                        self._client = openai.OpenAI(api_key=self.api_key)
+                    except ImportError:
+                        raise ImportError("openai package not installed")
         return self._client
 
     def call(self, prompt: str, model: str = "gpt-4o") -> str:
@@ -169,11 +189,29 @@ PROVIDERS = {
 }
 
 
+# Model name -> provider name, and the fallback order, built once from config
+_MODEL_TO_PROVIDER = {m["name"]: m["provider"] for m in FALLBACK_MODELS}
+_FALLBACK_NAMES = [m["name"] for m in FALLBACK_MODELS]
+
+# All quota keywords in one case-insensitive pattern: a single scan per error
+_QUOTA_RE = re.compile("|".join(re.escape(k) for k in QUOTA_KEYWORDS), re.IGNORECASE) if QUOTA_KEYWORDS else None
+
+# Provider instances are reused so SDK clients keep their HTTP connection pools
+_PROVIDER_CACHE: dict[tuple[str, Optional[str]], LLMProvider] = {}
+_PROVIDER_CACHE_LOCK = threading.Lock()
+
+
 def get_provider(provider_name: str, api_key: Optional[str] = None) -> LLMProvider:
-    """Get an LLM provider instance by name."""
+    """Get a (cached) LLM provider instance by name."""
     if provider_name not in PROVIDERS:
         raise ValueError(f"Unknown provider: {provider_name}")
-    return PROVIDERS[provider_name](api_key=api_key)
+    key = (provider_name, api_key)
+    with _PROVIDER_CACHE_LOCK:
+        instance = _PROVIDER_CACHE.get(key)
+        if instance is None:
+            instance = PROVIDERS[provider_name](api_key=api_key)
+            _PROVIDER_CACHE[key] = instance
+    return instance
 
 
 # =============================================================================
@@ -199,14 +237,18 @@ class ModelRouter:
         self.requests_since_fallback = 0
         self._lock = threading.Lock()
 
-    def should_retry_primary(self) -> bool:
+    def should_retry_primary(self, now: Optional[float] = None) -> bool:
         """Check if we should attempt to route back to primary model."""
+        # Monotonic clock: wall-clock steps must not skew cooldowns
+        # Lock-free fast path: reading one attribute is atomic under the GIL
+        if self.current_model == DEFAULT_MODEL:
+            return False
+        if now is None:
+            now = time.monotonic()
         with self._lock:
             if self.current_model == DEFAULT_MODEL:
                 return False
 
-            now = time.time()
-
             # Exponential backoff check
             if self.last_primary_attempt:
                 cooldown = min(
@@ -239,7 +281,7 @@ class ModelRouter:
     def mark_primary_failed(self) -> None:
         """Called when primary model fails."""
         with self._lock:
-            self.last_primary_attempt = time.time()
+            self.last_primary_attempt = time.monotonic()
             self.primary_fail_count += 1
             self.requests_since_fallback = 0
 
@@ -249,13 +291,12 @@ class ModelRouter:
             if self.current_model != model:
                 self.current_model = model
                 if model != DEFAULT_MODEL and not self.fallback_start_time:
-                    self.fallback_start_time = time.time()
+                    self.fallback_start_time = time.monotonic()
             self.requests_since_fallback += 1
 
     def get_current_model(self) -> str:
-        """Thread-safe getter for current model."""
-        with self._lock:
-            return self.current_model
+        """Getter for current model; writes happen under the lock, reads need none."""
+        return self.current_model
 
 
 # Global router instance
@@ -266,6 +307,26 @@ model_router = ModelRouter()
 # Main API Functions
 # =============================================================================
 
+# Set on pipeline abort so threads sleeping between retries wake up immediately
+_shutdown_event = threading.Event()
+
+
+def shutdown() -> None:
+    """Abort pending retry waits and stop new requests in all threads (e.g. on Ctrl+C)."""
+    global _PROBE_POOL
+    _shutdown_event.set()
+    pool, _PROBE_POOL = _PROBE_POOL, None
+    if pool is not None:
+        # A queued probe still runs (and releases _PROBE_LOCK), but call_llm
+        # returns at once now that the event is set
+        pool.shutdown(wait=False)
+
+
+def shutdown_requested() -> bool:
+    """Whether shutdown() has been called in this process."""
+    return _shutdown_event.is_set()
+
+
 def call_llm(
     prompt: str,
     model: Optional[str] = None,
@@ -284,35 +345,34 @@ def call_llm(
         api_key: Optional API key override (preferred over environment variables)
 
     Returns:
-        Model response text, or None if all retries failed
+        Model response text, or None if all retries failed or shutdown() was called
 
     Raises:
         QuotaExhausted: If API quota is exhausted
     """
+    _ensure_log_handler()
     model = model or DEFAULT_MODEL
 
     # Find provider from model config if not specified
     if not provider:
-        for fm in FALLBACK_MODELS:
-            if fm["name"] == model:
-                provider = fm["provider"]
-                break
-        if not provider:
-            provider = "google"  # Default to Gemini
+        provider = _MODEL_TO_PROVIDER.get(model, "google")  # Default to Gemini
 
     llm_provider = get_provider(provider, api_key=api_key)
 
     if not llm_provider.is_available():
         raise ModelUnavailable(f"Provider {provider} is not configured")
 
-    start_time = time.time()
+    start_time = time.monotonic()
     last_error = None
 
     for attempt in range(max_retries):
+        if _shutdown_event.is_set():
+            logger.info(f"Call to {model} skipped: shutdown requested")
+            return None
         try:
             result = llm_provider.call(prompt, model)
 
-            duration = time.time() - start_time
+            duration = time.monotonic() - start_time
             if duration > 10:
                 logger.info(f"LLM call completed: model={model}, duration={duration:.1f}s")
 
@@ -320,21 +380,74 @@ def call_llm(
 
         except Exception as e:
             last_error = e
-            error_msg = str(e).lower()
 
             # Check for quota exhaustion
-            if any(kw in error_msg for kw in QUOTA_KEYWORDS):
+            if _QUOTA_RE is not None and _QUOTA_RE.search(str(e)):
                 raise QuotaExhausted(f"Quota exhausted for {model}: {e}")
 
             logger.warning(f"Attempt {attempt + 1}/{max_retries} failed for {model}: {e}")
 
             if attempt < max_retries - 1:
-                time.sleep(RETRY_DELAY * (attempt + 1))
+                # Jittered exponential backoff so parallel workers don't retry in lockstep
+                delay = min(ROUTING_CONFIG["max_cooldown"], RETRY_DELAY * (2 ** attempt))
+                if _shutdown_event.wait(delay * random.uniform(0.5, 1.0)):
+                    logger.info(f"Retries for {model} abandoned: shutdown requested")
+                    return None
 
     logger.error(f"All {max_retries} attempts failed for {model}: {last_error}")
     return None
 
 
+# At most one primary-model probe in flight across all worker threads; the
+# pool is created on first use and shut down by shutdown()
+_PROBE_POOL: Optional[ThreadPoolExecutor] = None
+_PROBE_LOCK = threading.Lock()
+
+# Health-check prompt: the probe never resends the caller's prompt, so a
+# probed request is not billed twice
+_PROBE_PROMPT = "Reply with the single word OK."
+
+
+def _probe_primary(request_id: str, api_key: Optional[str]) -> bool:
+    """Health-check the primary model and update router state; releases _PROBE_LOCK."""
+    try:
+        result = call_llm(_PROBE_PROMPT, model=DEFAULT_MODEL, max_retries=1, api_key=api_key)
+        if result:
+            logger.info(f"[{request_id}] Primary model restored successfully")
+            model_router.mark_primary_success()
+            return True
+    except QuotaExhausted:
+        logger.info(f"[{request_id}] Primary model still quota-limited")
+        model_router.mark_primary_failed()
+    except Exception as e:
+        logger.warning(f"[{request_id}] Primary model check failed: {e}")
+        model_router.mark_primary_failed()
+    finally:
+        _PROBE_LOCK.release()
+    return False
+
+
+def _start_primary_probe(request_id: str, api_key: Optional[str]) -> Optional[Future]:
+    """Start a background primary-model health check unless one is already running."""
+    global _PROBE_POOL
+    if not _PROBE_LOCK.acquire(blocking=False):
+        return None
+    logger.info(f"[{request_id}] Attempting to restore primary model: {DEFAULT_MODEL}")
+    try:
+        if _PROBE_POOL is None:
+            _PROBE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-primary-probe")
+        return _PROBE_POOL.submit(_probe_primary, request_id, api_key)
+    except RuntimeError:
+        # Pool shut down by shutdown() or at interpreter exit
+        _PROBE_LOCK.release()
+        return None
+
+
+# prompt hash -> Future shared by concurrent callers with the same prompt
+_INFLIGHT: dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
 def call_llm_with_smart_routing(
     prompt: str,
     request_id: str = "unknown",
@@ -357,15 +470,44 @@ def call_llm_with_smart_routing(
         debug_id: Alias for request_id (kept for backwards compatibility)
 
     Returns:
-        Model response text
+        Model response text, or None once shutdown() has been called
 
     Raises:
         QuotaExhausted: If all models are exhausted
     """
-    global model_router
+    _ensure_log_handler()
     if debug_id:
         request_id = debug_id
 
+    # Identical prompts already in flight share one request
+    key = hashlib.blake2b(
+        f"{api_key or ''}\x00{prompt or ''}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        owner = fut is None
+        if owner:
+            fut = Future()
+            _INFLIGHT[key] = fut
+    if not owner:
+        logger.info(f"[{request_id}] Joining identical in-flight request")
+        return fut.result()
+
+    try:
+        result = _route_llm_call(prompt, request_id, api_key)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+
+def _route_llm_call(prompt: str, request_id: str, api_key: Optional[str]) -> Optional[str]:
+    """Smart-routing body of `call_llm_with_smart_routing` for one prompt."""
     prompt_len = len(prompt) if prompt else 0
     if prompt and prompt_len > MAX_PROMPT_CHARS:
         prompt, _ = truncate_text(prompt, MAX_PROMPT_CHARS)
@@ -374,41 +516,34 @@ def call_llm_with_smart_routing(
             f"(limit {MAX_PROMPT_CHARS})"
         )
 
-    # Try routing back to primary if conditions are met
+    if _shutdown_event.is_set():
+        logger.info(f"[{request_id}] Skipped: shutdown requested")
+        return None
+
+    # Health-check the primary model in the background while this request uses
+    # the current chain; later requests go back to the primary if it passes
+    probe = None
     if model_router.should_retry_primary():
-        logger.info(f"[{request_id}] Attempting to restore primary model: {DEFAULT_MODEL}")
-        try:
-            result = call_llm(prompt, model=DEFAULT_MODEL, max_retries=2, api_key=api_key)
-            if result:
-                logger.info(f"[{request_id}] Primary model restored successfully")
-                model_router.mark_primary_success()
-                return result
-        except QuotaExhausted:
-            logger.info(f"[{request_id}] Primary model still quota-limited")
-            model_router.mark_primary_failed()
-        except Exception as e:
-            logger.warning(f"[{request_id}] Primary model check failed: {e}")
-            model_router.mark_primary_failed()
+        probe = _start_primary_probe(request_id, api_key)
 
     # Build candidate model list
     current_model = model_router.get_current_model()
-    fallback_names = [m["name"] for m in FALLBACK_MODELS]
-    candidate_models = [current_model] + [m for m in fallback_names if m != current_model]
+    candidate_models = [current_model] + [m for m in _FALLBACK_NAMES if m != current_model]
 
     # Try each model in order
     for model in candidate_models:
+        if _shutdown_event.is_set():
+            # Don't walk the rest of the fallback chain after Ctrl+C
+            logger.info(f"[{request_id}] Remaining models skipped: shutdown requested")
+            return None
         try:
-            # Find provider for this model
-            provider = None
-            for fm in FALLBACK_MODELS:
-                if fm["name"] == model:
-                    provider = fm["provider"]
-                    break
-
+            provider = _MODEL_TO_PROVIDER.get(model)
             result = call_llm(prompt, model=model, provider=provider, max_retries=RETRIES_PER_MODEL, api_key=api_key)
 
             if result:
-                model_router.switch_to_fallback(model)
+                # Don't undo a primary restore that finished while this call ran
+                if probe is None or not probe.done() or not probe.result():
+                    model_router.switch_to_fallback(model)
                 if model == DEFAULT_MODEL:
                     model_router.mark_primary_success()
                 return result
@@ -423,3 +558,26 @@ def call_llm_with_smart_routing(
 
     logger.error(f"[{request_id}] All models failed")
     raise QuotaExhausted("All available models failed or are out of quota")
+
+
+async def acall_llm_with_smart_routing(
+    prompt: str,
+    request_id: str = "unknown",
+    api_key: Optional[str] = None,
+    *,
+    debug_id: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Awaitable variant of `call_llm_with_smart_routing` for asyncio callers.
+
+    Provider SDK calls are blocking, so the request runs in a worker thread while
+    sharing the same router state. Callers bound in-flight requests themselves
+    (e.g. with an `asyncio.Semaphore`).
+    """
+    return await asyncio.to_thread(
+        call_llm_with_smart_routing,
+        prompt,
+        request_id,
+        api_key,
+        debug_id=debug_id,
+    )
@@ -31,6 +31,8 @@ def main():
         return 0
 
     except KeyboardInterrupt:
+        from llm_client import shutdown
+        shutdown()
         print("\nProcessing interrupted by user")
         return 130
 
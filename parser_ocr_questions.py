@@ -5,31 +5,62 @@ Parses OCR text from exercise files into structured question format.
 Uses LLM fallback for re-segmentation when parsing quality is poor.
 """
 
+import asyncio
+import hashlib
+import io
 import re
 import json
-import concurrent.futures
+from collections import Counter
+from dataclasses import dataclass, field
 from pathlib import Path
  
-from config import OUTPUT_DIR
+from config import OUTPUT_DIR, LLM_CACHE_ENABLED, LLM_RESEG_CONCURRENT_RETRIES
 from status_manager import SubjectStatusManager
-from utils_fs import atomic_write_json
+from utils_fs import atomic_write_bytes, atomic_write_json
 from utils_text import normalize_text
-from llm_client import call_llm_with_smart_routing
+from llm_client import acall_llm_with_smart_routing, call_llm_with_smart_routing
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used otherwise
+    orjson = None
+
+try:
+    import re2
+except ImportError:  # Optional speedup; stdlib re is used otherwise
+    re2 = None
 
 MAX_LLM_RESEG_ATTEMPTS = 3
 
+# Compiled once per process; parse_file runs for every exercise file
+_ANSWER_SPLIT_RE = re.compile(
+    r'(?:^|\n)\s*(?:Chapter|Section|Part)\s*\d*\s*(?:Answer|Solution|Key)',
+    re.IGNORECASE
+)
+_MCQ_ANS_RE = re.compile(r'(?:^|\s|、|．|\.)(\d+)\s*[\.．、\s]\s*([A-E]{1,5})(?![a-z])')
+# Option line (groups 1-2) or question start (groups 3-4), one match per line.
+# RE2 is used when installed; lines are NFKC-normalized, so its ASCII \s/\d suffice.
+_LINE_RE = (re2 or re).compile(r'^\s*(?:([A-E])\s*[\.．、](.*)|(\d+)\s*[\.．、](.*))')
+_CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
 
 def read_text_safely(path: Path) -> str:
     """
     Try multiple common encodings to read file, avoiding data loss.
     """
+    # Read once; each candidate encoding only re-decodes the in-memory bytes
+    data = path.read_bytes()
     for enc in ("utf-8", "gbk", "gb18030"):
         try:
-            return path.read_text(encoding=enc)
+            text = data.decode(enc)
+            break
         except UnicodeDecodeError:
             continue
-    # Fallback with ignore
-    return path.read_text(encoding="utf-8", errors="ignore")
+    else:
+        # Fallback with ignore
+        text = data.decode("utf-8", errors="ignore")
+    # Match read_text()'s universal-newline translation
+    return text.replace("\r\n", "\n").replace("\r", "\n")
 
 
 def _repair_order_and_ids(questions: list[dict]) -> list[dict]:
@@ -42,19 +73,12 @@ def _repair_order_and_ids(questions: list[dict]) -> list[dict]:
     if not questions:
         return questions
 
-    # Add index for stable sort
-    for idx, q in enumerate(questions):
-        q["_index"] = idx
-
-    questions_sorted = sorted(
-        questions,
-        key=lambda q: (q.get("id", 0), q["_index"])
-    )
+    # sorted() is stable: questions sharing an ID keep their parse order
+    questions_sorted = sorted(questions, key=lambda q: q.get("id", 0))
 
     for new_id, q in enumerate(questions_sorted, 1):
         q["raw_id"] = q["id"]  # Preserve original question number for reference
         q["id"] = new_id       # Pipeline uses consecutive IDs internally
-        q.pop("_index", None)
 
     return questions_sorted
 
@@ -63,16 +87,18 @@ def parse_file(file_path: Path) -> list[dict]:
     """
     Parse OCR text file into structured questions.
     """
+    return parse_file_from_text(file_path, read_text_safely(file_path))
+
+
+def parse_file_from_text(file_path: Path, raw: str) -> list[dict]:
+    """
+    Parse already-read OCR text of `file_path` into structured questions.
+    """
     print(f"Parsing {file_path}")
-    raw = read_text_safely(file_path)
     content = normalize_text(raw)
 
     # 1. Locate Answer Section (supports various chapter formats)
-    split_match = re.search(
-        r'(?:^|\n)\s*(?:Chapter|Section|Part)\s*\d*\s*(?:Answer|Solution|Key)',
-        content,
-        re.IGNORECASE
-    )
+    split_match = _ANSWER_SPLIT_RE.search(content)
 
     if split_match:
         questions_part = content[:split_match.start()]
@@ -82,70 +108,100 @@ def parse_file(file_path: Path) -> list[dict]:
         answers_part = ""
 
     # 2. Extract Answers (MCQ only: ID + A-E, supports multi-select like ABC)
-    answer_map = {}
-    ans_matches = re.findall(r'(?:^|\s|、|．|\.)(\d+)\s*[\.．、\s]\s*([A-E]{1,5})(?![a-z])', answers_part)
-    for num, ans in ans_matches:
-        answer_map[int(num)] = ans
+    answer_map = {int(m[1]): m[2] for m in _MCQ_ANS_RE.finditer(answers_part)}
 
     # 3. Parse Questions
     questions = []
-    lines = questions_part.split('\n')
-    current_q = None
-
-    q_start_pattern = re.compile(r'^\s*(\d+)\s*[\.．、](.*)')
-    opt_pattern = re.compile(r'^\s*([A-E])\s*[\.．、](.*)')
+    # The question being read lives in locals; its output dict is only built
+    # once it is known to be kept, in its final shape
+    q_id = None
+    stem_parts: list[str] = []
+    options: dict[str, str] = {}
+    last_opt = None
+    raw_lines: list[str] = []
+
+    def _finish() -> None:
+        # Filter: Only keep if it has options (MCQ)
+        if options:
+            questions.append({
+                "id": q_id,
+                "stem": " ".join(stem_parts),
+                "options": options,
+                "raw_block": "\n".join(raw_lines),
+                "raw_answer": answer_map.get(q_id, ""),
+                "raw_expl": "",
+                "flags": []
+            })
 
-    for line in lines:
-        line = line.strip()
+    for raw_line in io.StringIO(questions_part):
+        line = raw_line.strip()
         if not line:
             continue
 
-        opt_match = opt_pattern.match(line)
-        if opt_match and current_q:
-            label = opt_match.group(1)
-            text = opt_match.group(2).strip()
-            current_q['options'][label] = text
-            current_q['raw_block'] += "\n" + line
+        line_match = _LINE_RE.match(line)
+        opt_label = line_match.group(1) if line_match else None
+        if opt_label and q_id is not None:
+            text = line_match.group(2).strip()
+            if opt_label not in options:
+                last_opt = opt_label
+            options[opt_label] = text
+            raw_lines.append(line)
             continue
 
-        q_match = q_start_pattern.match(line)
-        if q_match:
-            if current_q:
-                # Filter: Only keep if it has options (MCQ)
-                if current_q['options']:
-                    questions.append(current_q)
+        if line_match and line_match.group(3):
+            if q_id is not None:
+                _finish()
 
-            q_id = int(q_match.group(1))
-            q_stem = q_match.group(2).strip()
-            ans = answer_map.get(q_id, "")
-
-            current_q = {
-                "id": q_id,
-                "stem": q_stem,
-                "options": {},
-                "raw_block": line,
-                "raw_answer": ans,
-                "raw_expl": "",
-                "flags": []
-            }
+            q_id = int(line_match.group(3))
+            stem_parts = [line_match.group(4).strip()]
+            options = {}
+            last_opt = None
+            raw_lines = [line]
             continue
 
-        if current_q:
-            if current_q['options']:
-                last_key = list(current_q['options'].keys())[-1]
-                current_q['options'][last_key] += " " + line
+        if q_id is not None:
+            if options:
+                options[last_opt] += " " + line
             else:
-                current_q['stem'] += " " + line
-            current_q['raw_block'] += "\n" + line
+                stem_parts.append(line)
+            raw_lines.append(line)
 
-    if current_q and current_q['options']:
-        questions.append(current_q)
+    if q_id is not None:
+        _finish()
 
     # Normalize order after parsing
     questions = _repair_order_and_ids(questions)
     return questions
 
 
+@dataclass
+class _QualityStats:
+    """Per-chapter parse quality figures gathered in one pass."""
+    n: int = 0
+    unique_ids: int = 0
+    dup_ids: list[int] = field(default_factory=list)
+    non_inc: list[tuple[int, int]] = field(default_factory=list)
+    missing_opts: list[int] = field(default_factory=list)
+
+
+def _compute_quality_stats(questions: list[dict]) -> _QualityStats:
+    """Count duplicate IDs, non-increasing edges and option-less questions in one pass."""
+    stats = _QualityStats(n=len(questions))
+    id_counts: Counter = Counter()
+    prev_id = None
+    for q in questions:
+        qid = q["id"]
+        id_counts[qid] += 1
+        if prev_id is not None and prev_id >= qid:
+            stats.non_inc.append((prev_id, qid))
+        prev_id = qid
+        if len(q.get("options", {})) < 2:
+            stats.missing_opts.append(qid)
+    stats.unique_ids = len(id_counts)
+    stats.dup_ids = [i for i, c in id_counts.items() if c > 1]
+    return stats
+
+
 def _needs_llm_repair(questions: list[dict]) -> bool:
     """
     Relaxed quality check: only call LLM when severely broken.
@@ -157,22 +213,17 @@ def _needs_llm_repair(questions: list[dict]) -> bool:
     if not questions:
         return True
 
-    ids = [q["id"] for q in questions]
-    n = len(ids)
+    stats = _compute_quality_stats(questions)
+    n = stats.n
 
     # Duplicate ID ratio
-    dup_ratio = 1 - (len(set(ids)) / n)
+    dup_ratio = 1 - (stats.unique_ids / n)
 
     # Missing options ratio
-    missing_opts_ratio = sum(
-        1 for q in questions if len(q.get("options", {})) < 2
-    ) / n
+    missing_opts_ratio = len(stats.missing_opts) / n
 
     # Non-strictly-increasing edge ratio
-    non_inc_count = sum(
-        1 for i in range(n - 1) if ids[i] >= ids[i + 1]
-    )
-    non_inc_ratio = non_inc_count / max(n - 1, 1)
+    non_inc_ratio = len(stats.non_inc) / max(n - 1, 1)
 
     if missing_opts_ratio > 0.3:
         return True
@@ -189,17 +240,14 @@ def _quality_report(questions: list[dict]) -> str:
     """Return simple quality issue description for LLM retry prompt."""
     if not questions:
         return "No questions parsed."
-    ids = [q["id"] for q in questions]
-    dup_ids = [i for i in ids if ids.count(i) > 1]
-    non_inc = [f"{ids[i]}->{ids[i+1]}" for i in range(len(ids)-1) if ids[i] >= ids[i+1]]
-    missing_opts = [q["id"] for q in questions if len(q.get("options", {})) < 2]
+    stats = _compute_quality_stats(questions)
     issues = []
-    if dup_ids:
-        issues.append(f"Duplicate IDs: {sorted(set(dup_ids))}")
-    if non_inc:
-        issues.append(f"Non-increasing IDs: {non_inc[:5]}")
-    if missing_opts:
-        issues.append(f"Questions missing options: {missing_opts[:10]}")
+    if stats.dup_ids:
+        issues.append(f"Duplicate IDs: {sorted(stats.dup_ids)}")
+    if stats.non_inc:
+        issues.append(f"Non-increasing IDs: {[f'{a}->{b}' for a, b in stats.non_inc[:5]]}")
+    if stats.missing_opts:
+        issues.append(f"Questions missing options: {stats.missing_opts[:10]}")
     if not issues:
         issues.append("No obvious issues but quality check failed.")
     return "; ".join(issues)
@@ -217,7 +265,7 @@ def _extract_json_array_from_text(resp: str) -> str | None:
 
     # 1) Prefer extracting from code fence
     if "```" in text:
-        m = re.search(r"```(?:json)?\s*(.*?)\s*```", text, re.DOTALL)
+        m = _CODE_FENCE_RE.search(text)
         if m:
             inner = m.group(1).strip()
             if inner.startswith("[") and inner.endswith("]"):
@@ -233,14 +281,12 @@ def _extract_json_array_from_text(resp: str) -> str | None:
     return text[start:end + 1]
 
 
-def llm_resegment(file_path: Path, feedback: str = "") -> list[dict] | None:
+def _build_reseg_prompt(raw: str, feedback: str = "", variant: int = 0) -> str:
     """
-    Call LLM to re-segment entire chapter's questions.
+    Prompt asking the LLM to re-segment a chapter's raw OCR text.
 
-    Returns:
-        Normalized questions list on success, None on failure.
+    A non-zero `variant` tags concurrent retries so they are distinct requests.
     """
-    raw = file_path.read_text(encoding="utf-8", errors="ignore")
     prompt = f"""You are an OCR post-processing assistant. Extract multiple-choice questions from the raw OCR text below and output a JSON array (without code block markers).
 
 Each element should contain:
@@ -259,65 +305,155 @@ Raw text:
 """
     if feedback:
         prompt = f"{prompt}\n\n[Previous parsing issues] {feedback}\nPlease fix these issues in your output."
+    if variant:
+        prompt = f"{prompt}\n\n(Independent retry #{variant}: re-read the raw text from the start.)"
+    return prompt
+
+
+def _parse_reseg_response(resp: str | None, file_path: Path) -> list[dict] | None:
+    """Normalize an LLM re-segmentation response into question dicts."""
+    if not resp:
+        return None
+
+    json_text = _extract_json_array_from_text(resp)
+    if not json_text:
+        preview = resp.replace("\n", "\\n")[:200]
+        print(f"[LLM-SEG] {file_path.name}: No JSON array found in output. First 200 chars: {preview!r}")
+        return None
 
     try:
-        resp = call_llm_with_smart_routing(
-            prompt,
-            debug_id=f"LLM-SEG-{file_path.name}"
-        )
-        if not resp:
-            return None
+        data = json.loads(json_text)
+    except json.JSONDecodeError as e:
+        preview = json_text.replace("\n", "\\n")[:200]
+        print(f"[LLM-SEG] {file_path.name}: JSON parse failed: {e}. First 200 chars: {preview!r}")
+        return None
 
-        json_text = _extract_json_array_from_text(resp)
-        if not json_text:
-            preview = resp.replace("\n", "\\n")[:200]
-            print(f"[LLM-SEG] {file_path.name}: No JSON array found in output. First 200 chars: {preview!r}")
-            return None
+    if not isinstance(data, list):
+        print(f"[LLM-SEG] {file_path.name}: Result is not a list, got {type(data)}")
+        return None
 
+    # Normalize fields
+    normalized = []
+    for item in data:
         try:
-            data = json.loads(json_text)
-        except json.JSONDecodeError as e:
-            preview = json_text.replace("\n", "\\n")[:200]
-            print(f"[LLM-SEG] {file_path.name}: JSON parse failed: {e}. First 200 chars: {preview!r}")
-            return None
-
-        if not isinstance(data, list):
-            print(f"[LLM-SEG] {file_path.name}: Result is not a list, got {type(data)}")
-            return None
-
-        # Normalize fields
-        normalized = []
-        for item in data:
-            try:
-                qid = int(item.get("id"))
-            except Exception:
-                # Skip items without valid ID
-                continue
+            qid = int(item.get("id"))
+        except Exception:
+            # Skip items without valid ID
+            continue
 
-            stem = (item.get("stem") or "").strip()
-            options = item.get("options") or {}
-            if not isinstance(options, dict):
-                options = {}
+        stem = (item.get("stem") or "").strip()
+        options = item.get("options") or {}
+        if not isinstance(options, dict):
+            options = {}
 
-            raw_answer = (item.get("raw_answer") or "").strip()
+        raw_answer = (item.get("raw_answer") or "").strip()
 
-            normalized.append({
-                "id": qid,
-                "stem": stem,
-                "options": options,
-                "raw_block": "",
-                "raw_answer": raw_answer,
-                "raw_expl": "",
-                "flags": ["llm_resegment"],
-            })
+        normalized.append({
+            "id": qid,
+            "stem": stem,
+            "options": options,
+            "raw_block": "",
+            "raw_answer": raw_answer,
+            "raw_expl": "",
+            "flags": ["llm_resegment"],
+        })
+
+    return normalized
+
+
+def _reseg_cache_path(cache_dir: Path | None, raw: str, feedback: str) -> Path | None:
+    """Cache file for a re-segmentation of `raw` with `feedback`, or None when disabled."""
+    if cache_dir is None or not LLM_CACHE_ENABLED:
+        return None
+    digest = hashlib.sha256(raw.encode("utf-8") + b"\x00" + feedback.encode("utf-8")).hexdigest()
+    return cache_dir / f"{digest}.json"
+
+
+def _load_reseg_cache(cache_path: Path | None) -> list[dict] | None:
+    if cache_path is None:
+        return None
+    try:
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, list) else None
+
+
+def _store_reseg_cache(cache_path: Path | None, questions: list[dict] | None) -> None:
+    # Only results that pass the quality check are cached: a cached bad answer
+    # would be replayed on every re-run instead of asking the LLM again
+    if cache_path is None or not questions or _needs_llm_repair(questions):
+        return
+    try:
+        atomic_write_json(cache_path, questions, ensure_ascii=False, indent=None)
+    except OSError as e:
+        print(f"[LLM-SEG] Failed to write cache {cache_path.name}: {e}")
 
+
+def llm_resegment(file_path: Path, feedback: str = "", cache_dir: Path | None = None) -> list[dict] | None:
+    """
+    Call LLM to re-segment entire chapter's questions.
+
+    Results that pass the quality check are cached under `cache_dir` keyed on
+    the raw text and feedback, so unchanged OCR files skip the LLM on re-runs.
+
+    Returns:
+        Normalized questions list on success, None on failure.
+    """
+    try:
+        raw = file_path.read_text(encoding="utf-8", errors="ignore")
+        cache_path = _reseg_cache_path(cache_dir, raw, feedback)
+        cached = _load_reseg_cache(cache_path)
+        if cached is not None:
+            print(f"[LLM-SEG] {file_path.name}: using cached re-segmentation")
+            return cached
+        resp = call_llm_with_smart_routing(
+            _build_reseg_prompt(raw, feedback),
+            debug_id=f"LLM-SEG-{file_path.name}"
+        )
+        normalized = _parse_reseg_response(resp, file_path)
+        _store_reseg_cache(cache_path, normalized)
         return normalized
+    except Exception as e:
+        print(f"[LLM-SEG] Failed on {file_path.name}: {e}")
+        return None
 
+
+async def allm_resegment(
+    file_path: Path,
+    feedback: str = "",
+    cache_dir: Path | None = None,
+    variant: int = 0,
+) -> list[dict] | None:
+    """Awaitable `llm_resegment`: the LLM request is awaited instead of blocking a pool thread."""
+    try:
+        raw = await asyncio.to_thread(file_path.read_text, encoding="utf-8", errors="ignore")
+        # Keyed on the feedback only: a passing result from any concurrent retry is reused
+        cache_path = _reseg_cache_path(cache_dir, raw, feedback)
+        cached = await asyncio.to_thread(_load_reseg_cache, cache_path)
+        if cached is not None:
+            print(f"[LLM-SEG] {file_path.name}: using cached re-segmentation")
+            return cached
+        resp = await acall_llm_with_smart_routing(
+            _build_reseg_prompt(raw, feedback, variant),
+            debug_id=f"LLM-SEG-{file_path.name}" + (f"-r{variant}" if variant else "")
+        )
+        normalized = _parse_reseg_response(resp, file_path)
+        await asyncio.to_thread(_store_reseg_cache, cache_path, normalized)
+        return normalized
     except Exception as e:
         print(f"[LLM-SEG] Failed on {file_path.name}: {e}")
         return None
 
 
+def _write_questions_json(out_path: Path, qs: list[dict]) -> None:
+    """Write a chapter's questions as indented UTF-8 JSON, via orjson when installed."""
+    if orjson is not None:
+        atomic_write_bytes(out_path, orjson.dumps(qs, option=orjson.OPT_INDENT_2))
+    else:
+        atomic_write_json(out_path, qs, ensure_ascii=False, indent=2)
+
+
 def get_output_name(filename: str) -> str:
     """Convert various input file formats to _questions.json format."""
     if filename.endswith("_exercises.txt"):
@@ -329,44 +465,86 @@ def get_output_name(filename: str) -> str:
         return Path(filename).stem + "_questions.json"
 
 
-def process_single_file(f: Path, base_dir: Path, struct_dir: Path) -> Path | None:
+async def _llm_repair(f: Path, qs: list[dict], cache_dir: Path) -> tuple[list[dict], bool]:
+    """
+    Re-segment `f` with the LLM until a result passes the quality check.
+
+    Attempts run one after another, each with the previous result's feedback,
+    and stop at the first passing result. With LLM_RESEG_CONCURRENT_RETRIES,
+    the attempts after the first run together instead: lower latency, but every
+    retry is sent and billed, since a request already handed to its LLM worker
+    thread cannot be cancelled. Returns (questions, any_llm_success).
+    """
+    feedback = _quality_report(qs)
+    any_llm_success = False
+
+    serial_attempts = 1 if LLM_RESEG_CONCURRENT_RETRIES else MAX_LLM_RESEG_ATTEMPTS
+    for attempt in range(1, serial_attempts + 1):
+        llm_qs = await allm_resegment(f, feedback=feedback, cache_dir=cache_dir)
+        if not llm_qs:
+            print(f"[LLM] {f.name} attempt {attempt}/{MAX_LLM_RESEG_ATTEMPTS} failed.")
+            continue
+
+        any_llm_success = True
+        if not _needs_llm_repair(llm_qs):
+            print(f"[LLM] {f.name} re-segmentation successful, got {len(llm_qs)} questions.")
+            return llm_qs, True
+        feedback = _quality_report(llm_qs)
+        qs = llm_qs
+        print(f"[LLM] {f.name} attempt {attempt} still has issues: {feedback}")
+    if serial_attempts == MAX_LLM_RESEG_ATTEMPTS:
+        return qs, any_llm_success
+
+    retries = [
+        asyncio.create_task(allm_resegment(f, feedback=feedback, cache_dir=cache_dir, variant=v))
+        for v in range(1, MAX_LLM_RESEG_ATTEMPTS)
+    ]
+    try:
+        for done in asyncio.as_completed(retries):
+            llm_qs = await done
+            if not llm_qs:
+                print(f"[LLM] {f.name} concurrent retry failed.")
+                continue
+
+            any_llm_success = True
+            if not _needs_llm_repair(llm_qs):
+                print(f"[LLM] {f.name} re-segmentation successful, got {len(llm_qs)} questions.")
+                return llm_qs, True
+            qs = llm_qs
+            print(f"[LLM] {f.name} concurrent retry still has issues: {_quality_report(llm_qs)}")
+    finally:
+        # Stops retries still reading their input or cache; a request already
+        # handed to the LLM thread runs to completion and is dropped
+        for task in retries:
+            task.cancel()
+
+    return qs, any_llm_success
+
+
+async def aprocess_single_file(
+    f: Path, base_dir: Path, struct_dir: Path, raw: str | None = None
+) -> Path | None:
     """
     Process a single file: parse questions and optionally use LLM repair.
+
+    Parsing and the JSON write run in worker threads; LLM re-segmentation is awaited.
+    `raw` is the file's text when the caller has already read it.
     """
     try:
-        qs = parse_file(f)
+        if raw is None:
+            qs = await asyncio.to_thread(parse_file, f)
+        else:
+            qs = await asyncio.to_thread(parse_file_from_text, f, raw)
         out_name = get_output_name(f.name)
         out_path = struct_dir / out_name
 
         if _needs_llm_repair(qs):
             print(f"[WARN] {f.name} parsing quality poor, attempting LLM re-segmentation...")
-            feedback = _quality_report(qs)
-            best_qs = qs
-            any_llm_success = False
-
-            for attempt in range(1, MAX_LLM_RESEG_ATTEMPTS + 1):
-                llm_qs = llm_resegment(f, feedback=feedback)
-                if not llm_qs:
-                    print(f"[LLM] {f.name} attempt {attempt}/{MAX_LLM_RESEG_ATTEMPTS} failed.")
-                    continue
-
-                any_llm_success = True
-
-                if not _needs_llm_repair(llm_qs):
-                    qs = llm_qs
-                    print(f"[LLM] {f.name} re-segmentation successful, got {len(qs)} questions.")
-                    break
-                else:
-                    feedback = _quality_report(llm_qs)
-                    best_qs = llm_qs
-                    print(f"[LLM] {f.name} attempt {attempt} still has issues: {feedback}")
-                    if attempt == MAX_LLM_RESEG_ATTEMPTS:
-                        qs = best_qs
-
+            qs, any_llm_success = await _llm_repair(f, qs, struct_dir / ".llm_cache")
             if not any_llm_success:
                 print(f"[LLM] {f.name} all re-segmentation attempts failed, using rule-based result, {len(qs)} questions.")
 
-        atomic_write_json(out_path, qs, ensure_ascii=False, indent=2)
+        await asyncio.to_thread(_write_questions_json, out_path, qs)
         print(f"Saved {len(qs)} questions to {out_name}")
         return out_path
     except Exception as e:
@@ -374,6 +552,36 @@ def process_single_file(f: Path, base_dir: Path, struct_dir: Path) -> Path | Non
         return None
 
 
+def process_single_file(f: Path, base_dir: Path, struct_dir: Path) -> Path | None:
+    """Blocking entry point for `aprocess_single_file`."""
+    return asyncio.run(aprocess_single_file(f, base_dir, struct_dir))
+
+
+async def _process_files(files: list[Path], base_dir: Path, struct_dir: Path, max_workers: int) -> int:
+    """Process files concurrently with at most `max_workers` in flight; returns success count."""
+    sem = asyncio.Semaphore(max_workers)
+    # Files are read up to `max_workers` ahead of processing, so disk reads
+    # overlap with parsing; a slot is held until its file is done
+    read_sem = asyncio.Semaphore(max_workers * 2)
+
+    async def _bounded(f: Path) -> Path | None:
+        async with read_sem:
+            try:
+                raw = await asyncio.to_thread(read_text_safely, f)
+            except OSError as e:
+                print(f"Error reading {f.name}: {e}")
+                return None
+            async with sem:
+                try:
+                    return await aprocess_single_file(f, base_dir, struct_dir, raw)
+                except Exception as e:
+                    print(f"Error processing {f.name}: {e}")
+                    return None
+
+    results = await asyncio.gather(*(_bounded(f) for f in files))
+    return sum(1 for r in results if r)
+
+
 def run_for_subject(subject: str) -> None:
     """
     Parse all exercise files for a subject.
@@ -414,18 +622,9 @@ def run_for_subject(subject: str) -> None:
 
         print(f"Found {len(files)} files to process for subject '{subject}'")
 
-        # Use ThreadPoolExecutor for parallel processing
+        # Bounded asyncio fan-out: LLM waits don't pin one thread per file
         MAX_WORKERS = 10
-        successes = 0
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {executor.submit(process_single_file, f, base_dir, struct_dir): f for f in files}
-            for future in concurrent.futures.as_completed(futures):
-                f = futures[future]
-                try:
-                    if future.result():
-                        successes += 1
-                except Exception as e:
-                    print(f"Error processing {f.name}: {e}")
+        successes = asyncio.run(_process_files(files, base_dir, struct_dir, MAX_WORKERS))
         manager.update_pipeline_status(
             questions_structured_state="done",
             questions_structured_inputs=len(files),
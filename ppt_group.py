@@ -5,16 +5,21 @@ Generates integrated lecture notes by combining PPT content with textbook materi
 Uses intelligent matching to find relevant PPT files for each chapter.
 """
 
+import functools
+import hashlib
+import heapq
+import os
 import re
 import textwrap
 from collections import Counter
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional, List
  
 from config import OUTPUT_DIR, PPT_DIR, MAX_PROMPT_CHARS
 from llm_client import call_llm_with_smart_routing
-from utils_fs import atomic_write_text
-from utils_text import truncate_text
+from utils_fs import atomic_write_text, ensure_dir, find_chapter_textbook
+from utils_text import strip_code_fence, truncate_text
 
 
 MIN_VALID_CACHE_BYTES = 100
@@ -24,9 +29,15 @@ def _is_valid_markdown_cache(path: Path) -> bool:
     try:
         if path.stat().st_size < MIN_VALID_CACHE_BYTES:
             return False
-        with path.open("r", encoding="utf-8") as handle:
-            head = handle.read(4096).lstrip("\ufeff")
-        return head.strip().startswith("#")
+        with path.open("rb") as handle:
+            head = handle.read(8)
+            # Generated files start with the heading; only a BOM or leading
+            # whitespace needs a longer look
+            if head[:1] == b"#":
+                return True
+            head += handle.read(4096 - len(head))
+        text = head.decode("utf-8", errors="ignore").lstrip("\ufeff")
+        return text.strip().startswith("#")
     except Exception:
         return False
 
@@ -60,6 +71,10 @@ PPT_SYSTEM_PROMPT = """You are an educational content specialist responsible for
 """
 
 
+_MD_HEADER_RE = re.compile(r"^#{1,6}\s+\S+")
+_WS_RE = re.compile(r"\s+")
+
+
 def _clean_markdown_duplicates(md: str) -> str:
     """
     Remove duplicate paragraphs from generated markdown.
@@ -69,7 +84,8 @@ def _clean_markdown_duplicates(md: str) -> str:
     - Remove non-adjacent duplicates for longer paragraphs
     """
     blocks = [b for b in md.split("\n\n") if b.strip()]
-    seen = set()
+    # 8-byte digests of long paragraphs rather than the normalized text itself
+    seen: set[bytes] = set()
     out_blocks = []
     last_norm = None
 
@@ -77,13 +93,13 @@ def _clean_markdown_duplicates(md: str) -> str:
         stripped = block.strip()
 
         # Preserve header lines
-        if re.match(r"^#{1,6}\s+\S+", stripped) and "\n" not in stripped:
+        if "\n" not in stripped and _MD_HEADER_RE.match(stripped):
             out_blocks.append(block)
             last_norm = None
             continue
 
         # Normalize whitespace
-        norm = re.sub(r"\s+", " ", stripped)
+        norm = _WS_RE.sub(" ", stripped)
 
         # Remove adjacent duplicates
         if norm == last_norm:
@@ -92,9 +108,10 @@ def _clean_markdown_duplicates(md: str) -> str:
 
         # Remove non-adjacent duplicates for longer paragraphs
         if len(norm) >= 10:
-            if norm in seen:
+            key = hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest()
+            if key in seen:
                 continue
-            seen.add(norm)
+            seen.add(key)
 
         out_blocks.append(block)
 
@@ -103,6 +120,13 @@ def _clean_markdown_duplicates(md: str) -> str:
 
 def _read_text_if_exists(path: Path, limit: Optional[int] = None) -> str:
     """Read text file with optional truncation and error handling."""
+    return _read_text_cached(str(path), limit)
+
+
+@functools.lru_cache(maxsize=4096)
+def _read_text_cached(path_str: str, limit: Optional[int]) -> str:
+    # PPT files are scored once per chapter; read each (path, limit) once per process
+    path = Path(path_str)
     if not path.exists():
         return ""
     try:
@@ -114,6 +138,17 @@ def _read_text_if_exists(path: Path, limit: Optional[int] = None) -> str:
         return ""
 
 
+# Common stop words
+STOP_WORDS = frozenset({
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all',
+    'can', 'had', 'her', 'was', 'one', 'our', 'out', 'has',
+    'have', 'been', 'that', 'this', 'with', 'will', 'from',
+    'chapter', 'section', 'page', 'figure', 'table'
+})
+
+_WORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+
 def _extract_keywords(text: str, top_k: int = 20) -> List[str]:
     """
     Extract high-frequency keywords from text.
@@ -125,51 +160,59 @@ def _extract_keywords(text: str, top_k: int = 20) -> List[str]:
     # Use first 8000 chars for analysis
     text = text[:8000].lower()
 
-    # Extract words (alphanumeric sequences)
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text)
-    if not words:
-        return []
-
-    # Common stop words
-    stop_words = {
-        'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all',
-        'can', 'had', 'her', 'was', 'one', 'our', 'out', 'has',
-        'have', 'been', 'that', 'this', 'with', 'will', 'from',
-        'chapter', 'section', 'page', 'figure', 'table'
-    }
-
-    freq = Counter(words)
-    for word in list(freq.keys()):
-        if word in stop_words or len(word) < 3:
-            freq.pop(word, None)
-
+    # Extract words (alphanumeric sequences), dropping stop words up front
+    freq = Counter(w for w in _WORD_RE.findall(text) if w not in STOP_WORDS)
     if not freq:
         return []
 
-    items = sorted(freq.items(), key=lambda x: (-x[1], -len(x[0])))
-    return [w for w, _ in items[:top_k]]
+    # Same order as a full sort by (-count, -len), without sorting the whole vocabulary
+    items = heapq.nsmallest(top_k, freq.items(), key=lambda x: (-x[1], -len(x[0])))
+    return [w for w, _ in items]
+
+
+@dataclass
+class PptDoc:
+    """A PPT text file prepared once per subject for chapter scoring."""
+    path: Path
+    fname_lower: str
+    # keyword -> occurrences in text_lower, filled lazily as chapters query it
+    body_hits: dict[str, int] = field(default_factory=dict)
+    _text_lower: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def text_lower(self) -> str:
+        # Only read once a chapter's filename prefilter lets this file through.
+        # A plain attribute, not functools.cached_property: that holds one lock
+        # for all instances on Python < 3.12 and would serialize ppt_runner's
+        # chapter threads. Two threads may both read a file; the result is the same.
+        text = self._text_lower
+        if text is None:
+            text = self._text_lower = _read_text_if_exists(self.path, limit=6000).lower()
+        return text
+
+    def body_count(self, kw: str) -> int:
+        hits = self.body_hits.get(kw)
+        if hits is None:
+            hits = self.body_hits[kw] = self.text_lower.count(kw)
+        return hits
 
 
 def _score_ppt_file(
-    ppt_path: Path,
+    doc: PptDoc,
     keywords: List[str],
     chapter_id: str,
     chapter_name: str,
+    chap_id_re: Optional[re.Pattern] = None,
 ) -> int:
     """
     Score a PPT file for relevance to a chapter.
     Higher scores indicate better matches.
     """
-    text = _read_text_if_exists(ppt_path, limit=6000)
-    if not text:
-        return 0
-
     score = 0
-    fname = ppt_path.stem.lower()
-    text_lower = text.lower()
+    fname = doc.fname_lower
 
-    # Normalize chapter ID
-    chapter_id_str = str(int(chapter_id)) if chapter_id.isdigit() else chapter_id
+    if chap_id_re is None:
+        chap_id_re = _chapter_id_re(chapter_id)
 
     # Clean chapter name
     chap_key = chapter_name.replace("_", " ").lower()
@@ -181,7 +224,7 @@ def _score_ppt_file(
         score += 15
 
     # Chapter ID matching
-    if re.search(rf"(^|[\\-_\\.\\s]){chapter_id_str}([\\-_\\.\\s]|$)", fname):
+    if chap_id_re.search(fname):
         score += 10
 
     # Keyword matching
@@ -189,21 +232,24 @@ def _score_ppt_file(
         if len(kw) < 3:
             continue
 
+        kw = kw.lower()
+
         # Filename hits (higher weight)
-        hits_name = fname.count(kw.lower())
+        hits_name = fname.count(kw)
         if hits_name:
             score += hits_name * 5
 
         # Content hits (lower weight, capped)
-        hits_body = text_lower.count(kw.lower())
+        hits_body = doc.body_count(kw)
         if hits_body:
             score += min(hits_body, 10)
 
     return score
 
 
+@functools.lru_cache(maxsize=None)
 def _collect_ppt_files(subject: str) -> List[Path]:
-    """Collect all PPT text files for a subject."""
+    """Collect all PPT text files for a subject (walked once per process)."""
     files: List[Path] = []
 
     if not PPT_DIR.exists():
@@ -228,16 +274,45 @@ def _collect_ppt_files(subject: str) -> List[Path]:
             if d not in search_dirs:
                 search_dirs.append(d)
 
-    # Collect files
+    # Collect files: iterative scandir walk, deduplicated as we go
+    seen: set[str] = set()
     for d in search_dirs:
-        for f in d.rglob("*.txt"):
-            files.append(f)
+        stack = [str(d)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith(".txt") and entry.is_file() and entry.path not in seen:
+                            seen.add(entry.path)
+                            files.append(Path(entry.path))
+            except OSError as e:
+                print(f"[PPT] WARN: Cannot scan {d}: {e}")
 
-    files = list(set(files))
     print(f"[PPT] Subject={subject}: Found {len(files)} PPT files in {len(search_dirs)} directories")
     return files
 
 
+def _chapter_id_re(chapter_id: str) -> re.Pattern:
+    """Pattern for the (normalized) chapter ID as a separate token in a file name."""
+    chapter_id_str = str(int(chapter_id)) if chapter_id.isdigit() else chapter_id
+    return re.compile(rf"(?:^|[-_.\s]){re.escape(chapter_id_str)}(?:[-_.\s]|$)")
+
+
+@functools.lru_cache(maxsize=None)
+def _ppt_index(subject: str) -> tuple[PptDoc, ...]:
+    """Index the file names of a subject's PPT files; contents are read on first use."""
+    docs = []
+    for f in _collect_ppt_files(subject):
+        fname_lower = f.stem.lower()
+        docs.append(PptDoc(
+            path=f,
+            fname_lower=fname_lower,
+        ))
+    return tuple(docs)
+
+
 def _find_ppt_files_for_chapter(
     subject: str,
     chapter_id: str,
@@ -250,8 +325,9 @@ def _find_ppt_files_for_chapter(
     Strategy:
     1. Collect all PPT files for the subject
     2. Extract keywords from chapter content
-    3. Score each PPT file for relevance
-    4. Return files above threshold
+    3. Skip files whose name shares no keyword, chapter ID or chapter name
+    4. Score the remaining PPT files for relevance
+    5. Return files above threshold
     """
     all_ppt_files = _collect_ppt_files(subject)
     if not all_ppt_files:
@@ -268,11 +344,24 @@ def _find_ppt_files_for_chapter(
         keywords = chapter_name.split()
 
     # Score all files
+    chap_id_re = _chapter_id_re(chapter_id)
+    chap_prefix = chapter_name.replace("_", " ").lower()[:6]
+    keyword_set = {kw.lower() for kw in keywords if len(kw) >= 3}
     scored: List[tuple[Path, int]] = []
-    for f in all_ppt_files:
-        sc = _score_ppt_file(f, keywords, chapter_id, chapter_name)
+    for doc in _ppt_index(subject):
+        # Filename prefilter: unrelated decks are skipped without reading them
+        if not (
+            # Substring test, the same rule _score_ppt_file uses for filename hits
+            any(kw in doc.fname_lower for kw in keyword_set)
+            or chap_id_re.search(doc.fname_lower)
+            or (chap_prefix and chap_prefix in doc.fname_lower)
+        ):
+            continue
+        if not doc.text_lower:
+            continue
+        sc = _score_ppt_file(doc, keywords, chapter_id, chapter_name, chap_id_re)
         if sc > 0:
-            scored.append((f, sc))
+            scored.append((doc.path, sc))
 
     if not scored:
         print(f"[PPT] No matching PPT files for {subject} Chapter {chapter_id}")
@@ -305,7 +394,7 @@ def generate_ppt_notes(
     base_dir = OUTPUT_DIR / subject
     raw_dir = base_dir / "raw"
     out_dir = base_dir / "chapters"
-    out_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(out_dir)
 
     chap_id_str = str(chapter_id).zfill(2)
     out_name = f"{chap_id_str}_{chapter_name}_lecture_integrated.md"
@@ -325,11 +414,9 @@ def generate_ppt_notes(
 
     # Load textbook content
     textbook_text = ""
-    for suffix in ["_textbook.txt", "_content.txt", "_combined.txt"]:
-        candidate = raw_dir / f"{chap_id_str}_{chapter_name}{suffix}"
-        if candidate.exists():
-            textbook_text = _read_text_if_exists(candidate, limit=8000)
-            break
+    candidate = find_chapter_textbook(raw_dir, chap_id_str, chapter_name)
+    if candidate:
+        textbook_text = _read_text_if_exists(candidate, limit=8000)
 
     # Find relevant PPT files
     ppt_files = _find_ppt_files_for_chapter(
@@ -424,13 +511,7 @@ Please generate comprehensive lecture notes in Markdown format.
     response = response.strip()
 
     # Remove code blocks if present
-    if response.startswith("```"):
-        lines = response.splitlines()
-        if lines and lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        response = "\n".join(lines).strip()
+    response = strip_code_fence(response)
 
     # Clean duplicates
     original_len = len(response)
@@ -439,5 +520,6 @@ Please generate comprehensive lecture notes in Markdown format.
         print(f"[PPT] Dedup: {original_len} -> {len(response)} chars")
 
     # Write output
-    atomic_write_text(out_path, response, encoding="utf-8")
+    # No fsync: a torn file fails _is_valid_markdown_cache and is regenerated
+    atomic_write_text(out_path, response, encoding="utf-8", durable=False)
     print(f"[PPT] Generated: {out_name} ({len(response)} chars)")
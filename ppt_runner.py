@@ -5,9 +5,10 @@ Orchestrates PPT integration pipeline.
 Generates integrated lecture notes combining PPT content with textbook material.
 """
 
+import os
 import sys
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from config import OUTPUT_DIR, NUM_PROCESSES
 from ppt_group import generate_ppt_notes
@@ -27,15 +28,20 @@ def _collect_chapters(subject_name: str) -> list[tuple[str, str]]:
         print(f"[PPT] questions_structured not found for {subject_name}")
         return []
 
+    # Suffix check on scandir names instead of glob's per-entry fnmatch
+    suffix = "_questions.json"
+    with os.scandir(struct_dir) as it:
+        names = [entry.name[:-len(suffix)] for entry in it if entry.name.endswith(suffix)]
+
+    # Same parsing as run_all and qpoints_runner, so chapter names match;
+    # files without an "{id}_" prefix still get lecture notes under id "00"
     chapters = []
-    for question_file in struct_dir.glob("*_questions.json"):
-        stem = question_file.stem.replace("_questions", "")
-        parts = stem.split("_", 1)
-        if len(parts) == 2:
-            chapter_id, chapter_name = parts
+    for name in names:
+        chapter_id, sep, chapter_name = name.partition("_")
+        if sep:
+            chapters.append((chapter_id, chapter_name))
         else:
-            chapter_id, chapter_name = "00", stem
-        chapters.append((chapter_id, chapter_name))
+            chapters.append(("00", name))
 
     # Sort by chapter number
     def sort_key(item):
@@ -62,9 +68,10 @@ def process_subject(subject_name: str) -> None:
     if not chapters:
         return
 
-    print(f"[PPT] Starting parallel PPT integration: {len(chapters)} chapters, {NUM_PROCESSES} processes")
+    print(f"[PPT] Starting parallel PPT integration: {len(chapters)} chapters, {NUM_PROCESSES} threads")
 
-    with ProcessPoolExecutor(max_workers=NUM_PROCESSES) as executor:
+    # Chapters are I/O- and LLM-bound; threads share the PPT index cache
+    with ThreadPoolExecutor(max_workers=NUM_PROCESSES) as executor:
         futures = {
             executor.submit(generate_ppt_notes, subject_name, chapter_id, chapter_name): (chapter_id, chapter_name)
             for chapter_id, chapter_name in chapters
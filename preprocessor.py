@@ -8,11 +8,15 @@ Supports both configuration-based and auto-detection modes.
 import re
 import json
 import hashlib
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
 
-from config import OUTPUT_DIR, SUBJECT_CONFIG_FILE
+from config import OUTPUT_DIR, SUBJECT_CONFIG_FILE, NUM_PROCESSES
 from status_manager import SubjectStatusManager
+from utils_fs import ensure_dir
 
 
 # Subject mapping for auto-detection (customizable)
@@ -27,28 +31,75 @@ SUBJECT_KEYWORDS = {
     # Example: "cardio": "Cardiology",
 }
 
+# Chapter headings ("Chapter X: Title" or similar) and exercise section
+# headers, found together in one pass over the source text
+_SECTION_TOKEN_RE = re.compile(
+    r'(?P<chapter>(?:^|\n)\s*(?:Chapter|Ch\.?|Section)\s*(\d+)[:\s]+([^\n]+))'
+    r'|(?P<exercises>(?:^|\n)\s*(?:Exercises?|Questions?|Problems?)(?=\s*(?:\n|:)))',
+    re.IGNORECASE
+)
+# Full exercise header; its terminator must lie inside the chapter
+_EXERCISE_HEADER_RE = re.compile(
+    r'(?:^|\n)\s*(?:Exercises?|Questions?|Problems?)\s*(?:\n|:)',
+    re.IGNORECASE
+)
+_EXERCISE_WORD_RE = re.compile(r'(?:exercise|question|problem)', re.IGNORECASE)
+_SUBJECT_ID_RE = re.compile(r'^(\d+)\.')
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r'[\\/:*?"<>|]')
+
+
+def _build_subject_dir_map() -> dict[str, str]:
+    """Map lower-cased names of existing subject directories to their actual names."""
+    if not OUTPUT_DIR.exists():
+        return {}
+    with os.scandir(OUTPUT_DIR) as it:
+        return {entry.name.lower(): entry.name for entry in it if entry.is_dir()}
+
 
-def _match_existing_subject_dir(subject_name: str) -> str:
+def _match_existing_subject_dir(subject_name: str, subject_dir_map: Optional[dict[str, str]] = None) -> str:
     """
     Match against existing subject directories (case-insensitive).
     Returns existing directory name if found, otherwise original name.
+
+    Pass a map from `_build_subject_dir_map()` to avoid rescanning OUTPUT_DIR.
     """
-    if not OUTPUT_DIR.exists():
-        return subject_name
+    if subject_dir_map is None:
+        subject_dir_map = _build_subject_dir_map()
+    return subject_dir_map.get(subject_name.lower(), subject_name)
+
 
-    lower_map = {d.name.lower(): d.name for d in OUTPUT_DIR.iterdir() if d.is_dir()}
-    return lower_map.get(subject_name.lower(), subject_name)
+_HASH_CHUNK_SIZE = 1024 * 1024
 
 
 def _compute_hash(files: list[Path]) -> str:
     """Compute SHA256 hash of file contents."""
     h = hashlib.sha256()
+    # Stream through one reusable buffer instead of loading whole textbooks
+    buf = bytearray(_HASH_CHUNK_SIZE)
+    view = memoryview(buf)
     for path in sorted(files, key=lambda x: x.name):
-        if path.exists():
-            h.update(path.read_bytes())
+        try:
+            f = path.open("rb", buffering=0)
+        except FileNotFoundError:
+            continue
+        with f:
+            while n := f.readinto(buf):
+                h.update(view[:n])
     return h.hexdigest()
 
 
+def _compute_fingerprint(files: list[Path]) -> list[list]:
+    """Cheap (name, size, mtime_ns, inode) fingerprint of the source files."""
+    fingerprint = []
+    for path in sorted(files, key=lambda x: x.name):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        fingerprint.append([path.name, st.st_size, st.st_mtime_ns, st.st_ino])
+    return fingerprint
+
+
 def _should_skip(source_files: list[Path], subject: str) -> bool:
     """Check if preprocessing can be skipped (source unchanged)."""
     manager = SubjectStatusManager(subject)
@@ -57,16 +108,66 @@ def _should_skip(source_files: list[Path], subject: str) -> bool:
 
     if not prev_hash:
         return False
-    return _compute_hash(source_files) == prev_hash
 
+    # Same size/mtime/inode as last run: trust the stored hash without reading
+    fingerprint = _compute_fingerprint(source_files)
+    if fingerprint == status.get("source_fingerprint"):
+        return True
+
+    if _compute_hash(source_files) != prev_hash:
+        return False
+
+    # Content unchanged (e.g. files touched or copied): record the new fingerprint
+    manager.set_preprocess_status(
+        source_hash=prev_hash,
+        source_files=status.get("source_files", [f.name for f in source_files]),
+        source_fingerprint=fingerprint,
+    )
+    return True
+
+
+def _read_source_text(file_path: Path) -> str:
+    """
+    Decode a source file as UTF-8 (dropping invalid bytes) with universal newlines.
+
+    The file is decoded straight from a read-only mapping, so no bytes copy
+    of a large textbook is held alongside the decoded text.
+    """
+    with file_path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = str(mm, "utf-8", "ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _write_span(path: Path, content: str, data: Optional[memoryview], start: int, end: int) -> None:
+    """
+    Write content[start:end] as UTF-8.
 
-def process_file(file_path: Path, subject_override: Optional[str] = None) -> None:
+    `data` is the already-encoded content when character and byte offsets
+    coincide (ASCII text); its slices are written without copying.
+    """
+    chunk = data[start:end] if data is not None else content[start:end].encode("utf-8")
+    with path.open("wb") as f:
+        f.write(chunk)
+
+
+def process_file(
+    file_path: Path,
+    subject_override: Optional[str] = None,
+    subject_dir_map: Optional[dict[str, str]] = None,
+) -> None:
     """
     Process a source file and split into chapter files.
 
     Args:
         file_path: Path to the source file
         subject_override: Force specific subject name (optional)
+        subject_dir_map: Existing subject directories, as built by
+            `_build_subject_dir_map()` (optional; updated in place)
     """
     filename = file_path.name
     subject_name = subject_override
@@ -74,7 +175,7 @@ def process_file(file_path: Path, subject_override: Optional[str] = None) -> Non
     # Auto-detect subject from filename
     if not subject_name:
         # Try numeric prefix mapping
-        match = re.search(r'^(\d+)\.', filename)
+        match = _SUBJECT_ID_RE.search(filename)
         if match:
             subject_id = match.group(1)
             subject_name = SUBJECT_MAP.get(subject_id)
@@ -95,77 +196,86 @@ def process_file(file_path: Path, subject_override: Optional[str] = None) -> Non
         return
 
     # Match existing directory
-    subject_name = _match_existing_subject_dir(subject_name)
+    subject_name = _match_existing_subject_dir(subject_name, subject_dir_map)
     print(f"[PROCESS] {filename} -> {subject_name}")
 
     # Setup directories
     base_dir = OUTPUT_DIR / subject_name
     raw_dir = base_dir / "raw"
-    raw_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(raw_dir)
+    if subject_dir_map is not None:
+        subject_dir_map.setdefault(subject_name.lower(), subject_name)
 
     # Read content
-    content = file_path.read_text(encoding='utf-8', errors='ignore')
+    content = _read_source_text(file_path)
 
-    # Find chapters using regex pattern
-    # Matches: "Chapter X: Title" or similar patterns
-    chapter_pattern = re.compile(
-        r'(?:^|\n)\s*(?:Chapter|Ch\.?|Section)\s*(\d+)[:\s]+([^\n]+)',
-        re.IGNORECASE
-    )
+    # One scan: chapter headings, each with the first exercise header after it
+    chapters: list[tuple[re.Match, Optional[re.Match]]] = []
+    for token in _SECTION_TOKEN_RE.finditer(content):
+        if token.group("chapter") is not None:
+            chapters.append((token, None))
+        elif chapters and chapters[-1][1] is None:
+            chapters[-1] = (chapters[-1][0], token)
 
-    matches = list(chapter_pattern.finditer(content))
-
-    if not matches:
+    if not chapters:
         print(f"  [WARN] No chapters found in {filename}")
         # Save entire file
         output_file = raw_dir / f"00_full_content.txt"
         output_file.write_text(content, encoding='utf-8')
         return
 
+    # ASCII text: encode once and write chapters as slices of that buffer
+    data = memoryview(content.encode("ascii")) if content.isascii() else None
+
     # Process each chapter
-    for i, match in enumerate(matches):
+    for i, (match, exercise_match) in enumerate(chapters):
         start_idx = match.start()
-        end_idx = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        end_idx = chapters[i + 1][0].start() if i + 1 < len(chapters) else len(content)
 
-        chapter_num = match.group(1)
-        chapter_name = match.group(2).strip()
-        chapter_content = content[start_idx:end_idx]
+        chapter_num = match.group(2)
+        chapter_name = match.group(3).strip()
 
         # Sanitize chapter name for filename
-        chapter_name = re.sub(r'[\\/:*?"<>|]', '_', chapter_name).strip()
+        chapter_name = _UNSAFE_FILENAME_CHARS_RE.sub('_', chapter_name).strip()
         chapter_id = f"{int(chapter_num):02d}"
 
         print(f"  [CHAPTER] {chapter_id}: {chapter_name}")
 
         # Determine file type based on content
-        has_exercises = bool(re.search(r'(?:exercise|question|problem)', chapter_content, re.I))
-
-        if has_exercises:
-            # Try to split content and exercises
-            exercise_match = re.search(
-                r'(?:^|\n)\s*(?:Exercises?|Questions?|Problems?)\s*(?:\n|:)',
-                chapter_content, re.IGNORECASE
-            )
-
-            if exercise_match:
-                content_part = chapter_content[:exercise_match.start()]
-                exercise_part = chapter_content[exercise_match.start():]
-
-                # Save content
-                content_file = raw_dir / f"{chapter_id}_{chapter_name}_content.txt"
-                content_file.write_text(content_part, encoding='utf-8')
-
-                # Save exercises
-                exercise_file = raw_dir / f"{chapter_id}_{chapter_name}_exercises.txt"
-                exercise_file.write_text(exercise_part, encoding='utf-8')
-            else:
-                # Save combined
-                output_file = raw_dir / f"{chapter_id}_{chapter_name}_combined.txt"
-                output_file.write_text(chapter_content, encoding='utf-8')
+        exercise_idx = None
+        if "\n" in content[match.end(2):match.start(3)]:
+            # Title on the line after the number: the heading itself may be a header
+            header = _EXERCISE_HEADER_RE.search(content, start_idx, end_idx)
+            if header:
+                exercise_idx = header.start()
+        elif exercise_match and _EXERCISE_HEADER_RE.match(content, exercise_match.start(), end_idx):
+            exercise_idx = exercise_match.start()
+
+        if exercise_idx is not None:
+            # Split at the header: save content
+            content_file = raw_dir / f"{chapter_id}_{chapter_name}_content.txt"
+            _write_span(content_file, content, data, start_idx, exercise_idx)
+
+            # Save exercises
+            exercise_file = raw_dir / f"{chapter_id}_{chapter_name}_exercises.txt"
+            _write_span(exercise_file, content, data, exercise_idx, end_idx)
+        elif _EXERCISE_WORD_RE.search(content, start_idx, end_idx):
+            # Mentions exercises but has no header to split at: save combined
+            output_file = raw_dir / f"{chapter_id}_{chapter_name}_combined.txt"
+            _write_span(output_file, content, data, start_idx, end_idx)
         else:
             # Save as textbook content
             output_file = raw_dir / f"{chapter_id}_{chapter_name}_textbook.txt"
-            output_file.write_text(chapter_content, encoding='utf-8')
+            _write_span(output_file, content, data, start_idx, end_idx)
+
+
+def _process_subject_files(subject_dir: str, source_files: list[Path], subject_dir_map: dict[str, str]) -> None:
+    """Split one subject's source files, in order (they share its raw/ directory)."""
+    for filepath in source_files:
+        try:
+            process_file(filepath, subject_override=subject_dir, subject_dir_map=subject_dir_map)
+        except Exception as e:
+            print(f"[ERROR] Processing {filepath.name}: {e}")
 
 
 def main():
@@ -178,8 +288,11 @@ def main():
         try:
             config = json.loads(SUBJECT_CONFIG_FILE.read_text(encoding="utf-8"))
 
+            # subject_dir -> source files that need processing
+            tasks: dict[str, list[Path]] = {}
+            subject_dir_map = _build_subject_dir_map()
             for subject, mapping in config.items():
-                subject_dir = _match_existing_subject_dir(subject)
+                subject_dir = _match_existing_subject_dir(subject, subject_dir_map)
 
                 # Collect source files
                 source_files = []
@@ -199,19 +312,28 @@ def main():
                     print(f"[SKIP] {subject_dir} - sources unchanged")
                     continue
 
-                # Process files
-                for filepath in source_files:
-                    try:
-                        process_file(filepath, subject_override=subject_dir)
-                    except Exception as e:
-                        print(f"[ERROR] Processing {filepath.name}: {e}")
-
-                # Update status
-                manager = SubjectStatusManager(subject_dir)
-                manager.set_preprocess_status(
-                    source_hash=_compute_hash(source_files),
-                    source_files=[f.name for f in source_files]
-                )
+                tasks[subject_dir] = source_files
+
+            # Subjects are independent: split them in parallel
+            if tasks:
+                with ProcessPoolExecutor(max_workers=min(NUM_PROCESSES, len(tasks))) as executor:
+                    futures = [
+                        executor.submit(_process_subject_files, subject_dir, source_files, subject_dir_map)
+                        for subject_dir, source_files in tasks.items()
+                    ]
+                    for future in as_completed(futures):
+                        future.result()
+
+            # Update status (one batched write for all processed subjects)
+            if tasks:
+                SubjectStatusManager.set_preprocess_status_many({
+                    subject_dir: {
+                        "source_hash": _compute_hash(source_files),
+                        "source_files": [f.name for f in source_files],
+                        "source_fingerprint": _compute_fingerprint(source_files),
+                    }
+                    for subject_dir, source_files in tasks.items()
+                })
 
             return
 
@@ -225,9 +347,10 @@ def main():
         return
 
     files = sorted(OUTPUT_DIR.glob("*.txt"))
+    subject_dir_map = _build_subject_dir_map()
     for filepath in files:
         try:
-            process_file(filepath)
+            process_file(filepath, subject_dir_map=subject_dir_map)
         except Exception as e:
             print(f"[ERROR] Processing {filepath.name}: {e}")
 
@@ -12,20 +12,33 @@ from typing import Optional
 
 from llm_client import call_llm_with_smart_routing
 from config import OUTPUT_DIR, MAX_PROMPT_CHARS
-from utils_fs import atomic_write_text
-from utils_text import normalize_text, truncate_text
+from utils_fs import atomic_write_text, ensure_dir, find_chapter_textbook
+from utils_text import normalize_text, strip_code_fence, truncate_text
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used otherwise
+    orjson = None
 
 
 MIN_VALID_CACHE_BYTES = 100
 
+_QID_RE = re.compile(r"Q(\d+)")
+
 
 def _is_valid_markdown_cache(path: Path) -> bool:
     try:
         if path.stat().st_size < MIN_VALID_CACHE_BYTES:
             return False
-        with path.open("r", encoding="utf-8") as handle:
-            head = handle.read(4096).lstrip("\ufeff")
-        return head.strip().startswith("#")
+        with path.open("rb") as handle:
+            head = handle.read(8)
+            # Generated files start with the heading; only a BOM or leading
+            # whitespace needs a longer look
+            if head[:1] == b"#":
+                return True
+            head += handle.read(4096 - len(head))
+        text = head.decode("utf-8", errors="ignore").lstrip("\ufeff")
+        return text.strip().startswith("#")
     except Exception:
         return False
 
@@ -58,24 +71,58 @@ SYSTEM_PROMPT = """You are an educational content specialist responsible for ext
    - Use textbook as authoritative reference
 """
 
+# Same escaping as json.dumps(..., ensure_ascii=False) applies to strings
+_JSON_ESCAPE_TABLE = str.maketrans({
+    **{chr(i): f"\\u{i:04x}" for i in range(0x20)},
+    '"': '\\"', "\\": "\\\\",
+    "\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f",
+})
+
+
+def _format_options(opts: dict[str, str]) -> str:
+    """Render an options dict exactly as json.dumps(opts, ensure_ascii=False) would."""
+    return "{" + ", ".join(
+        f'"{k.translate(_JSON_ESCAPE_TABLE)}": "{v.translate(_JSON_ESCAPE_TABLE)}"'
+        for k, v in opts.items()
+    ) + "}"
+
+
+# User prompt pieces around the questions and textbook text
+_PROMPT_QUESTIONS_HEADER = "\n================= Chapter Questions =================\n"
+_PROMPT_TEXTBOOK_HEADER = "\n\n================= Textbook Content =================\n"
+_PROMPT_FOOTER = (
+    "\n\nPlease generate a key points summary for this chapter, "
+    "including the question mapping table.\n"
+)
+
+# Exact length of the fixed prompt text; constant per process
+_PROMPT_OVERHEAD_LEN = (
+    len(SYSTEM_PROMPT) + len("\n\n")
+    + len(_PROMPT_QUESTIONS_HEADER) + len(_PROMPT_TEXTBOOK_HEADER) + len(_PROMPT_FOOTER)
+)
+
 
 def _check_question_coverage(md_text: str, questions: list[dict], debug_id: str) -> None:
     """
     Check if output text covers all question numbers.
     Logs warnings but doesn't affect main flow.
     """
-    present: set[int] = set()
-    for match in re.finditer(r"Q(\d+)", md_text):
-        try:
-            present.add(int(match.group(1)))
-        except ValueError:
-            continue
-
-    missing_ids = [q["id"] for q in questions if q.get("id") not in present]
+    present = set(map(int, _QID_RE.findall(md_text)))
+    missing_ids = sorted({q["id"] for q in questions} - present)
     if missing_ids:
         print(f"[QPOINTS] WARN: {debug_id} missing Q ids: {missing_ids[:10]}...")
 
 
+def key_points_path(subject: str, chapter_id: str, chapter_name: str) -> Path:
+    """Output path of a chapter's key points summary."""
+    return OUTPUT_DIR / subject / "chapters" / f"{chapter_id}_{chapter_name}_key_points.md"
+
+
+def has_valid_key_points(subject: str, chapter_id: str, chapter_name: str) -> bool:
+    """Whether the chapter's key points already exist as a valid cache."""
+    return _is_valid_markdown_cache(key_points_path(subject, chapter_id, chapter_name))
+
+
 def generate_question_based_points(
     subject: str,
     chapter_id: str,
@@ -98,10 +145,10 @@ def generate_question_based_points(
     struct_dir = base_dir / "questions_structured"
     raw_dir = base_dir / "raw"
     out_dir = base_dir / "chapters"
-    out_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(out_dir)
 
     # Chapter-level caching
-    out_file = out_dir / f"{chapter_id}_{chapter_name}_key_points.md"
+    out_file = key_points_path(subject, chapter_id, chapter_name)
     if out_file.exists():
         if _is_valid_markdown_cache(out_file):
             print(f"[QPOINTS] SKIP: {out_file.name} valid cache exists")
@@ -119,45 +166,31 @@ def generate_question_based_points(
         print(f"[QPOINTS] Questions file not found: {q_file}")
         return None
 
-    questions: list[dict] = json.loads(q_file.read_text(encoding="utf-8"))
+    if orjson is not None:
+        questions: list[dict] = orjson.loads(q_file.read_bytes())
+    else:
+        questions = json.loads(q_file.read_text(encoding="utf-8"))
 
     # Load textbook content (try multiple suffixes)
     textbook_text = ""
-    for suffix in ["_textbook.txt", "_content.txt", "_combined.txt"]:
-        candidate = raw_dir / f"{chapter_id}_{chapter_name}{suffix}"
-        if candidate.exists():
-            textbook_text = candidate.read_text(encoding="utf-8", errors="ignore")
-            break
+    candidate = find_chapter_textbook(raw_dir, chapter_id, chapter_name)
+    if candidate:
+        textbook_text = candidate.read_text(encoding="utf-8", errors="ignore")
 
     textbook_text = normalize_text(textbook_text)[:8000]
 
     # Format questions for prompt
-    q_blocks: list[str] = []
-    for q in questions:
-        stem = normalize_text(q.get("stem", ""))
-        opts = {k: normalize_text(v) for k, v in q.get("options", {}).items()}
-        answer = q.get("raw_answer", "")
-        q_blocks.append(
-            f"Q{q.get('id')}: {stem}\n"
-            f"Options: {json.dumps(opts, ensure_ascii=False)}\n"
-            f"Answer: {answer}\n"
-        )
-    q_text = "\n\n".join(q_blocks)
+    q_text = "\n\n".join(
+        f"Q{q.get('id')}: {normalize_text(q.get('stem', ''))}\n"
+        f"Options: {_format_options({k: normalize_text(v) for k, v in q.get('options', {}).items()})}\n"
+        f"Answer: {q.get('raw_answer', '')}\n"
+        for q in questions
+    )
 
     debug_id = f"QPOINTS-{subject}-{chapter_id}"
 
     # Enforce prompt size limits by truncating the largest components first.
-    prompt_template = """
-================= Chapter Questions =================
-{q_text}
-
-================= Textbook Content =================
-{textbook_text}
-
-Please generate a key points summary for this chapter, including the question mapping table.
-"""
-    overhead_prompt = SYSTEM_PROMPT + "\n\n" + prompt_template.strip().format(q_text="", textbook_text="")
-    remaining_budget = max(0, MAX_PROMPT_CHARS - len(overhead_prompt))
+    remaining_budget = max(0, MAX_PROMPT_CHARS - _PROMPT_OVERHEAD_LEN)
 
     textbook_text_for_prompt = (
         textbook_text
@@ -184,21 +217,17 @@ Please generate a key points summary for this chapter, including the question ma
             f"{tb_len} -> {len(textbook_text_for_prompt)} chars"
         )
 
-    # Build prompt
-    user_prompt = f"""
-================= Chapter Questions =================
-{q_text}
-
-================= Textbook Content =================
-{textbook_text_for_prompt}
-
-Please generate a key points summary for this chapter, including the question mapping table.
-"""
-
-    full_prompt = SYSTEM_PROMPT + "\n\n" + user_prompt
+    # Build prompt in one join; the budgets above already fit it within
+    # MAX_PROMPT_CHARS unless the fixed text alone exceeds the limit
+    full_prompt = "".join((
+        SYSTEM_PROMPT, "\n\n",
+        _PROMPT_QUESTIONS_HEADER, q_text,
+        _PROMPT_TEXTBOOK_HEADER, textbook_text_for_prompt,
+        _PROMPT_FOOTER,
+    ))
     prompt_len = len(full_prompt)
-    full_prompt, prompt_truncated = truncate_text(full_prompt, MAX_PROMPT_CHARS)
-    if prompt_truncated:
+    if prompt_len > MAX_PROMPT_CHARS:
+        full_prompt, _ = truncate_text(full_prompt, MAX_PROMPT_CHARS)
         print(
             f"[QPOINTS] WARN: {debug_id} truncated full_prompt "
             f"{prompt_len} -> {len(full_prompt)} chars (limit {MAX_PROMPT_CHARS})"
@@ -213,18 +242,13 @@ Please generate a key points summary for this chapter, including the question ma
     response = response.strip()
 
     # Remove markdown code blocks if present
-    if response.startswith("```"):
-        lines = response.splitlines()
-        if lines and lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        response = "\n".join(lines).strip()
+    response = strip_code_fence(response)
 
     # Check coverage (warning only)
     _check_question_coverage(response, questions, debug_id)
 
     # Write output
-    atomic_write_text(out_file, response, encoding="utf-8")
+    # No fsync: a torn file fails _is_valid_markdown_cache and is regenerated
+    atomic_write_text(out_file, response, encoding="utf-8", durable=False)
     print(f"[QPOINTS] Generated: {out_file.name} ({len(response)} chars)")
     return out_file
@@ -5,12 +5,14 @@ Orchestrates key points generation pipeline.
 Generates knowledge point summaries based on exercise content.
 """
 
+import asyncio
+import os
 import sys
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from config import OUTPUT_DIR, NUM_PROCESSES
-from qpoints_group import generate_question_based_points
+from llm_client import shutdown_requested
+from qpoints_group import generate_question_based_points, has_valid_key_points
 
 
 def _iter_chapters(subject_name: str) -> list[tuple[str, str]]:
@@ -26,15 +28,19 @@ def _iter_chapters(subject_name: str) -> list[tuple[str, str]]:
     if not struct_dir.exists():
         return []
 
+    # One scandir pass over plain names; no Path objects per entry
+    suffix = "_questions.json"
+    with os.scandir(struct_dir) as it:
+        names = [entry.name[:-len(suffix)] for entry in it if entry.name.endswith(suffix)]
+
     chapters = []
-    for json_file in struct_dir.glob("*_questions.json"):
-        name = json_file.stem.replace("_questions", "")
-        if "_" not in name:
-            continue
-        chapter_id, chapter_name = name.split("_", 1)
-        chapters.append((chapter_id, chapter_name))
+    for name in names:
+        chapter_id, sep, chapter_name = name.partition("_")
+        if sep:
+            chapters.append((chapter_id, chapter_name))
 
-    return sorted(chapters, key=lambda x: x[0])
+    # Numeric chapter ids in numeric order ("2" before "10"), then any others
+    return sorted(chapters, key=lambda x: (0, int(x[0])) if x[0].isdecimal() else (1, x[0]))
 
 
 def process_subject(subject_name: str) -> None:
@@ -46,25 +52,38 @@ def process_subject(subject_name: str) -> None:
         print(f"[QPOINTS] No chapters found for {subject_name}")
         return
 
-    with ProcessPoolExecutor(max_workers=NUM_PROCESSES) as executor:
-        futures = {}
-        for chapter_id, chapter_name in chapters:
-            future = executor.submit(
-                generate_question_based_points,
-                subject_name,
-                chapter_id,
-                chapter_name,
-            )
-            futures[future] = (chapter_id, chapter_name)
-
-        for future in as_completed(futures):
-            chapter_id, chapter_name = futures[future]
+    # Cached chapters are skipped here instead of in a worker
+    pending = [
+        (chapter_id, chapter_name)
+        for chapter_id, chapter_name in chapters
+        if not has_valid_key_points(subject_name, chapter_id, chapter_name)
+    ]
+    if len(pending) < len(chapters):
+        print(f"[QPOINTS] SKIP: {len(chapters) - len(pending)} chapters with valid cache for {subject_name}")
+    if not pending:
+        return
+    chapters = pending
+
+    asyncio.run(_process_chapters(subject_name, chapters, NUM_PROCESSES))
+
+
+async def _process_chapters(subject_name: str, chapters: list[tuple[str, str]], max_workers: int) -> None:
+    """Generate key points for all chapters with at most `max_workers` in flight."""
+    # Each chapter mostly waits on the LLM: threads in one process, no pickling or worker startup
+    sem = asyncio.Semaphore(max_workers)
+
+    async def _bounded(chapter_id: str, chapter_name: str) -> None:
+        async with sem:
+            if shutdown_requested():
+                return
             try:
-                future.result()
+                await asyncio.to_thread(generate_question_based_points, subject_name, chapter_id, chapter_name)
                 print(f"[QPOINTS] Completed: Chapter {chapter_id} - {chapter_name}")
             except Exception as e:
                 print(f"[QPOINTS] Error in Chapter {chapter_id}: {e}")
 
+    await asyncio.gather(*(_bounded(chapter_id, chapter_name) for chapter_id, chapter_name in chapters))
+
 
 def main():
     """Main entry point."""
@@ -5,37 +5,64 @@ Main orchestrator for the parallel document processing pipeline.
 Coordinates preprocessing, three processing pipelines, and final assembly.
 """
 
+import asyncio
 import json
+import os
 import sys
+import threading
 import time
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Optional
 
 from config import OUTPUT_DIR, SUBJECT_CONFIG_FILE, NUM_PROCESSES
 from status_manager import SubjectStatusManager
 from preprocessor import main as preprocess_main
 from parser_ocr_questions import run_for_subject
 from brush_group import run_subject_questions_global
-from qpoints_group import generate_question_based_points
+from qpoints_group import generate_question_based_points, has_valid_key_points
 from ppt_group import generate_ppt_notes
 from final_assembler import assemble_subject
+from llm_client import shutdown, shutdown_requested
+
+
+# subject -> set once its question parsing has finished (done or failed).
+# Registered by main() so the pipeline threads can hand off without polling.
+_parsed_events: dict[str, threading.Event] = {}
+
+
+# subject -> (questions_structured mtime_ns, chapters); both downstream
+# pipelines enumerate every subject, usually right after it is parsed
+_chapters_cache: dict[str, tuple[int, list[tuple[str, str]]]] = {}
 
 
 def _iter_chapters(subject_name: str) -> list[tuple[str, str]]:
     """Enumerate chapters from questions_structured directory."""
     struct_dir = OUTPUT_DIR / subject_name / "questions_structured"
-    if not struct_dir.exists():
+    try:
+        mtime_ns = struct_dir.stat().st_mtime_ns
+    except FileNotFoundError:
         return []
 
+    cached = _chapters_cache.get(subject_name)
+    if cached is not None and cached[0] == mtime_ns:
+        return list(cached[1])
+
+    # One scandir pass over plain names; no Path objects per entry
+    suffix = "_questions.json"
+    with os.scandir(struct_dir) as it:
+        names = [entry.name[:-len(suffix)] for entry in it if entry.name.endswith(suffix)]
+
     chapters = []
-    for json_file in struct_dir.glob("*_questions.json"):
-        name = json_file.stem.replace("_questions", "")
-        if "_" not in name:
-            continue
-        chapter_id, chapter_name = name.split("_", 1)
-        chapters.append((chapter_id, chapter_name))
+    for name in names:
+        chapter_id, sep, chapter_name = name.partition("_")
+        if sep:
+            chapters.append((chapter_id, chapter_name))
 
-    return sorted(chapters, key=lambda x: x[0])
+    # Numeric chapter ids in numeric order ("2" before "10"), then any others
+    chapters.sort(key=lambda x: (0, int(x[0])) if x[0].isdecimal() else (1, x[0]))
+    _chapters_cache[subject_name] = (mtime_ns, chapters)
+    return list(chapters)
 
 
 def run_questions_pipeline(subjects: list[str]) -> None:
@@ -49,90 +76,135 @@ def run_questions_pipeline(subjects: list[str]) -> None:
 
     # Parse all questions first
     for subject in subjects:
+        if shutdown_requested():
+            return
         print(f"[QUESTIONS] Parsing questions for: {subject}")
         try:
             run_for_subject(subject)
         except Exception as e:
             print(f"[QUESTIONS] Parsing failed for {subject}: {e}")
+        finally:
+            event = _parsed_events.get(subject)
+            if event is not None:
+                event.set()
 
     # Generate explanations (uses global thread pool internally)
     for subject in subjects:
+        if shutdown_requested():
+            return
         try:
             run_subject_questions_global(subject)
         except Exception as e:
             print(f"[QUESTIONS] Explanation generation failed for {subject}: {e}")
 
 
-def run_keypoints_pipeline(subjects: list[str]) -> None:
+def _run_chapter_task(
+    func: Callable[[str, str, str], object],
+    subject: str,
+    chapter_id: str,
+    chapter_name: str,
+) -> tuple[bool, str, str, Optional[str]]:
+    """Pool worker: run one chapter task, reporting failure instead of raising."""
+    try:
+        func(subject, chapter_id, chapter_name)
+        return True, subject, chapter_id, None
+    except Exception as e:
+        return False, subject, chapter_id, str(e)
+
+
+def _run_chapter_pipeline(
+    pool: ProcessPoolExecutor,
+    subjects: list[str],
+    label: str,
+    func: Callable[[str, str, str], object],
+    is_cached: Optional[Callable[[str, str, str], bool]] = None,
+    timeout_s: float = 1800.0,
+) -> None:
     """
-    Step 2: Key Points Pipeline
+    Run `func(subject, chapter_id, chapter_name)` for every chapter on `pool`.
 
-    Generate knowledge point summaries based on exercise content.
+    Each subject's chapters are handed to the pool as one `map` batch as soon as
+    that subject's questions are parsed, so downstream work overlaps with parsing
+    of the remaining subjects. Chapters for which `is_cached` returns True never
+    reach the pool.
     """
-    print("=== Pipeline 2: Key Points Generation ===")
-    _wait_for_questions_structured(subjects, label="KEYPOINTS")
+    start = time.monotonic()
+    batches = []
+    total = 0
+    cached = 0
 
-    tasks = []
     for subject in subjects:
-        chapters = _iter_chapters(subject)
-        for chapter_id, chapter_name in chapters:
-            tasks.append((subject, chapter_id, chapter_name))
+        remaining = max(0.0, timeout_s - (time.monotonic() - start))
+        _wait_for_questions_structured([subject], label=label, timeout_s=remaining)
+        if shutdown_requested():
+            break
+
+        chapter_ids = []
+        chapter_names = []
+        for chapter_id, chapter_name in _iter_chapters(subject):
+            if is_cached is not None and is_cached(subject, chapter_id, chapter_name):
+                cached += 1
+                continue
+            chapter_ids.append(chapter_id)
+            chapter_names.append(chapter_name)
+        if not chapter_ids:
+            continue
 
-    if not tasks:
-        print("[KEYPOINTS] No tasks found, skipping pipeline")
+        # Several chapters per IPC message once there are enough to keep every
+        # worker busy; map() submits all chunks immediately
+        chunksize = max(1, len(chapter_ids) // (NUM_PROCESSES * 4))
+        batches.append(pool.map(
+            _run_chapter_task,
+            [func] * len(chapter_ids),
+            [subject] * len(chapter_ids),
+            chapter_ids,
+            chapter_names,
+            chunksize=chunksize,
+        ))
+        total += len(chapter_ids)
+        print(f"[{label}] Queued {len(chapter_ids)} chapters for {subject}")
+
+    if cached:
+        print(f"[{label}] SKIP: {cached} chapters with valid cache")
+
+    if not batches:
+        print(f"[{label}] No tasks found, skipping pipeline")
         return
 
-    print(f"[KEYPOINTS] Processing {len(tasks)} chapters across {len(subjects)} subjects")
+    print(f"[{label}] Processing {total} chapters across {len(subjects)} subjects")
 
-    with ProcessPoolExecutor(max_workers=NUM_PROCESSES) as executor:
-        futures = {
-            executor.submit(generate_question_based_points, subj, cid, cname): (subj, cid, cname)
-            for subj, cid, cname in tasks
-        }
+    for results in batches:
+        try:
+            for ok, subject, chapter_id, err in results:
+                if ok:
+                    print(f"[{label}] Completed: {subject} - Chapter {chapter_id}")
+                else:
+                    print(f"[{label}] Error: {subject} Chapter {chapter_id}: {err}")
+        except Exception as e:
+            # Pool-level failure (e.g. a worker died); the rest of the batch is lost
+            print(f"[{label}] Error: batch failed: {e}")
 
-        for future in as_completed(futures):
-            subject, chapter_id, chapter_name = futures[future]
-            try:
-                future.result()
-                print(f"[KEYPOINTS] Completed: {subject} - Chapter {chapter_id}")
-            except Exception as e:
-                print(f"[KEYPOINTS] Error: {subject} Chapter {chapter_id}: {e}")
 
+def run_keypoints_pipeline(subjects: list[str], pool: ProcessPoolExecutor) -> None:
+    """
+    Step 2: Key Points Pipeline
 
-def run_ppt_pipeline(subjects: list[str]) -> None:
+    Generate knowledge point summaries based on exercise content.
+    """
+    print("=== Pipeline 2: Key Points Generation ===")
+    _run_chapter_pipeline(
+        pool, subjects, "KEYPOINTS", generate_question_based_points, is_cached=has_valid_key_points
+    )
+
+
+def run_ppt_pipeline(subjects: list[str], pool: ProcessPoolExecutor) -> None:
     """
     Step 3: PPT Integration Pipeline
 
     Generate integrated lecture notes combining PPT with textbook content.
     """
     print("=== Pipeline 3: PPT Integration ===")
-    _wait_for_questions_structured(subjects, label="PPT")
-
-    tasks = []
-    for subject in subjects:
-        chapters = _iter_chapters(subject)
-        for chapter_id, chapter_name in chapters:
-            tasks.append((subject, chapter_id, chapter_name))
-
-    if not tasks:
-        print("[PPT] No tasks found, skipping pipeline")
-        return
-
-    print(f"[PPT] Processing {len(tasks)} chapters across {len(subjects)} subjects")
-
-    with ProcessPoolExecutor(max_workers=NUM_PROCESSES) as executor:
-        futures = {
-            executor.submit(generate_ppt_notes, subj, cid, cname): (subj, cid, cname)
-            for subj, cid, cname in tasks
-        }
-
-        for future in as_completed(futures):
-            subject, chapter_id, chapter_name = futures[future]
-            try:
-                future.result()
-                print(f"[PPT] Completed: {subject} - Chapter {chapter_id}")
-            except Exception as e:
-                print(f"[PPT] Error: {subject} Chapter {chapter_id}: {e}")
+    _run_chapter_pipeline(pool, subjects, "PPT", generate_ppt_notes)
 
 
 def discover_subjects() -> list[str]:
@@ -152,14 +224,26 @@ def discover_subjects() -> list[str]:
     # Fallback to directory scan
     if not subjects and OUTPUT_DIR.exists():
         print("[CONFIG] Scanning output directory for subjects...")
-        subjects = [
-            d.name for d in OUTPUT_DIR.iterdir()
-            if d.is_dir() and (d / "raw").exists()
-        ]
+        # DirEntry.is_dir() uses the type from the directory listing; only
+        # the raw/ check needs a stat
+        with os.scandir(OUTPUT_DIR) as it:
+            subjects = [
+                entry.name for entry in it
+                if entry.is_dir() and os.path.isdir(os.path.join(entry.path, "raw"))
+            ]
 
     return subjects
 
 
+def _questions_parsed(subject: str) -> bool:
+    """Whether question parsing for `subject` has reached a terminal state."""
+    event = _parsed_events.get(subject)
+    if event is not None:
+        return event.is_set()
+    state = SubjectStatusManager(subject).get_pipeline_status().get("questions_structured_state")
+    return state in {"done", "error"}
+
+
 def _wait_for_questions_structured(
     subjects: list[str],
     *,
@@ -170,7 +254,8 @@ def _wait_for_questions_structured(
     """
     Avoid a race where downstream pipelines start before question JSONs are produced.
 
-    Waits until each subject reports a terminal parsing state ("done"/"error") in
+    Waits on the subject's parsed event when main() registered one; otherwise
+    until the subject reports a terminal parsing state ("done"/"error") in
     `output/<subject>/.status/pipeline.json`.
     """
     if not subjects:
@@ -181,13 +266,11 @@ def _wait_for_questions_structured(
     last_log = 0.0
 
     while pending:
+        if shutdown_requested():
+            return
+
         for subject in list(pending):
-            state = (
-                SubjectStatusManager(subject)
-                .get_pipeline_status()
-                .get("questions_structured_state")
-            )
-            if state in {"done", "error"}:
+            if _questions_parsed(subject):
                 pending.remove(subject)
 
         if not pending:
@@ -204,7 +287,54 @@ def _wait_for_questions_structured(
             print(f"[{label}] Waiting for question parsing ({len(pending)}): {sample}{suffix}")
             last_log = elapsed
 
-        time.sleep(poll_interval_s)
+        # Subjects are parsed in order: block on the first pending one
+        event = _parsed_events.get(next(s for s in subjects if s in pending))
+        if event is not None:
+            event.wait(timeout=min(10.0, timeout_s - elapsed))
+        else:
+            time.sleep(poll_interval_s)
+
+
+def _abort_pipelines(pool: ProcessPoolExecutor) -> None:
+    """
+    Stop the pipelines promptly on Ctrl+C, before their executors are joined.
+
+    Wakes LLM retry backoffs and subjects still waiting for parsing in this
+    process, and drops chapter tasks not yet started in the shared pool. Pool
+    workers receive the terminal's SIGINT themselves.
+    """
+    shutdown()
+    for event in _parsed_events.values():
+        event.set()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_pipelines(
+    subjects: list[str],
+    pipelines: list[tuple[str, Callable, tuple]],
+    pool: ProcessPoolExecutor,
+) -> None:
+    """
+    Run the pipelines concurrently and log each one as it finishes.
+
+    NOTE: Pipelines are driven from threads; only the shared pool spawns processes.
+    """
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=len(pipelines)) as executor:
+        async def run(name: str, func: Callable, args: tuple) -> None:
+            try:
+                await loop.run_in_executor(executor, func, subjects, *args)
+                print(f"[PIPELINE] {name} completed successfully")
+            except Exception as e:
+                print(f"[PIPELINE] {name} failed: {e}", file=sys.stderr)
+
+        try:
+            await asyncio.gather(*(run(name, func, args) for name, func, args in pipelines))
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            # Leaving the with-block joins the pipeline threads: abort them first
+            _abort_pipelines(pool)
+            raise
 
 
 def main():
@@ -242,30 +372,23 @@ def main():
             questions_structured_state="pending",
             questions_structured_error=None,
         )
+        _parsed_events[subject] = threading.Event()
 
     # Step 2-4: Run all three pipelines in parallel
     print("\n=== Starting Parallel Pipelines ===")
+    # One worker pool shared by the key points and PPT pipelines, so the two
+    # don't each spawn NUM_PROCESSES workers and oversubscribe the CPU
+    pool = ProcessPoolExecutor(max_workers=NUM_PROCESSES)
     pipelines = [
-        ("Questions", run_questions_pipeline),
-        ("KeyPoints", run_keypoints_pipeline),
-        ("PPT", run_ppt_pipeline),
+        ("Questions", run_questions_pipeline, ()),
+        ("KeyPoints", run_keypoints_pipeline, (pool,)),
+        ("PPT", run_ppt_pipeline, (pool,)),
     ]
 
-    # NOTE: Use threads here to avoid nested process pools on Windows.
-    # The key points and PPT pipelines already use ProcessPoolExecutor internally.
-    with ThreadPoolExecutor(max_workers=len(pipelines)) as executor:
-        futures = {
-            executor.submit(func, subjects): name
-            for name, func in pipelines
-        }
-
-        for future in as_completed(futures):
-            pipeline_name = futures[future]
-            try:
-                future.result()
-                print(f"[PIPELINE] {pipeline_name} completed successfully")
-            except Exception as e:
-                print(f"[PIPELINE] {pipeline_name} failed: {e}", file=sys.stderr)
+    try:
+        asyncio.run(_run_pipelines(subjects, pipelines, pool))
+    finally:
+        pool.shutdown()
 
     # Step 5: Final Assembly
     print("\n=== Step 5: Final Assembly ===")
@@ -7,10 +7,12 @@ Each subject maintains independent status files in its own directory.
 
 from __future__ import annotations
 import json
+import time
+from contextlib import ExitStack
 from datetime import datetime
 from pathlib import Path
 from config import OUTPUT_DIR
-from utils_fs import atomic_write_json, file_lock
+from utils_fs import atomic_write_json, atomic_write_many, file_lock, json_dumps_bytes
 
 
 class SubjectStatusManager:
@@ -25,6 +27,9 @@ class SubjectStatusManager:
     def __init__(self, subject_name: str):
         self.subject_dir = OUTPUT_DIR / subject_name
         self.status_dir = self.subject_dir / ".status"
+        # Last parsed pipeline.json, valid while the file's stat stamp matches
+        self._pipeline_cache: dict | None = None
+        self._pipeline_stamp: tuple[int, int, int] | None = None
 
     def _read_status(self, file_path: Path) -> dict:
         """Read status from a JSON file."""
@@ -33,41 +38,113 @@ class SubjectStatusManager:
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
 
-    def _write_status(self, file_path: Path, data: dict) -> None:
-        """Write status to a JSON file."""
+    def _write_status(self, file_path: Path, data: dict) -> bool:
+        """
+        Write status to a JSON file.
+
+        Not fsynced: status is advisory, and a file lost or torn by a crash
+        reads back as {} and only causes work to be redone.
+        """
         try:
-            atomic_write_json(file_path, data, ensure_ascii=False, indent=2)
+            # Machine-written: compact, no indentation
+            atomic_write_json(file_path, data, indent=None, durable=False)
+            return True
         except Exception as e:
             print(f"[WARN] Failed to write status to {file_path}: {e}")
+            return False
+
+    @staticmethod
+    def _stat_stamp(file_path: Path) -> tuple[int, int, int] | None:
+        # Atomic replaces give the file a new inode, so this also catches
+        # writes by other processes within the same mtime tick
+        try:
+            st = file_path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load_pipeline_status(self, file_path: Path) -> dict:
+        """Parsed pipeline.json, re-read only when the file changed on disk."""
+        stamp = self._stat_stamp(file_path)
+        if stamp is None:
+            self._pipeline_cache = self._pipeline_stamp = None
+            return {}
+        if self._pipeline_cache is None or stamp != self._pipeline_stamp:
+            self._pipeline_cache = self._read_status(file_path)
+            self._pipeline_stamp = stamp
+        return self._pipeline_cache
 
     # Preprocessing status (preprocess.json)
     def get_preprocess_status(self) -> dict:
         """Get preprocessing status for this subject."""
         return self._read_status(self.status_dir / "preprocess.json")
 
+    @staticmethod
+    def _preprocess_payload(source_hash: str, metadata: dict) -> dict:
+        data = {
+            "source_hash": source_hash,
+            "updated_at_ns": time.time_ns(),
+        }
+        data.update(metadata)
+        return data
+
     def set_preprocess_status(self, source_hash: str, **metadata) -> None:
         """Update preprocessing status with source hash and metadata."""
         path = self.status_dir / "preprocess.json"
         lock_path = path.with_suffix(path.suffix + ".lock")
         with file_lock(lock_path):
-            data = {
-                "source_hash": source_hash,
-                "updated_at": datetime.now().isoformat(timespec="seconds"),
-            }
-            data.update(metadata)
-            self._write_status(path, data)
+            self._write_status(path, self._preprocess_payload(source_hash, metadata))
+
+    @classmethod
+    def set_preprocess_status_many(cls, statuses: dict[str, dict]) -> None:
+        """
+        Update preprocessing status for several subjects in one batched write.
+
+        `statuses` maps subject name to the keyword arguments that
+        set_preprocess_status() would take (including source_hash).
+        """
+        paths = {
+            subject: cls(subject).status_dir / "preprocess.json"
+            for subject in statuses
+        }
+        with ExitStack() as stack:
+            # Fixed lock order so concurrent batches cannot deadlock
+            for path in sorted(paths.values()):
+                stack.enter_context(file_lock(path.with_suffix(path.suffix + ".lock")))
+
+            items = []
+            for subject, metadata in statuses.items():
+                metadata = dict(metadata)
+                data = cls._preprocess_payload(metadata.pop("source_hash"), metadata)
+                items.append((paths[subject], json_dumps_bytes(data)))
+
+            try:
+                atomic_write_many(items, durable=False)
+            except Exception as e:
+                print(f"[WARN] Failed to write preprocess status for {sorted(statuses)}: {e}")
 
     # Pipeline processing status (pipeline.json)
     def get_pipeline_status(self) -> dict:
         """Get pipeline processing status."""
-        return self._read_status(self.status_dir / "pipeline.json")
+        return dict(self._load_pipeline_status(self.status_dir / "pipeline.json"))
+
+    def get_pipeline_status_pretty(self) -> dict:
+        """Pipeline status with `updated_at_ns` rendered as an ISO `updated_at` for display."""
+        data = self.get_pipeline_status()
+        ns = data.pop("updated_at_ns", None)
+        if isinstance(ns, int):
+            data["updated_at"] = datetime.fromtimestamp(ns / 1e9).isoformat(timespec="seconds")
+        return data
 
     def update_pipeline_status(self, **kwargs) -> None:
         """Update pipeline processing status."""
         path = self.status_dir / "pipeline.json"
         lock_path = path.with_suffix(path.suffix + ".lock")
         with file_lock(lock_path):
-            data = self._read_status(path)
+            data = dict(self._load_pipeline_status(path))
             data.update(kwargs)
-            data["updated_at"] = datetime.now().isoformat(timespec="seconds")
-            self._write_status(path, data)
+            data.pop("updated_at", None)  # ISO field written by older versions
+            data["updated_at_ns"] = time.time_ns()
+            if self._write_status(path, data):
+                self._pipeline_cache = data
+                self._pipeline_stamp = self._stat_stamp(path)
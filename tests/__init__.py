@@ -0,0 +1,19 @@
+"""
+MedForge test suite.
+
+Run from the repository root:
+    python -m unittest discover -s tests -t .
+
+config.py creates output/data/logs under MEDFORGE_ROOT at import, so the
+suite points it at a throwaway directory before any project module loads.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+TEST_ROOT = Path(tempfile.mkdtemp(prefix="medforge-tests-"))
+os.environ["MEDFORGE_ROOT"] = str(TEST_ROOT)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,119 @@
+"""Tests for batched exercise solving in brush_group."""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import brush_group
+
+
+def _question(qid: int, answer: str = "A") -> dict:
+    return {
+        "id": qid,
+        "stem": f"Stem of question {qid}",
+        "options": {"A": "first", "B": "second"},
+        "raw_answer": answer,
+        "raw_expl": "",
+    }
+
+
+def _solution(qid, answer: str = "A") -> dict:
+    return {
+        "id": qid,
+        "final_answer": answer,
+        "original_answer": answer,
+        "final_expl_markdown": "Option A is right because of the textbook definition.",
+    }
+
+
+class ParseLlmJsonArrayTest(unittest.TestCase):
+    def test_plain_array(self):
+        self.assertEqual(brush_group._parse_llm_json_array('[{"id": 1}, {"id": 2}]'), [{"id": 1}, {"id": 2}])
+
+    def test_code_fenced_array(self):
+        resp = '```json\n[{"id": 1}]\n```'
+        self.assertEqual(brush_group._parse_llm_json_array(resp), [{"id": 1}])
+
+    def test_array_with_surrounding_text(self):
+        resp = 'Here are the solutions:\n[{"id": 1, "final_answer": "A"}]\nDone.'
+        self.assertEqual(brush_group._parse_llm_json_array(resp), [{"id": 1, "final_answer": "A"}])
+
+    def test_object_is_not_an_array(self):
+        self.assertIsNone(brush_group._parse_llm_json_array('{"id": 1}'))
+
+    def test_invalid_json(self):
+        self.assertIsNone(brush_group._parse_llm_json_array('[{"id": 1,]'))
+
+    def test_empty(self):
+        self.assertIsNone(brush_group._parse_llm_json_array(""))
+
+
+class BatchPromptTest(unittest.TestCase):
+    def test_batch_prompt_drops_single_question_rule(self):
+        qs = [_question(1), _question(2)]
+        with mock.patch.object(brush_group, "call_llm_with_smart_routing", return_value=None) as llm:
+            brush_group.ask_llm_batch(qs, "", "Bio", "Cells")
+        prompt = llm.call_args[0][0]
+        self.assertNotIn("Process only one question per request", prompt)
+        self.assertIn("JSON array", prompt)
+        self.assertIn('"id"', prompt)
+
+    def test_single_prompt_keeps_single_question_rule(self):
+        prefix, _, _ = brush_group._build_prompt_prefix("")
+        self.assertIn("Process only one question per request", prefix)
+
+    def test_quota_exhausted_falls_back(self):
+        qs = [_question(1), _question(2)]
+        err = brush_group.QuotaExhausted("all models failed")
+        with mock.patch.object(brush_group, "call_llm_with_smart_routing", side_effect=err):
+            self.assertEqual(brush_group.ask_llm_batch(qs, "", "Bio", "Cells"), {})
+
+    def test_unexpected_errors_propagate(self):
+        qs = [_question(1), _question(2)]
+        with mock.patch.object(brush_group, "call_llm_with_smart_routing", side_effect=KeyError("bug")):
+            with self.assertRaises(KeyError):
+                brush_group.ask_llm_batch(qs, "", "Bio", "Cells")
+
+
+class ProcessQuestionBatchTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+
+    def test_partial_batch_falls_back_per_question(self):
+        qs = [_question(1), _question(2), _question(3)]
+        # Q2 is missing from the batch output and Q3 fails validation
+        bad = _solution(3, answer="E")
+        resp = brush_group.json.dumps([_solution(1), bad])
+        repaired = _solution(None)
+        repaired.pop("id")
+
+        with mock.patch.object(brush_group, "call_llm_with_smart_routing", return_value=resp), \
+                mock.patch.object(brush_group, "ask_llm_with_repair", return_value=repaired) as repair, \
+                mock.patch.object(brush_group, "_remember_solution"):
+            outcomes = brush_group.process_question_batch(
+                "Bio", "01", "Cells", "", qs, self.cache_dir
+            )
+
+        self.assertEqual(outcomes, [(1, True, ""), (2, True, ""), (3, True, "")])
+        self.assertEqual([c.args[0]["id"] for c in repair.call_args_list], [2, 3])
+        for qid in (1, 2, 3):
+            self.assertTrue((self.cache_dir / f"{qid}.md").exists())
+
+    def test_unparseable_batch_retries_every_question(self):
+        qs = [_question(1), _question(2)]
+        repaired = _solution(None)
+        repaired.pop("id")
+
+        with mock.patch.object(brush_group, "call_llm_with_smart_routing", return_value="not json"), \
+                mock.patch.object(brush_group, "ask_llm_with_repair", return_value=repaired) as repair, \
+                mock.patch.object(brush_group, "_remember_solution"):
+            brush_group.process_question_batch("Bio", "01", "Cells", "", qs, self.cache_dir)
+
+        self.assertEqual(repair.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
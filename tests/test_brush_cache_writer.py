@@ -0,0 +1,67 @@
+"""Tests for the background question cache writer in brush_group."""
+
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import brush_group
+from config import OUTPUT_DIR
+
+
+class QuestionCacheWriterTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+
+    def test_unexpected_error_does_not_stop_writer(self):
+        real_write = brush_group._write_question_cache
+        calls = []
+
+        def flaky_write(cache_dir, q_id, md_block):
+            calls.append(q_id)
+            if q_id == 1:
+                raise ValueError("unexpected")
+            real_write(cache_dir, q_id, md_block)
+
+        with mock.patch.object(brush_group, "_write_question_cache", side_effect=flaky_write), \
+                contextlib.redirect_stdout(io.StringIO()):
+            with brush_group.QuestionCacheWriter() as writer:
+                writer.submit(self.cache_dir, 1, "### 1. a\n")
+                writer.submit(self.cache_dir, 2, "### 2. b\n")
+
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(writer.failed, 1)
+        self.assertFalse((self.cache_dir / "1.md").exists())
+        self.assertTrue((self.cache_dir / "2.md").exists())
+
+    def test_global_run_reports_failed_writes_as_unresolved(self):
+        subject = "WriterFailSubject"
+        struct_dir = OUTPUT_DIR / subject / "questions_structured"
+        struct_dir.mkdir(parents=True, exist_ok=True)
+        questions = [{"id": 1, "stem": "Stem", "options": {"A": "a", "B": "b"}, "raw_answer": "A"}]
+        (struct_dir / "01_Cells_questions.json").write_text(json.dumps(questions), encoding="utf-8")
+
+        solution = {
+            "final_answer": "A",
+            "original_answer": "A",
+            "final_expl_markdown": "Option A is right because of the textbook definition.",
+        }
+        out = io.StringIO()
+        with mock.patch.object(brush_group, "ask_llm_with_repair", return_value=solution), \
+                mock.patch.object(brush_group, "_remember_solution"), \
+                mock.patch.object(brush_group, "_write_question_cache", side_effect=OSError("disk full")), \
+                mock.patch.object(brush_group, "assemble_chapter_from_cache"), \
+                contextlib.redirect_stdout(out):
+            brush_group.run_subject_questions_global(subject)
+
+        self.assertIn("1 solved questions could not be written to cache and remain unresolved", out.getvalue())
+        self.assertIn("ok=0, fail=1", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests for the per-chapter done index in brush_group."""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import brush_group
+from config import OUTPUT_DIR
+
+VALID_MD = "### 1. Stem\n\n" + "x" * brush_group.MIN_VALID_CACHE_BYTES + "\n"
+
+
+def _write_cache(cache_dir: Path, qids) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for qid in qids:
+        (cache_dir / f"{qid}.md").write_text(VALID_MD, encoding="utf-8")
+    (cache_dir / brush_group.DONE_INDEX_NAME).write_text(
+        "".join(f"{qid}\n" for qid in qids), encoding="utf-8"
+    )
+
+
+class LoadDoneIdsTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name) / "01_Cells"
+
+    def test_index_trusted_when_all_files_present(self):
+        _write_cache(self.cache_dir, [1, 2, 3])
+        with mock.patch.object(brush_group, "_scan_done_ids") as scan:
+            self.assertEqual(brush_group._load_done_ids(self.cache_dir), {1, 2, 3})
+        scan.assert_not_called()
+
+    def test_deleted_md_is_dropped_and_index_rebuilt(self):
+        _write_cache(self.cache_dir, [1, 2, 3])
+        (self.cache_dir / "2.md").unlink()
+
+        self.assertEqual(brush_group._load_done_ids(self.cache_dir), {1, 3})
+        index = (self.cache_dir / brush_group.DONE_INDEX_NAME).read_text(encoding="utf-8").split()
+        self.assertEqual(index, ["1", "3"])
+
+    def test_truncated_md_is_removed_and_dropped(self):
+        _write_cache(self.cache_dir, [1, 2])
+        (self.cache_dir / "1.md").write_text("### 1.", encoding="utf-8")
+
+        self.assertEqual(brush_group._load_done_ids(self.cache_dir), {2})
+        self.assertFalse((self.cache_dir / "1.md").exists())
+
+    def test_missing_index_is_built_from_files(self):
+        _write_cache(self.cache_dir, [4, 5])
+        (self.cache_dir / brush_group.DONE_INDEX_NAME).unlink()
+
+        self.assertEqual(brush_group._load_done_ids(self.cache_dir), {4, 5})
+        self.assertTrue((self.cache_dir / brush_group.DONE_INDEX_NAME).exists())
+
+
+class RequeueTest(unittest.TestCase):
+    def test_deleted_md_question_is_requeued(self):
+        subject = "RequeueSubject"
+        struct_dir = OUTPUT_DIR / subject / "questions_structured"
+        struct_dir.mkdir(parents=True, exist_ok=True)
+        questions = [
+            {"id": qid, "stem": f"Stem {qid}", "options": {"A": "a", "B": "b"}, "raw_answer": "A"}
+            for qid in (1, 2, 3)
+        ]
+        (struct_dir / "01_Cells_questions.json").write_text(json.dumps(questions), encoding="utf-8")
+
+        cache_dir = OUTPUT_DIR / subject / "cache" / "brush" / "01_Cells"
+        _write_cache(cache_dir, [1, 2, 3])
+        (cache_dir / "2.md").unlink()
+
+        queued = []
+
+        def fake_batch(subject, chap_id, chap_name, tb_context, qs, cache_dir, writer):
+            queued.extend(q["id"] for q in qs)
+            return [(q["id"], True, "") for q in qs]
+
+        with mock.patch.object(brush_group, "process_question_batch", side_effect=fake_batch), \
+                mock.patch.object(brush_group, "assemble_chapter_from_cache"):
+            brush_group.run_subject_questions_global(subject)
+
+        self.assertEqual(queued, [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Tests for the shared, cached question loader in brush_group."""
+
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import brush_group
+from config import OUTPUT_DIR
+
+
+class LoadQuestionsTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.q_file = Path(tmp.name) / "01_Cells_questions.json"
+        self.q_file.write_text(json.dumps([
+            {"id": 1, "stem": " Stem  one ", "options": {"A": " a ", "B": "b"}, "raw_answer": "A"},
+        ]), encoding="utf-8")
+
+    def test_loaded_questions_are_normalized_up_front(self):
+        (q,) = brush_group._load_questions(self.q_file)
+        self.assertIn("_normalized", q)
+        before = dict(q)
+        with mock.patch.object(brush_group, "_compute_normalized") as compute:
+            self.assertEqual(brush_group._normalize_question(q), q["_normalized"])
+        compute.assert_not_called()
+        self.assertEqual(q, before)
+
+    def test_other_dicts_are_not_mutated(self):
+        q = {"id": 2, "stem": "Stem", "options": {"A": "a"}}
+        stem, options, _options_json = brush_group._normalize_question(q)
+        self.assertEqual(stem, brush_group.normalize_text("Stem"))
+        self.assertEqual(set(options), {"A"})
+        self.assertNotIn("_normalized", q)
+
+    def test_non_string_options_do_not_fail_the_load(self):
+        self.q_file.write_text(json.dumps([
+            {"id": 1, "stem": "Bad", "options": {"A": 12, "B": "y"}, "raw_answer": "A"},
+            {"id": 2, "stem": "Good", "options": {"A": "x", "B": "y"}, "raw_answer": "B"},
+        ]), encoding="utf-8")
+        with contextlib.redirect_stdout(io.StringIO()):
+            bad, good = brush_group._load_questions(self.q_file)
+        self.assertNotIn("_normalized", bad)
+        self.assertIn("_normalized", good)
+
+
+class MalformedQuestionTest(unittest.TestCase):
+    def test_malformed_question_does_not_abort_subject(self):
+        subject = "MalformedSubject"
+        struct_dir = OUTPUT_DIR / subject / "questions_structured"
+        struct_dir.mkdir(parents=True, exist_ok=True)
+        (struct_dir / "01_Cells_questions.json").write_text(json.dumps([
+            {"id": 1, "stem": "Bad", "options": {"A": 12, "B": "y"}, "raw_answer": "A"},
+            {"id": 2, "stem": "Good", "options": {"A": "x", "B": "y"}, "raw_answer": "B"},
+        ]), encoding="utf-8")
+
+        queued = []
+
+        def fake_batch(subject, chap_id, chap_name, tb_context, qs, cache_dir, writer):
+            queued.extend(q["id"] for q in qs)
+            return [(q["id"], False, "no LLM") for q in qs]
+
+        with mock.patch.object(brush_group, "process_question_batch", side_effect=fake_batch), \
+                mock.patch.object(brush_group, "assemble_chapter_from_cache") as assemble, \
+                contextlib.redirect_stdout(io.StringIO()):
+            brush_group.run_subject_questions_global(subject)
+
+        self.assertEqual(queued, [2])
+        assemble.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Chapter names derived from questions_structured must agree across pipelines."""
+
+import unittest
+from unittest import mock
+
+import brush_group
+import ppt_runner
+import qpoints_runner
+import run_all
+from config import OUTPUT_DIR
+
+SUBJECT = "ChapterNamesSubject"
+FILES = (
+    "01_Cells_questions.json",
+    # Chapter name that itself contains "_questions"
+    "02_Practice_questions_questions.json",
+    "10_Genetics_questions.json",
+    # No "{id}_" prefix: only the PPT pipeline handles it, as chapter "00"
+    "misc_questions.json",
+)
+EXPECTED = {("01", "Cells"), ("02", "Practice_questions"), ("10", "Genetics")}
+
+
+class ChapterNamesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        struct_dir = OUTPUT_DIR / SUBJECT / "questions_structured"
+        struct_dir.mkdir(parents=True, exist_ok=True)
+        for name in FILES:
+            (struct_dir / name).write_text("[]", encoding="utf-8")
+
+    def test_runners_agree(self):
+        self.assertEqual(set(run_all._iter_chapters(SUBJECT)), EXPECTED)
+        self.assertEqual(set(qpoints_runner._iter_chapters(SUBJECT)), EXPECTED)
+        self.assertEqual(set(ppt_runner._collect_chapters(SUBJECT)) - {("00", "misc")}, EXPECTED)
+
+    def test_ppt_keeps_unprefixed_chapters_under_id_00(self):
+        self.assertIn(("00", "misc"), ppt_runner._collect_chapters(SUBJECT))
+
+    def test_brush_assembles_same_chapters(self):
+        with mock.patch.object(brush_group, "assemble_chapter_from_cache") as assemble:
+            brush_group.run_subject_questions_global(SUBJECT)
+        assembled = {(c.args[1], c.args[2]) for c in assemble.call_args_list}
+        self.assertEqual(assembled, EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()
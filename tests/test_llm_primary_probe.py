@@ -0,0 +1,58 @@
+"""Tests for the background primary-model health check in llm_client."""
+
+import threading
+import unittest
+from unittest import mock
+
+import llm_client
+
+
+class PrimaryProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(llm_client._shutdown_event.clear)
+        patcher = mock.patch.object(llm_client.model_router, "should_retry_primary", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_probe_does_not_resend_the_prompt(self):
+        prompts = []
+        probed = threading.Event()
+
+        def fake_call(prompt, model=None, **kwargs):
+            prompts.append(prompt)
+            if prompt == llm_client._PROBE_PROMPT:
+                probed.set()
+            return "answer"
+
+        with mock.patch.object(llm_client, "call_llm", side_effect=fake_call), \
+                mock.patch.object(llm_client.model_router, "mark_primary_success"), \
+                mock.patch.object(llm_client.model_router, "switch_to_fallback"):
+            self.assertEqual(llm_client.call_llm_with_smart_routing("the real prompt", "T"), "answer")
+            self.assertTrue(probed.wait(5))
+            # The probe releases its lock last, after updating the router
+            self.assertTrue(llm_client._PROBE_LOCK.acquire(timeout=5))
+            llm_client._PROBE_LOCK.release()
+
+        self.assertEqual(prompts.count("the real prompt"), 1)
+        self.assertIn(llm_client._PROBE_PROMPT, prompts)
+
+    def test_pool_is_created_lazily_and_shut_down(self):
+        llm_client.shutdown()
+        llm_client._shutdown_event.clear()
+        self.assertIsNone(llm_client._PROBE_POOL)
+
+        with mock.patch.object(llm_client, "call_llm", return_value=None):
+            probe = llm_client._start_primary_probe("T", None)
+            self.assertIsNotNone(probe)
+            self.assertFalse(probe.result(5))
+        self.assertIsNotNone(llm_client._PROBE_POOL)
+
+        llm_client.shutdown()
+        self.assertIsNone(llm_client._PROBE_POOL)
+        # The probe lock was released, so a later run can probe again
+        self.assertTrue(llm_client._PROBE_LOCK.acquire(blocking=False))
+        llm_client._PROBE_LOCK.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
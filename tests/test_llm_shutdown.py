@@ -0,0 +1,58 @@
+"""No new LLM requests may start once llm_client.shutdown() has been called."""
+
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import brush_group
+import llm_client
+
+
+class LlmShutdownTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(llm_client._shutdown_event.clear)
+        patcher = mock.patch.object(llm_client.model_router, "should_retry_primary", return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_routing_sends_nothing_after_shutdown(self):
+        llm_client.shutdown()
+        with mock.patch.object(llm_client, "call_llm") as call:
+            self.assertIsNone(llm_client.call_llm_with_smart_routing("prompt", "T"))
+        call.assert_not_called()
+
+    def test_fallback_chain_stops_at_shutdown(self):
+        def failing_call(*args, **kwargs):
+            llm_client.shutdown()
+            raise llm_client.QuotaExhausted("quota")
+
+        with mock.patch.object(llm_client, "call_llm", side_effect=failing_call) as call:
+            self.assertIsNone(llm_client.call_llm_with_smart_routing("prompt", "T"))
+        self.assertEqual(call.call_count, 1)
+
+    def test_call_llm_makes_no_further_attempts(self):
+        provider = mock.Mock()
+        provider.is_available.return_value = True
+
+        def failing_call(prompt, model):
+            llm_client.shutdown()
+            raise RuntimeError("server error")
+
+        provider.call.side_effect = failing_call
+        with mock.patch.object(llm_client, "get_provider", return_value=provider):
+            self.assertIsNone(llm_client.call_llm("prompt", max_retries=3))
+        self.assertEqual(provider.call.call_count, 1)
+
+    def test_brush_batch_is_not_sent_after_shutdown(self):
+        llm_client.shutdown()
+        qs = [{"id": 1, "stem": "a", "options": {}}, {"id": 2, "stem": "b", "options": {}}]
+        with mock.patch.object(brush_group, "ask_llm_batch") as batch, \
+                mock.patch.object(brush_group, "ask_llm_with_repair") as single:
+            outcomes = brush_group.process_question_batch("S", "01", "Cells", "", qs, Path("."), None)
+        batch.assert_not_called()
+        single.assert_not_called()
+        self.assertEqual([(qid, ok) for qid, ok, _err in outcomes], [(1, False), (2, False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""Tests for the asyncio fan-out and LLM repair in parser_ocr_questions."""
+
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import parser_ocr_questions as parser
+from config import OUTPUT_DIR
+from status_manager import SubjectStatusManager
+
+GOOD_TEXT = (
+    "1. Which organelle produces ATP?\nA. Nucleus\nB. Mitochondria\n"
+    "2. What is DNA made of?\nA. Nucleotides\nB. Amino acids\n"
+)
+GOOD = [
+    {"id": i, "stem": f"Question {i}", "options": {"A": "a", "B": "b"}, "raw_answer": "A"}
+    for i in range(1, 4)
+]
+BAD = [{"id": i, "stem": f"Question {i}", "options": {}, "raw_answer": ""} for i in range(1, 4)]
+
+
+def _response(questions) -> str:
+    return "```json\n" + json.dumps(questions) + "\n```"
+
+
+class RunForSubjectTest(unittest.TestCase):
+    def test_only_broken_files_reach_the_llm(self):
+        subject = "AsyncParserSubject"
+        raw_dir = OUTPUT_DIR / subject / "raw"
+        raw_dir.mkdir(parents=True, exist_ok=True)
+        (raw_dir / "01_Cells_exercises.txt").write_text(GOOD_TEXT, encoding="utf-8")
+        (raw_dir / "02_Tissues_exercises.txt").write_text("garbage without questions\n", encoding="utf-8")
+
+        llm = mock.AsyncMock(return_value=_response(GOOD))
+        with mock.patch.object(parser, "acall_llm_with_smart_routing", llm), \
+                contextlib.redirect_stdout(io.StringIO()):
+            parser.run_for_subject(subject)
+
+        self.assertEqual(llm.await_count, 1)
+        self.assertIn("02_Tissues", llm.await_args.kwargs["debug_id"])
+        struct_dir = OUTPUT_DIR / subject / "questions_structured"
+        cells = json.loads((struct_dir / "01_Cells_questions.json").read_text(encoding="utf-8"))
+        tissues = json.loads((struct_dir / "02_Tissues_questions.json").read_text(encoding="utf-8"))
+        self.assertEqual([q["id"] for q in cells], [1, 2])
+        self.assertEqual([q["id"] for q in tissues], [1, 2, 3])
+
+        status = SubjectStatusManager(subject).get_pipeline_status()
+        self.assertEqual(status.get("questions_structured_state"), "done")
+        self.assertEqual(status.get("questions_structured_inputs"), 2)
+        self.assertEqual(status.get("questions_structured_outputs"), 2)
+
+
+class ProcessFilesTest(unittest.TestCase):
+    def test_in_flight_files_are_bounded(self):
+        in_flight = 0
+        peak = 0
+
+        async def fake_process(f, base_dir, struct_dir, raw=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return None if f.name.startswith("bad") else f
+
+        with tempfile.TemporaryDirectory() as tmp:
+            files = []
+            for i in range(8):
+                f = Path(tmp) / (f"bad{i}.txt" if i == 0 else f"{i:02d}_x_exercises.txt")
+                f.write_text(GOOD_TEXT, encoding="utf-8")
+                files.append(f)
+            with mock.patch.object(parser, "aprocess_single_file", fake_process):
+                successes = asyncio.run(parser._process_files(files, Path(tmp), Path(tmp), 3))
+
+        self.assertEqual(successes, 7)
+        self.assertEqual(peak, 3)
+
+
+class LlmRepairTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.src = Path(tmp.name) / "01_Cells_exercises.txt"
+        self.src.write_text("garbage\n", encoding="utf-8")
+        self.cache_dir = Path(tmp.name) / ".llm_cache"
+
+    def _repair(self, responses):
+        llm = mock.AsyncMock(side_effect=responses)
+        with mock.patch.object(parser, "acall_llm_with_smart_routing", llm), \
+                contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(parser._llm_repair(self.src, [], self.cache_dir))
+        return result, llm
+
+    def test_first_passing_attempt_skips_retries(self):
+        (qs, ok), llm = self._repair([_response(GOOD)])
+        self.assertTrue(ok)
+        self.assertEqual(len(qs), 3)
+        self.assertEqual(llm.await_count, 1)
+
+    def test_retries_run_in_sequence_and_stop_at_first_pass(self):
+        (qs, ok), llm = self._repair([_response(BAD), _response(GOOD), _response(GOOD)])
+        self.assertTrue(ok)
+        self.assertFalse(parser._needs_llm_repair(qs))
+        self.assertEqual(llm.await_count, 2)
+        # The second attempt carries the first result's feedback
+        self.assertIn(parser._quality_report(BAD), llm.await_args.args[0])
+
+    def test_concurrent_retries_are_opt_in(self):
+        with mock.patch.object(parser, "LLM_RESEG_CONCURRENT_RETRIES", True):
+            (qs, ok), llm = self._repair([_response(BAD), None, _response(GOOD)])
+        self.assertTrue(ok)
+        self.assertFalse(parser._needs_llm_repair(qs))
+        self.assertEqual(llm.await_count, parser.MAX_LLM_RESEG_ATTEMPTS)
+
+    def test_concurrent_retries_share_one_cache_key(self):
+        with mock.patch.object(parser, "LLM_RESEG_CONCURRENT_RETRIES", True):
+            self._repair([_response(BAD), None, _response(GOOD)])
+            # Replay: attempt 1 gives the same bad result, then either retry hits the cache
+            (qs, ok), llm = self._repair([_response(BAD), None, None])
+        self.assertTrue(ok)
+        self.assertFalse(parser._needs_llm_repair(qs))
+        self.assertEqual(llm.await_count, 1)
+
+    def test_all_attempts_failing_reports_no_success(self):
+        (qs, ok), _llm = self._repair([None] * parser.MAX_LLM_RESEG_ATTEMPTS)
+        self.assertFalse(ok)
+        self.assertEqual(qs, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
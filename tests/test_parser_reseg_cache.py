@@ -0,0 +1,69 @@
+"""Tests for the LLM re-segmentation cache in parser_ocr_questions."""
+
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import parser_ocr_questions as parser
+
+
+def _response(questions) -> str:
+    return json.dumps(questions, ensure_ascii=False)
+
+
+GOOD = [
+    {"id": i, "stem": f"Question {i}", "options": {"A": "a", "B": "b"}, "raw_answer": "A"}
+    for i in range(1, 4)
+]
+# Every option block missing: fails _needs_llm_repair
+BAD = [{"id": i, "stem": f"Question {i}", "options": {}, "raw_answer": ""} for i in range(1, 4)]
+
+
+class ResegCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.src = Path(tmp.name) / "01_Cells_exercises.txt"
+        self.src.write_text("1. Question 1\nA. a\nB. b\n", encoding="utf-8")
+        self.cache_dir = Path(tmp.name) / ".llm_cache"
+        self.cache_dir.mkdir()
+
+    def _cached_files(self):
+        return list(self.cache_dir.glob("*.json"))
+
+    def test_result_failing_quality_check_is_not_cached(self):
+        with mock.patch.object(parser, "call_llm_with_smart_routing", return_value=_response(BAD)) as llm:
+            first = parser.llm_resegment(self.src, "fb", cache_dir=self.cache_dir)
+            parser.llm_resegment(self.src, "fb", cache_dir=self.cache_dir)
+        self.assertTrue(parser._needs_llm_repair(first))
+        self.assertEqual(self._cached_files(), [])
+        self.assertEqual(llm.call_count, 2)
+
+    def test_passing_result_is_cached_and_replayed(self):
+        with mock.patch.object(parser, "call_llm_with_smart_routing", return_value=_response(GOOD)) as llm:
+            first = parser.llm_resegment(self.src, "fb", cache_dir=self.cache_dir)
+            second = parser.llm_resegment(self.src, "fb", cache_dir=self.cache_dir)
+        self.assertEqual(len(self._cached_files()), 1)
+        self.assertEqual(llm.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_async_failing_result_is_not_cached(self):
+        llm = mock.AsyncMock(return_value=_response(BAD))
+        with mock.patch.object(parser, "acall_llm_with_smart_routing", llm):
+            asyncio.run(parser.allm_resegment(self.src, "fb", cache_dir=self.cache_dir, variant=1))
+        self.assertEqual(self._cached_files(), [])
+
+    def test_async_passing_result_is_cached(self):
+        llm = mock.AsyncMock(return_value=_response(GOOD))
+        with mock.patch.object(parser, "acall_llm_with_smart_routing", llm):
+            asyncio.run(parser.allm_resegment(self.src, "fb", cache_dir=self.cache_dir, variant=1))
+            asyncio.run(parser.allm_resegment(self.src, "fb", cache_dir=self.cache_dir, variant=1))
+        self.assertEqual(len(self._cached_files()), 1)
+        self.assertEqual(llm.await_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
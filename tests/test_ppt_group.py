@@ -0,0 +1,58 @@
+"""Tests for PPT file matching in ppt_group."""
+
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import ppt_group
+
+
+def _doc(name: str) -> ppt_group.PptDoc:
+    return ppt_group.PptDoc(path=Path(f"{name}.txt"), fname_lower=name.lower())
+
+
+class PptDocTextTest(unittest.TestCase):
+    def test_text_is_read_once(self):
+        doc = _doc("cells_lecture")
+        with mock.patch.object(ppt_group, "_read_text_if_exists", return_value="Cell BODY") as read:
+            self.assertEqual(doc.text_lower, "cell body")
+            self.assertEqual(doc.body_count("cell"), 1)
+        read.assert_called_once()
+
+    def test_reads_of_different_docs_run_concurrently(self):
+        # Both reads must be in progress at once; a shared lock would time out the barrier
+        barrier = threading.Barrier(2, timeout=5)
+        errors = []
+
+        def slow_read(path, limit=None):
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError as e:
+                errors.append(e)
+            return "text"
+
+        docs = [_doc("a"), _doc("b")]
+        with mock.patch.object(ppt_group, "_read_text_if_exists", side_effect=slow_read):
+            threads = [threading.Thread(target=lambda d=d: d.text_lower) for d in docs]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(errors, [])
+
+
+class PrefilterTest(unittest.TestCase):
+    def test_keyword_inside_file_name_passes_prefilter(self):
+        docs = (_doc("cells_lecture"), _doc("unrelated_deck"))
+        with mock.patch.object(ppt_group, "_collect_ppt_files", return_value=[d.path for d in docs]), \
+                mock.patch.object(ppt_group, "_ppt_index", return_value=docs), \
+                mock.patch.object(ppt_group, "_read_text_if_exists", return_value="the cell membrane") as read:
+            found = ppt_group._find_ppt_files_for_chapter("S", "07", "Membranes", "cell cell cell")
+        self.assertEqual(found, [Path("cells_lecture.txt")])
+        # The unrelated deck is still skipped without being read
+        read.assert_called_once_with(Path("cells_lecture.txt"), limit=6000)
+
+
+if __name__ == "__main__":
+    unittest.main()
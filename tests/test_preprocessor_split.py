@@ -0,0 +1,133 @@
+"""
+The single-pass chapter/exercise split in preprocessor.process_file must write
+exactly the files the original per-chapter splitter wrote.
+"""
+
+import contextlib
+import io
+import random
+import re
+import tempfile
+import unittest
+from pathlib import Path
+
+import preprocessor
+from config import OUTPUT_DIR
+
+
+def _reference_split(content: str) -> dict[str, str]:
+    """The original splitter: regex searches over each chapter's sliced text."""
+    chapter_pattern = re.compile(
+        r'(?:^|\n)\s*(?:Chapter|Ch\.?|Section)\s*(\d+)[:\s]+([^\n]+)',
+        re.IGNORECASE
+    )
+    matches = list(chapter_pattern.finditer(content))
+    if not matches:
+        return {"00_full_content.txt": content}
+
+    files = {}
+    for i, match in enumerate(matches):
+        start_idx = match.start()
+        end_idx = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        chapter_name = re.sub(r'[\\/:*?"<>|]', '_', match.group(2).strip()).strip()
+        chapter_id = f"{int(match.group(1)):02d}"
+        chapter_content = content[start_idx:end_idx]
+
+        if re.search(r'(?:exercise|question|problem)', chapter_content, re.I):
+            exercise_match = re.search(
+                r'(?:^|\n)\s*(?:Exercises?|Questions?|Problems?)\s*(?:\n|:)',
+                chapter_content, re.IGNORECASE
+            )
+            if exercise_match:
+                files[f"{chapter_id}_{chapter_name}_content.txt"] = chapter_content[:exercise_match.start()]
+                files[f"{chapter_id}_{chapter_name}_exercises.txt"] = chapter_content[exercise_match.start():]
+            else:
+                files[f"{chapter_id}_{chapter_name}_combined.txt"] = chapter_content
+        else:
+            files[f"{chapter_id}_{chapter_name}_textbook.txt"] = chapter_content
+    return files
+
+
+FIXTURES = {
+    "header_inside_chapter": (
+        "Chapter 1: Cells\nThe cell is the unit of life.\n"
+        "Exercises\n1. What is a cell?\nA. unit\nB. organ\n"
+        "Chapter 2: Tissues\nTissues group cells.\n"
+        "Questions:\n1. Name a tissue.\n"
+    ),
+    "header_ends_at_next_chapter": (
+        # The header's terminating newline is the next heading's leading newline
+        "Chapter 1: Cells\nbody\nExercises\nChapter 2: Tissues\nbody\n"
+    ),
+    "header_only_in_next_chapter": (
+        "Chapter 1: Cells\nThis chapter mentions a question but has no header.\n"
+        "Chapter 2: Tissues\nbody\nProblems\n1. p\n"
+    ),
+    "header_before_first_chapter": (
+        "Questions:\npreface\nChapter 1: Cells\nbody only\nChapter 2: Tissues\nExercises\n1. q\n"
+    ),
+    "several_headers_in_chapter": (
+        "Section 4: Genes\nbody\nQuestions:\n1. x\nExercises\n2. y\n"
+    ),
+    "title_on_next_line": (
+        "Chapter 6\nTitle On Next Line\nProblems\n1. z\n"
+        "Chapter 7\nExercises\n1. heading title is itself a header\n"
+    ),
+    "keyword_in_title_only": (
+        "CHAPTER 5: Exercise physiology\nnothing to split\nCh. 3 Metabolism\nplain body\n"
+    ),
+    "header_at_end_of_file": "Chapter 1: Cells\nbody\nExercises",
+    "no_chapters": "Just some notes.\nExercises\n1. q\n",
+    "unicode": "Chapter 10: 心脏\n题目 ü body\nQuestions: x\nChapter 11: Ende\nproblem\n",
+}
+
+_FRAGMENTS = [
+    "Chapter 1: A", "Chapter 2", "Ch. 3 B", "Section 4: C", "Exercises", "Questions:",
+    "Problems", "exercise word", "body", "", "  ", "Chapter 5:\nTitle", "Exercises  ",
+    "x questions y", "Chapter 6: Exercises", "Chapter 7\nExercises", "Section 8 :\n Problems:",
+    "Questions: x", "problem", "Ch.9", "Chapter 10: 心脏", "题目 ü body",
+]
+
+
+class PreprocessorSplitTest(unittest.TestCase):
+    subject = "SplitSubject"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.src = Path(tmp.name) / "source.txt"
+        self.raw_dir = OUTPUT_DIR / self.subject / "raw"
+
+    def _split(self, text: str) -> dict[str, str]:
+        # Empty raw/ but keep it: ensure_dir remembers directories it created
+        if self.raw_dir.exists():
+            for f in self.raw_dir.iterdir():
+                f.unlink()
+        self.src.write_text(text, encoding="utf-8")
+        with contextlib.redirect_stdout(io.StringIO()):
+            preprocessor.process_file(self.src, subject_override=self.subject)
+        return {f.name: f.read_text(encoding="utf-8") for f in self.raw_dir.iterdir()}
+
+    def test_fixtures_match_reference(self):
+        for name, text in FIXTURES.items():
+            with self.subTest(name):
+                self.assertEqual(self._split(text), _reference_split(text))
+
+    def test_fixtures_cover_split_and_combined(self):
+        written = self._split(FIXTURES["header_inside_chapter"])
+        self.assertEqual(
+            written["01_Cells_exercises.txt"],
+            "\nExercises\n1. What is a cell?\nA. unit\nB. organ",
+        )
+        self.assertIn("01_Cells_combined.txt", self._split(FIXTURES["header_only_in_next_chapter"]))
+
+    def test_random_documents_match_reference(self):
+        rng = random.Random(1234)
+        for n in range(200):
+            text = "\n".join(rng.choice(_FRAGMENTS) for _ in range(rng.randint(1, 14)))
+            with self.subTest(n=n, text=text):
+                self.assertEqual(self._split(text), _reference_split(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Tests for Ctrl+C handling in run_all.main."""
+
+import os
+import signal
+import threading
+import time
+import unittest
+from unittest import mock
+
+import llm_client
+import run_all
+
+
+class InterruptTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(llm_client._shutdown_event.clear)
+        self.addCleanup(run_all._parsed_events.clear)
+
+    def test_interrupt_wakes_pipelines_before_join(self):
+        woke = []
+
+        def backing_off_pipeline(subjects, *args):
+            # Stands in for a worker thread sleeping out an LLM retry backoff
+            woke.append(llm_client._shutdown_event.wait(30))
+
+        def waiting_pipeline(subjects, pool):
+            # A downstream pipeline still waiting for the subject to be parsed
+            run_all._wait_for_questions_structured(subjects, label="TEST", timeout_s=30)
+            woke.append(llm_client.shutdown_requested())
+
+        timer = threading.Timer(0.5, os.kill, (os.getpid(), signal.SIGINT))
+        with mock.patch.object(run_all, "preprocess_main"), \
+                mock.patch.object(run_all, "discover_subjects", return_value=["Bio"]), \
+                mock.patch.object(run_all, "SubjectStatusManager"), \
+                mock.patch.object(run_all, "run_questions_pipeline", side_effect=backing_off_pipeline), \
+                mock.patch.object(run_all, "run_keypoints_pipeline", side_effect=waiting_pipeline), \
+                mock.patch.object(run_all, "run_ppt_pipeline", side_effect=waiting_pipeline), \
+                mock.patch.object(run_all.sys, "argv", ["run_all.py"]):
+            start = time.monotonic()
+            timer.start()
+            with self.assertRaises(KeyboardInterrupt):
+                run_all.main()
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 10)
+        self.assertEqual(woke, [True, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Tests for the cached directory listing behind find_chapter_textbook."""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils_fs import find_chapter_textbook
+
+
+class FindChapterTextbookTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.raw_dir = Path(tmp.name) / "raw"
+
+    def _bump_mtime(self):
+        # Coarse filesystem timestamps: make the change visible to the mtime key
+        st = self.raw_dir.stat()
+        os.utime(self.raw_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def test_missing_directory_is_not_cached(self):
+        self.assertIsNone(find_chapter_textbook(self.raw_dir, "01", "Cells"))
+
+        self.raw_dir.mkdir()
+        (self.raw_dir / "01_Cells_content.txt").write_text("x", encoding="utf-8")
+        self.assertEqual(
+            find_chapter_textbook(self.raw_dir, "01", "Cells"),
+            self.raw_dir / "01_Cells_content.txt",
+        )
+
+    def test_files_written_later_are_found(self):
+        self.raw_dir.mkdir()
+        (self.raw_dir / "01_Cells_combined.txt").write_text("x", encoding="utf-8")
+        self.assertEqual(
+            find_chapter_textbook(self.raw_dir, "01", "Cells"),
+            self.raw_dir / "01_Cells_combined.txt",
+        )
+
+        (self.raw_dir / "01_Cells_textbook.txt").write_text("x", encoding="utf-8")
+        self._bump_mtime()
+        self.assertEqual(
+            find_chapter_textbook(self.raw_dir, "01", "Cells"),
+            self.raw_dir / "01_Cells_textbook.txt",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
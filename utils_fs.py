@@ -3,40 +3,84 @@ MedForge Filesystem Utilities
 
 Provides:
 - Cross-platform advisory file locks (process-safe)
-- Atomic text/JSON writes via temp file + os.replace
+- Atomic bytes/text/JSON writes via temp file + os.replace
+- Batched atomic writes of several files with a single fsync pass
+- JSON serialization to bytes (orjson when installed)
+- Per-process memoized directory creation
+- Chapter textbook lookup from a cached directory listing
 """
 
 from __future__ import annotations
 
+import functools
 import json
 import os
 import tempfile
 import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Iterator
+from typing import Any, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used otherwise
+    orjson = None
 
 
 if os.name == "nt":
+    import ctypes
     import msvcrt
+    from ctypes import wintypes
 
-    def _lock_handle(handle) -> None:
-        handle.seek(0, os.SEEK_END)
-        if handle.tell() == 0:
-            handle.write("0")
-            handle.flush()
-        handle.seek(0)
-        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    _LOCKFILE_FAIL_IMMEDIATELY = 0x1
+    _LOCKFILE_EXCLUSIVE_LOCK = 0x2
+
+    class _OVERLAPPED(ctypes.Structure):
+        _fields_ = [
+            ("Internal", ctypes.c_void_p),
+            ("InternalHigh", ctypes.c_void_p),
+            ("Offset", wintypes.DWORD),
+            ("OffsetHigh", wintypes.DWORD),
+            ("hEvent", wintypes.HANDLE),
+        ]
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    _LockFileEx = _kernel32.LockFileEx
+    _LockFileEx.argtypes = [
+        wintypes.HANDLE, wintypes.DWORD, wintypes.DWORD,
+        wintypes.DWORD, wintypes.DWORD, ctypes.POINTER(_OVERLAPPED),
+    ]
+    _LockFileEx.restype = wintypes.BOOL
+
+    _UnlockFileEx = _kernel32.UnlockFileEx
+    _UnlockFileEx.argtypes = [
+        wintypes.HANDLE, wintypes.DWORD,
+        wintypes.DWORD, wintypes.DWORD, ctypes.POINTER(_OVERLAPPED),
+    ]
+    _UnlockFileEx.restype = wintypes.BOOL
+
+    # Byte 0 is addressed through the OVERLAPPED offset, independent of the
+    # file position; LockFileEx may lock past EOF, so the file can stay empty
+    def _lock_handle(handle, *, blocking: bool = False) -> None:
+        flags = _LOCKFILE_EXCLUSIVE_LOCK
+        if not blocking:
+            flags |= _LOCKFILE_FAIL_IMMEDIATELY
+        overlapped = _OVERLAPPED()
+        if not _LockFileEx(msvcrt.get_osfhandle(handle.fileno()), flags, 0, 1, 0, ctypes.byref(overlapped)):
+            raise ctypes.WinError(ctypes.get_last_error())
 
     def _unlock_handle(handle) -> None:
-        handle.seek(0)
-        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        overlapped = _OVERLAPPED()
+        if not _UnlockFileEx(msvcrt.get_osfhandle(handle.fileno()), 0, 1, 0, ctypes.byref(overlapped)):
+            raise ctypes.WinError(ctypes.get_last_error())
 
 else:
     import fcntl
 
-    def _lock_handle(handle) -> None:
-        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    def _lock_handle(handle, *, blocking: bool = False) -> None:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        fcntl.flock(handle.fileno(), flags)
 
     def _unlock_handle(handle) -> None:
         fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
@@ -54,15 +98,19 @@ def file_lock(
 
     This is safe to use together with atomic writes that replace the target file,
     because the lock is held on a separate path.
+
+    With timeout_s=None the wait happens in the kernel (flock / LockFileEx),
+    which wakes the caller as soon as the lock is released; otherwise the lock
+    is polled every poll_interval_s until the timeout.
     """
 
-    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    ensure_dir(lock_path.parent)
     start = time.monotonic()
 
     with open(lock_path, "a+", encoding="utf-8") as handle:
         while True:
             try:
-                _lock_handle(handle)
+                _lock_handle(handle, blocking=timeout_s is None)
                 break
             except OSError:
                 if timeout_s is not None and (time.monotonic() - start) >= timeout_s:
@@ -78,8 +126,60 @@ def file_lock(
                 pass
 
 
-def _atomic_write_bytes(path: Path, data: bytes) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
+# Directories this process has already created (or found existing)
+_CREATED_DIRS: set[Path] = set()
+
+
+def ensure_dir(path: Path) -> None:
+    """mkdir -p, skipped for directories already ensured by this process."""
+    if path in _CREATED_DIRS:
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    _CREATED_DIRS.add(path)
+
+
+# Preference order of the preprocessor's per-chapter textbook outputs
+TEXTBOOK_SUFFIXES = ("_textbook.txt", "_content.txt", "_combined.txt")
+
+
+@functools.lru_cache(maxsize=256)
+def _dir_names_cached(dir_path: str, mtime_ns: int) -> frozenset[str]:
+    with os.scandir(dir_path) as it:
+        return frozenset(entry.name for entry in it)
+
+
+def _dir_names(dir_path: str) -> frozenset[str]:
+    """
+    Entry names of a directory (empty if missing or unreadable).
+
+    The listing is cached per directory mtime, so files created later in the
+    run are seen; failed listings are not cached.
+    """
+    try:
+        return _dir_names_cached(dir_path, os.stat(dir_path).st_mtime_ns)
+    except OSError:
+        return frozenset()
+
+
+def find_chapter_textbook(raw_dir: Path, chapter_id: str, chapter_name: str) -> Optional[Path]:
+    """First existing textbook file of a chapter in `raw_dir`, by TEXTBOOK_SUFFIXES order."""
+    names = _dir_names(str(raw_dir))
+    for suffix in TEXTBOOK_SUFFIXES:
+        name = f"{chapter_id}_{chapter_name}{suffix}"
+        if name in names:
+            return raw_dir / name
+    return None
+
+
+def _atomic_write_bytes(path: Path, data: bytes, *, durable: bool = True) -> None:
+    """
+    Write via temp file + os.replace so readers see the old or new contents.
+
+    With durable=False the fsync is skipped: the rename is still atomic, but
+    after a power loss the file may be empty or missing. Use it only for
+    outputs that are regenerated when found invalid.
+    """
+    ensure_dir(path.parent)
 
     fd, tmp_name = tempfile.mkstemp(
         prefix=f".{path.name}.",
@@ -91,8 +191,9 @@ def _atomic_write_bytes(path: Path, data: bytes) -> None:
     try:
         with os.fdopen(fd, "wb") as f:
             f.write(data)
-            f.flush()
-            os.fsync(f.fileno())
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
 
         os.replace(tmp_path, path)
     finally:
@@ -102,8 +203,72 @@ def _atomic_write_bytes(path: Path, data: bytes) -> None:
             pass
 
 
-def atomic_write_text(path: Path, text: str, *, encoding: str = "utf-8") -> None:
-    _atomic_write_bytes(path, text.encode(encoding))
+def atomic_write_bytes(path: Path, data: bytes, *, durable: bool = True) -> None:
+    _atomic_write_bytes(path, data, durable=durable)
+
+
+def atomic_write_many(items: list[tuple[Path, bytes]], *, durable: bool = True) -> None:
+    """
+    Atomically replace several files at once.
+
+    All temp files are written first, then fsynced together, then renamed, so
+    the flushes of one logical update are issued back to back instead of
+    interleaved with writes. Each file is individually old-or-new; the set as
+    a whole is not atomic.
+    """
+    staged: list[tuple[Path, Path, Any]] = []
+    try:
+        for path, data in items:
+            ensure_dir(path.parent)
+            fd, tmp_name = tempfile.mkstemp(
+                prefix=f".{path.name}.",
+                suffix=".tmp",
+                dir=str(path.parent),
+            )
+            handle = os.fdopen(fd, "wb")
+            staged.append((path, Path(tmp_name), handle))
+            handle.write(data)
+            handle.flush()
+
+        for _, _, handle in staged:
+            if durable:
+                os.fsync(handle.fileno())
+            handle.close()
+
+        for path, tmp_path, _ in staged:
+            os.replace(tmp_path, path)
+    finally:
+        for _, tmp_path, handle in staged:
+            try:
+                handle.close()
+                tmp_path.unlink(missing_ok=True)
+            except Exception:
+                pass
+
+
+def atomic_write_text(path: Path, text: str, *, encoding: str = "utf-8", durable: bool = True) -> None:
+    _atomic_write_bytes(path, text.encode(encoding), durable=durable)
+
+
+def json_dumps_bytes(
+    data: Any,
+    *,
+    encoding: str = "utf-8",
+    ensure_ascii: bool = False,
+    indent: int | None = None,
+) -> bytes:
+    """
+    Serialize to JSON bytes, via orjson when installed and the options allow.
+
+    orjson covers UTF-8 output with indent None or 2; anything else, or data
+    orjson rejects (e.g. non-str keys), goes through stdlib json.
+    """
+    if orjson is not None and not ensure_ascii and indent in (None, 2) and encoding.lower() in ("utf-8", "utf8"):
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=ensure_ascii, indent=indent).encode(encoding)
 
 
 def atomic_write_json(
@@ -112,8 +277,9 @@ def atomic_write_json(
     *,
     encoding: str = "utf-8",
     ensure_ascii: bool = False,
-    indent: int = 2,
+    indent: int | None = 2,
+    durable: bool = True,
 ) -> None:
-    payload = json.dumps(data, ensure_ascii=ensure_ascii, indent=indent)
-    _atomic_write_bytes(path, payload.encode(encoding))
+    payload = json_dumps_bytes(data, encoding=encoding, ensure_ascii=ensure_ascii, indent=indent)
+    _atomic_write_bytes(path, payload, durable=durable)
 
@@ -4,6 +4,7 @@ MedForge Text Utilities
 Text normalization and cleaning utilities for document processing.
 """
 
+import functools
 import unicodedata
 import re
 from typing import Optional, Tuple
@@ -11,6 +12,35 @@ from typing import Optional, Tuple
 
 TRUNCATION_MARKER = "[...truncated]"
 
+# Longer inputs (whole textbook chapters) are normalized without memoization
+NORMALIZE_CACHE_MAX_CHARS = 16384
+
+_ZERO_WIDTH_RE = re.compile(r"[\u200b-\u200f]")
+# Runs of spaces/tabs other than a lone space, i.e. only those that change
+_INLINE_WS_RE = re.compile(r"(?: [ \t]|\t)[ \t]*")
+_EXCESS_NEWLINES_RE = re.compile(r"\n{3,}")
+_CHAPTER_NUM_RE = re.compile(r"(?:chapter|ch\.|section)\s*(\d+)", re.IGNORECASE)
+
+
+class _ControlCharTable(dict):
+    """
+    str.translate table dropping non-printable characters except \\n, \\r, \\t.
+
+    Seeded with the C0/C1 control ranges; any other code point is classified
+    with str.isprintable() on first sight and remembered, so translate() keeps
+    the loop in C while matching the isprintable() filter exactly.
+    """
+
+    def __missing__(self, code: int) -> Optional[int]:
+        value = code if chr(code).isprintable() else None
+        self[code] = value
+        return value
+
+
+_CONTROL_CHAR_TABLE = _ControlCharTable(
+    {c: (c if c in (0x09, 0x0A, 0x0D) else None) for c in (*range(0x20), *range(0x7F, 0xA0))}
+)
+
 
 def normalize_text(text: str) -> str:
     """
@@ -31,24 +61,36 @@ def normalize_text(text: str) -> str:
     """
     if not text:
         return ""
+    if len(text) > NORMALIZE_CACHE_MAX_CHARS:
+        return _normalize_text_uncached(text)
+    return _normalize_text_cached(text)
+
 
-    # Unicode normalization (NFKC form)
-    text = unicodedata.normalize("NFKC", text)
+def _normalize_text_uncached(text: str) -> str:
+    # NFKC and the BOM/zero-width removal are no-ops on pure ASCII
+    if not text.isascii():
+        # Unicode normalization (NFKC form)
+        text = unicodedata.normalize("NFKC", text)
 
-    # Remove BOM and zero-width characters
-    text = text.replace("\ufeff", "")
-    text = re.sub(r"[\u200b-\u200f]", "", text)
+        # Remove BOM and zero-width characters
+        text = text.replace("\ufeff", "")
+        text = _ZERO_WIDTH_RE.sub("", text)
 
     # Consolidate whitespace
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _INLINE_WS_RE.sub(" ", text)
+    if "\n\n\n" in text:
+        text = _EXCESS_NEWLINES_RE.sub("\n\n", text)
 
     # Remove invisible control characters (preserve newlines/tabs)
-    text = "".join(ch for ch in text if ch.isprintable() or ch in "\n\r\t")
+    text = text.translate(_CONTROL_CHAR_TABLE)
 
     return text.strip()
 
 
+# Stems and options recur across chapters and pipelines
+_normalize_text_cached = functools.lru_cache(maxsize=8192)(_normalize_text_uncached)
+
+
 def truncate_text(text: str, max_chars: Optional[int], marker: str = TRUNCATION_MARKER) -> Tuple[str, bool]:
     """
     Truncate text to a maximum character length.
@@ -70,28 +112,45 @@ def truncate_text(text: str, max_chars: Optional[int], marker: str = TRUNCATION_
     if max_chars <= len(marker):
         return marker[:max_chars], True
 
-    return text[: max_chars - len(marker)] + marker, True
+    keep = max_chars - len(marker)
+    return f"{text[:keep]}{marker}", True
+
+
+def strip_code_fence(text: str) -> str:
+    """
+    Remove a wrapping markdown code fence from stripped LLM output.
+
+    Drops the opening ``` line and, if present, a closing ``` line, using
+    index slicing rather than splitting the whole response into lines.
+
+    Returns:
+        Unwrapped, stripped text (unchanged if it does not start with ```)
+    """
+    if not text.startswith("```"):
+        return text
+
+    first_nl = text.find("\n")
+    if first_nl == -1:
+        return ""
+    body = text[first_nl + 1:]
+
+    last_nl = body.rfind("\n")
+    if body[last_nl + 1:].startswith("```"):
+        body = body[:last_nl] if last_nl != -1 else ""
+    return body.strip()
 
 
 def extract_chapter_number(text: str) -> Optional[int]:
     """
     Extract chapter number from text.
 
+    Takes the first "chapter N", "ch. N" or "section N" in the text.
+
     Args:
         text: Text potentially containing chapter number
 
     Returns:
         Chapter number if found, None otherwise
     """
-    patterns = [
-        r"chapter\s*(\d+)",
-        r"ch\.\s*(\d+)",
-        r"section\s*(\d+)",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return int(match.group(1))
-
-    return None
+    match = _CHAPTER_NUM_RE.search(text)
+    return int(match.group(1)) if match else None